@@ -2,4 +2,37 @@
 
 from prisma import Prisma
 
-prisma_client = Prisma()
+from app.metrics import PRISMA_QUERY_SECONDS, timed
+from app.tracing import span
+
+# 生SQLはスパンにSQL文を残す（パラメーターは残さない）
+_RAW_METHODS = {"query_raw", "execute_raw"}
+
+
+class TracedPrisma(Prisma):
+    """
+    すべてのクエリをスパンで囲み、処理時間をヒストグラムに記録するPrismaクライアント
+
+    tx() は self.__class__ でクライアントを複製するので、
+    トランザクション内のクエリも記録される。
+    """
+
+    async def _execute(self, *, method, arguments, model=None, root_selection=None):
+        table = getattr(model, "__prisma_model__", None)
+        attributes = {"db.system": "postgresql", "db.operation": method}
+        if table:
+            attributes["db.collection.name"] = table
+        if method in _RAW_METHODS:
+            attributes["db.statement"] = str(arguments.get("query", ""))[:1000]
+        with span(f"prisma.{table or 'raw'}.{method}", **attributes), timed(
+            PRISMA_QUERY_SECONDS, model=table or "raw", operation=method
+        ):
+            return await super()._execute(
+                method=method,
+                arguments=arguments,
+                model=model,
+                root_selection=root_selection,
+            )
+
+
+prisma_client = TracedPrisma()
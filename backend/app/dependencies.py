@@ -6,14 +6,45 @@ load_dotenv()
 import os
 import firebase_admin
 from firebase_admin import credentials, auth
-from fastapi import HTTPException, status, Request
+from fastapi import Depends, HTTPException, status, Request
 import json
 
+from app.metrics import FIREBASE_VERIFY_SECONDS, timed
+from app.tracing import span
+
+# 負荷試験モード（本番では有効にしない）
+# Firebaseの代わりに、"Bearer loadtest-<任意の文字列>" のトークンをそのままUIDとして受け付ける
+LOAD_TEST_MODE = os.getenv("LOAD_TEST_MODE", "false").lower() == "true"
+LOAD_TEST_UID_PREFIX = "loadtest-"
+# 本番を表す ENV の値
+PRODUCTION_ENVS = {"production", "prod"}
+
+
+def check_load_test_mode(load_test_mode: bool, environ=os.environ) -> None:
+    """
+    負荷試験モードが本番環境で有効になっていたら起動を止める
+
+    本番かどうかは ENV だけで判断する（FIREBASE_SERVICE_ACCOUNT はローカルの .env や
+    CI でも設定されているので、負荷試験を行う環境と区別できない）。
+
+    Args:
+        load_test_mode (bool): LOAD_TEST_MODE が有効か
+        environ: 環境変数
+
+    Raises:
+        RuntimeError: 本番環境で負荷試験モードが有効な場合
+    """
+    if load_test_mode and environ.get("ENV", "").lower() in PRODUCTION_ENVS:
+        raise RuntimeError("LOAD_TEST_MODE は本番環境（ENV=production）では有効にできません")
+
+
+check_load_test_mode(LOAD_TEST_MODE)
+
 # deploy時に環境変数を読み込むための設定
 # FirebaseのサービスアカウントJSONファイルを読み込む
 firebase_cred_json = os.getenv("FIREBASE_SERVICE_ACCOUNT")
 
-if not firebase_admin._apps:
+if not firebase_admin._apps and not LOAD_TEST_MODE:
     if not firebase_cred_json:
         raise RuntimeError("FIREBASE_SERVICE_ACCOUNT 環境変数が設定されていません")
     firebase_cred_dict = json.loads(firebase_cred_json)
@@ -46,7 +77,10 @@ def verify_firebase_token(request: Request) -> str:
 
     try:
         # Firebase Admin SDK を使って　IDトークンを検証
-        decoded_token = auth.verify_id_token(id_token)
+        with span("firebase.verify_id_token", **{"peer.service": "firebase"}), timed(
+            FIREBASE_VERIFY_SECONDS
+        ):
+            decoded_token = auth.verify_id_token(id_token)
         uid = decoded_token["uid"]
         return uid
         # トークンの検証に失敗した場合は401エラーを返す
@@ -54,3 +88,40 @@ def verify_firebase_token(request: Request) -> str:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Invalid token: {e}"
         ) from e
+
+
+# 管理者のFirebase UID（カンマ区切り）。レポートなど管理者向けAPIで使う
+ADMIN_FIREBASE_UIDS = {
+    uid.strip()
+    for uid in os.getenv("ADMIN_FIREBASE_UIDS", "").split(",")
+    if uid.strip()
+}
+
+
+# 管理者だけを通す（IDトークンを検証したうえで、UIDが許可リストにあるか確認する）
+def verify_admin(firebase_uid: str = Depends(verify_firebase_token)) -> str:
+    if firebase_uid not in ADMIN_FIREBASE_UIDS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="管理者のみアクセスできます",
+        )
+    return firebase_uid
+
+
+# 負荷試験モードで verify_firebase_token の代わりに使う（main.py で dependency_overrides に登録する）
+# トークンを検証せず、loadtest- で始まるUIDだけを受け付ける
+def verify_load_test_token(request: Request) -> str:
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authorization header missing",
+        )
+
+    uid = auth_header.split(" ")[1]
+    if not uid.startswith(LOAD_TEST_UID_PREFIX):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Invalid token: 負荷試験モードでは {LOAD_TEST_UID_PREFIX} で始まるUIDのみ受け付けます",
+        )
+    return uid
@@ -0,0 +1,232 @@
+"""構造化ログ（JSON Lines）の設定
+
+- ハンドラーはキューに積むだけ（QueueHandler）にして、標準出力への書き込みは
+  バックグラウンドのスレッド（QueueListener）がまとめて行う（リクエスト処理を止めない）
+- リクエストごとに request_id とルートをログに付ける（RequestContextMiddleware）
+- ルートごとのサンプリング率で INFO 以下を間引ける（WARNING 以上は常に出す）
+
+使い方:
+    from app.logger import get_logger
+
+    logger = get_logger(__name__)
+    logger.info("更新成功: %s", care_log.id)
+    logger.info("取得件数", extra={"count": len(rows)})
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+import orjson
+
+from app.tracing import current_trace_id
+
+# ログレベル（DEBUG / INFO / WARNING / ERROR）
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# ルートごとのサンプリング率（例: "/api/care_logs/today=0.1,/api/care_logs/list=0.5"）
+# パスの前方一致で決め、指定がなければ全件出す
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+route_var: ContextVar[Optional[str]] = ContextVar("route", default=None)
+sampled_var: ContextVar[bool] = ContextVar("log_sampled", default=True)
+
+# LogRecord が元から持っている属性（それ以外は extra で渡された項目として出力する）
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message",
+    "asctime",
+    "request_id",
+    "route",
+    "trace_id",
+}
+
+
+def parse_sample_rates(value: str) -> dict:
+    """
+    "パス=割合" のカンマ区切りをパースする
+
+    Returns:
+        dict: パス → 0.0〜1.0 のサンプリング率
+    """
+    rates = {}
+    for item in value.split(","):
+        path, _, rate = item.strip().partition("=")
+        if path and rate:
+            rates[path] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """1レコードを1行のJSONにする"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S")
+            + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+            entry["route"] = getattr(record, "route", None)
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            entry["trace_id"] = trace_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    リクエストID・ルート・トレースIDをレコードに付け、サンプリング対象外のリクエストの INFO 以下を捨てる
+
+    contextvars を読むので、ログを出したスレッド（QueueHandler側）で動かす。
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING and not sampled_var.get():
+            return False
+        record.request_id = request_id_var.get()
+        record.route = route_var.get()
+        record.trace_id = current_trace_id()
+        return True
+
+
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    """キューに積む前にメッセージと例外だけを文字列にしておく（書き込みはリスナー側）"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(
+    level: str = LOG_LEVEL, stream=None, force: bool = False
+) -> logging.handlers.QueueListener:
+    """
+    app 配下のロガーに、キュー経由でJSONを書き出すハンドラーを設定する
+
+    Args:
+        level (str): ログレベル
+        stream: 出力先（既定は標準出力）
+        force (bool): 設定済みでも作り直す（テストで出力先を差し替える場合）
+
+    Returns:
+        QueueListener: 書き込みを行うバックグラウンドのリスナー
+    """
+    global _listener  # pylint: disable=global-statement
+    if _listener is not None:
+        if not force:
+            return _listener
+        _listener.stop()
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _ContextQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+
+    app_logger = logging.getLogger("app")
+    app_logger.handlers = [queue_handler]
+    app_logger.setLevel(level)
+    app_logger.propagate = False
+    return _listener
+
+
+def shutdown_logging() -> None:
+    """キューに残っているログを書き出してリスナーを止める"""
+    global _listener  # pylint: disable=global-statement
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """モジュール用のロガーを返す（__name__ を渡すと app 配下の設定が効く）"""
+    return logging.getLogger(name)
+
+
+class RequestContextMiddleware:
+    """
+    リクエストごとに request_id を決めてログに付け、X-Request-ID ヘッダーで返すASGIミドルウェア
+
+    クライアントが X-Request-ID を送ってきた場合はそれを引き継ぐ。
+    """
+
+    def __init__(self, app, sample_rates: Optional[dict] = None):
+        self.app = app
+        self.sample_rates = (
+            parse_sample_rates(LOG_SAMPLE_RATES)
+            if sample_rates is None
+            else sample_rates
+        )
+
+    def _sample_rate(self, path: str) -> float:
+        for prefix, rate in self.sample_rates.items():
+            if path.startswith(prefix):
+                return rate
+        return 1.0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        path = scope.get("path", "")
+        rate = self._sample_rate(path)
+        tokens = (
+            request_id_var.set(request_id),
+            route_var.set(path),
+            sampled_var.set(rate >= 1.0 or random.random() < rate),
+        )
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(tokens[0])
+            route_var.reset(tokens[1])
+            sampled_var.reset(tokens[2])
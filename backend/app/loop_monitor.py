@@ -0,0 +1,153 @@
+"""イベントループの遅れの計測と、ブロッキング呼び出しの検出
+
+- LoopMonitor は一定間隔で asyncio.sleep し、予定より何秒遅れて再開できたかを
+  event_loop_lag_seconds に記録する（async のハンドラー内の同期呼び出しがあると遅れが伸びる）
+- LOOP_WATCHDOG_ENABLED=true（デバッグ用）のときは、別スレッドのウォッチドッグがループに
+  コールバックを投げ続け、LOOP_BLOCK_THRESHOLD_SECONDS を過ぎても実行されなければ、
+  その時点でループのスレッドが実行しているスタックをログに出す
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from app.logger import get_logger
+from app.metrics import EVENT_LOOP_BLOCKED, EVENT_LOOP_LAG_SECONDS
+
+logger = get_logger(__name__)
+
+# 遅れを計測する間隔（秒）
+LOOP_MONITOR_INTERVAL_SECONDS = float(os.getenv("LOOP_MONITOR_INTERVAL_SECONDS", "0.5"))
+# ウォッチドッグ（スタックの記録）を有効にするか
+LOOP_WATCHDOG_ENABLED = os.getenv("LOOP_WATCHDOG_ENABLED", "false").lower() == "true"
+# この秒数以上ループが止まったらブロッキングとみなす
+LOOP_BLOCK_THRESHOLD_SECONDS = float(os.getenv("LOOP_BLOCK_THRESHOLD_SECONDS", "0.1"))
+
+
+def format_blocking_stack(frame) -> str:
+    """ループのスレッドのスタックを、呼び出し元から順に文字列にする"""
+    return "".join(traceback.format_stack(frame)).rstrip()
+
+
+class LoopMonitor:
+    """
+    イベントループの遅れを計測するlifespanタスク（watchdog=True ならブロッキングも検出する）
+
+    Args:
+        interval_seconds (float): 遅れを計測する間隔
+        watchdog (bool): ブロッキングを検出してスタックを記録するか
+        threshold_seconds (float): ブロッキングとみなす秒数
+    """
+
+    def __init__(
+        self,
+        *,
+        interval_seconds: float = 0.5,
+        watchdog: bool = False,
+        threshold_seconds: float = 0.1,
+    ):
+        self.interval_seconds = interval_seconds
+        self.watchdog = watchdog
+        self.threshold_seconds = threshold_seconds
+        self.blocked_stacks: list = []  # 直近に検出したスタック（テスト・デバッグ用）
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._stopped = threading.Event()
+        self._watchdog_thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        """計測タスクが動いているか"""
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """計測を開始する（lifespanの起動時に呼ぶ）"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._run())
+        if self.watchdog:
+            self._watchdog_thread = threading.Thread(
+                target=self._watch, name="loop-watchdog", daemon=True
+            )
+            self._watchdog_thread.start()
+
+    async def stop(self) -> None:
+        """計測を止める（lifespanの終了時に呼ぶ）"""
+        self._stopped.set()
+        if self._watchdog_thread is not None:
+            # ウォッチドッグはループの応答を待っているので、ループを止めずに終了を待つ
+            await asyncio.to_thread(self._watchdog_thread.join)
+            self._watchdog_thread = None
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval_seconds
+            await asyncio.sleep(self.interval_seconds)
+            EVENT_LOOP_LAG_SECONDS.observe(max(loop.time() - expected, 0.0))
+
+    def _watch(self) -> None:
+        check_interval = self.threshold_seconds / 2
+        while not self._stopped.is_set():
+            beat = threading.Event()
+            try:
+                self._loop.call_soon_threadsafe(beat.set)
+            except RuntimeError:
+                # ループが閉じられた
+                return
+            started = time.monotonic()
+            if not beat.wait(self.threshold_seconds):
+                self._report_blocking(beat, started)
+            self._stopped.wait(check_interval)
+
+    def _report_blocking(self, beat: threading.Event, started: float) -> None:
+        """止まっている間のスタックを記録し、ループが再開したら止まっていた時間を記録する"""
+        frame = sys._current_frames().get(  # pylint: disable=protected-access
+            self._loop_thread_id
+        )
+        if frame is None:
+            return
+        stack = format_blocking_stack(frame)
+        task = asyncio.current_task(self._loop)
+        task_name = task.get_name() if task is not None else None
+        del frame
+        EVENT_LOOP_BLOCKED.inc()
+        self.blocked_stacks = (self.blocked_stacks + [stack])[-10:]
+        logger.warning(
+            "イベントループが %.3f 秒以上止まっています (task=%s)\n%s",
+            self.threshold_seconds,
+            task_name,
+            stack,
+        )
+        # 同じブロッキングを何度も記録しない（ループが再開するか停止するまで待つ）
+        while not beat.wait(self.threshold_seconds):
+            if self._stopped.is_set():
+                return
+        logger.warning(
+            "イベントループが再開しました（約 %.3f 秒止まっていました, task=%s）",
+            time.monotonic() - started,
+            task_name,
+        )
+
+
+loop_monitor = LoopMonitor(
+    interval_seconds=LOOP_MONITOR_INTERVAL_SECONDS,
+    watchdog=LOOP_WATCHDOG_ENABLED,
+    threshold_seconds=LOOP_BLOCK_THRESHOLD_SECONDS,
+)
@@ -5,16 +5,31 @@ from contextlib import asynccontextmanager
 
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 
 # fastapi-cache2 + Redis をimport
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.redis import RedisBackend
-import redis.asyncio as redis
 
 # .envファイルから環境変数を読み込む
 load_dotenv()
 
+# 構造化ログ（キュー経由でJSONを書き出す）の設定
+from app.logger import RequestContextMiddleware, configure_logging, get_logger
+
+configure_logging()
+
+# 分散トレーシング（TRACING_EXPORTER が none 以外のときだけ記録する）
+from app.tracing import (
+    TracedRedis,
+    TracingMiddleware,
+    configure_tracing,
+    shutdown_tracing,
+)
+
+configure_tracing()
+
 # ルーターの import
 from app.routers.user import user_router
 from app.routers.care_logs import care_logs_router
@@ -23,14 +38,50 @@ from app.routers.reflection_notes import reflection_notes_router
 from app.routers.message_logs import message_logs_router
 from app.routers.payment import payment_router
 from app.routers.webhook_events import webhook_events_router
+from app.routers.reports import reports_router
+from app.routers.debug import debug_router
 
 
 # Prisma Client を使うための import
 from app.db import prisma_client
 
+# 負荷試験モードの認証
+from app.dependencies import (
+    LOAD_TEST_MODE,
+    verify_firebase_token,
+    verify_load_test_token,
+)
+
+# 犬のひとことをまとめて保存する書き込みキュー
+from app.services.message_log_queue import message_log_queue
+
+# Stripe APIのコネクションプールを持つCheckoutセッションサービス
+from app.services.stripe_service import checkout_service
+
+# アウトボックスのリレー（配信）と、他プロセスからの配信の購読
+from app.services.outbox import outbox_relay, outbox_subscriber
+
+# 保存済みのStripe Webhookイベントを処理するバックグラウンドワーカー
+from app.services.webhook_worker import webhook_worker
+
+# webhook_eventsのパーティション作成・古いpayloadの退避を定期実行するタスク
+from app.services.webhook_retention import webhook_retention_task
+
+# レポート用のマテリアライズドビューを定期更新するタスク
+from app.services.reports import report_refresh_task
+
+
+# X-Profile ヘッダー付きのリクエストだけをサンプリングするプロファイラー
+from app.profiler import ProfileMiddleware
+
+
+# イベントループの遅れの計測（デバッグ時はブロッキング呼び出しのスタックも記録する）
+from app.loop_monitor import loop_monitor
+
 
 # FastAPI Exporterを使ってメトリクス収集のためimport
 from prometheus_fastapi_instrumentator import Instrumentator
+from app.metrics import metrics_endpoint
 
 
 # Prisma Client の lifespan context manager（FastAPI v0.95以降の推奨）
@@ -39,19 +90,44 @@ async def lifespan(_: FastAPI):
     """起動時と終了時の処理をまとめて管理"""
     # Redis接続
     # NOTE: Redisはローカル環境（localhost:6379）を想定しているため、Docker環境では別途設定が必要
-    redis_client = redis.Redis(host="localhost", port=6379, decode_responses=True)
+    redis_client = TracedRedis(host="localhost", port=6379, decode_responses=True)
 
     # FastAPICacheを先に初期化
     FastAPICache.init(RedisBackend(redis_client), prefix="fastapi-cache")
 
     # Prisma起動
     await prisma_client.connect()  # 起動時の処理
+    await loop_monitor.start()
+    await message_log_queue.start()
+    await outbox_subscriber.start()
+    await outbox_relay.start()
+    await webhook_worker.start()
+    await webhook_retention_task.start()
+    await report_refresh_task.start()
     yield
+    await report_refresh_task.stop()
+    await webhook_retention_task.stop()
+    await webhook_worker.stop()  # 処理中のWebhookイベントを終えてから停止
+    await outbox_relay.stop()  # 未配信の行は次回起動時に配信される
+    await outbox_subscriber.stop()
+    await message_log_queue.stop()  # 残っているメッセージを書き出してから切断
+    await checkout_service.close()
+    await loop_monitor.stop()
     await prisma_client.disconnect()  # 終了時の処理
+    shutdown_tracing()  # 未送信のスパンを書き出す
 
 
 # lifespanを使ったFastAPIインスタンス
-app = FastAPI(lifespan=lifespan)
+# レスポンスのJSONは orjson で作る（検証済みの値を返すルートは app/responses.py の TrustedJSONResponse）
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# 負荷試験モードでは、Firebaseの代わりに "Bearer loadtest-<n>" をUIDとして受け付ける
+# （tests/benchmark/loadtest.py から認証付きのAPIを叩くため。本番では有効にしない）
+if LOAD_TEST_MODE:
+    get_logger(__name__).warning(
+        "LOAD_TEST_MODE が有効です。IDトークンを検証せずに loadtest- で始まるUIDを受け付けます"
+    )
+    app.dependency_overrides[verify_firebase_token] = verify_load_test_token
 
 origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
 # CORSの設定
@@ -62,6 +138,12 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# X-Profile に PROFILER_TOKEN が付いたリクエストをプロファイルし、X-Profile-Id で返す
+app.add_middleware(ProfileMiddleware)
+# リクエストごとのサーバースパン（DB・Redis・外部APIの呼び出しはその子スパンになる）
+app.add_middleware(TracingMiddleware)
+# リクエストごとの request_id をログに付け、X-Request-ID で返す
+app.add_middleware(RequestContextMiddleware)
 
 # ルーターを登録
 app.include_router(user_router)
@@ -71,6 +153,8 @@ app.include_router(reflection_notes_router)
 app.include_router(message_logs_router)
 app.include_router(payment_router)
 app.include_router(webhook_events_router)
+app.include_router(reports_router)
+app.include_router(debug_router)
 
 
 # ルートパス
@@ -81,7 +165,9 @@ async def read_root():
 
 
 # メトリクス収集器の初期化と有効化
-Instrumentator().instrument(app).expose(app)
+# /metrics は複数ワーカーの値を集計できるよう app.metrics 側で返す
+Instrumentator().instrument(app)
+app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
 
 
 # レスポンスタイム遅延テスト用エンドポイント
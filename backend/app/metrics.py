@@ -0,0 +1,129 @@
+# 外部依存（Firebase・Prisma・Redis・OpenAI・Stripe）ごとのレイテンシーのヒストグラム
+# Instrumentator のリクエスト全体のレイテンシーだけでは、どこで時間を使ったか分からないため、
+# 呼び出し先ごとに p95/p99 を出せるようにする（Grafanaの dependency_latency ダッシュボードで表示）。
+# ラベルの値はスキーマやコードで決まる有限の集合に限る（ユーザーIDやSQL文は入れない）。
+# 複数ワーカーで動かす場合は PROMETHEUS_MULTIPROC_DIR を設定し、全ワーカーが同じディレクトリに
+# 書き出した値を /metrics でまとめて返す（gunicorn.conf.py がディレクトリの初期化と停止したワーカーの掃除を行う）。
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.requests import Request
+from starlette.responses import Response
+
+# 成功・失敗どちらの呼び出しも記録する（outcome ラベル）
+OK = "ok"
+ERROR = "error"
+
+FIREBASE_VERIFY_SECONDS = Histogram(
+    "firebase_token_verification_seconds",
+    "FirebaseのIDトークン検証にかかった時間（公開鍵の取得を含む）",
+    ["outcome"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+PRISMA_QUERY_SECONDS = Histogram(
+    "prisma_query_duration_seconds",
+    "Prismaのクエリエンジンへの1クエリの所要時間",
+    ["model", "operation", "outcome"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+REDIS_COMMAND_SECONDS = Histogram(
+    "redis_command_duration_seconds",
+    "Redisの1コマンドの所要時間",
+    ["command", "outcome"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+OPENAI_COMPLETION_SECONDS = Histogram(
+    "openai_completion_duration_seconds",
+    "OpenAIのメッセージ生成にかかった時間（stream は最後のトークンまで）",
+    ["mode", "outcome"],
+    buckets=(0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 30.0),
+)
+STRIPE_REQUEST_SECONDS = Histogram(
+    "stripe_request_duration_seconds",
+    "Stripe APIの1リクエストの所要時間",
+    ["operation", "outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0),
+)
+# イベントループの遅れ（ブロッキング呼び出しがあると、その間ほかのリクエストが止まる）
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "event_loop_lag_seconds",
+    "イベントループの遅れ（予定した時刻から実際に再開できるまでの時間）",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+EVENT_LOOP_BLOCKED = Counter(
+    "event_loop_blocked_total",
+    "イベントループが LOOP_BLOCK_THRESHOLD_SECONDS 以上止まった回数（ウォッチドッグ有効時のみ）",
+)
+
+# ラベルに使うRedisコマンド（それ以外は other にまとめる）
+_REDIS_COMMANDS = {
+    "GET",
+    "SET",
+    "SETEX",
+    "MGET",
+    "DEL",
+    "EXPIRE",
+    "TTL",
+    "HGET",
+    "HSET",
+    "HDEL",
+    "PUBLISH",
+    "PING",
+}
+
+
+def redis_command_label(command: str) -> str:
+    """Redisコマンド名をラベルの値にする（想定外のコマンドで系列が増えないように）"""
+    command = command.upper()
+    return command if command in _REDIS_COMMANDS else "other"
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels) -> Iterator[None]:
+    """
+    ブロックの所要時間をヒストグラムに記録する（例外で抜けた場合は outcome=error）
+
+    使い方:
+        with timed(STRIPE_REQUEST_SECONDS, operation="checkout.sessions.create"):
+            ...
+    """
+    started = time.perf_counter()
+    outcome = ERROR
+    try:
+        yield
+        outcome = OK
+    finally:
+        histogram.labels(outcome=outcome, **labels).observe(
+            time.perf_counter() - started
+        )
+
+
+def collect_metrics() -> bytes:
+    """
+    /metrics の本文を作る
+
+    PROMETHEUS_MULTIPROC_DIR が設定されていれば、全ワーカーが書き出した値を集計する
+    （どのワーカーがスクレイプを受けても同じ結果になる）。
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+async def metrics_endpoint(_: Request) -> Response:
+    """Prometheusがスクレイプするエンドポイント（Instrumentatorとアプリ独自のメトリクスの両方）"""
+    return Response(collect_metrics(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,240 @@
+"""稼働中のワーカー向けのサンプリングプロファイラー
+
+- 別スレッドから一定間隔で各スレッドのスタック（sys._current_frames）を読むだけなので、
+  計測対象のコードには手を入れず、オーバーヘッドも間隔に比例して小さい
+- 結果は collapsed stacks（flamegraph.pl などに渡せる形式）か speedscope のJSONで返す
+- X-Profile ヘッダーに PROFILER_TOKEN を付けたリクエストだけを個別に計測できる
+  （ProfileMiddleware。結果は X-Profile-Id で /api/debug/profiles/{id} から取得する）
+"""
+
+import asyncio
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import Optional
+
+# 既定のサンプリング間隔（秒）
+PROFILER_INTERVAL_SECONDS = float(os.getenv("PROFILER_INTERVAL_SECONDS", "0.01"))
+# X-Profile ヘッダーで個別計測を許可するトークン（未設定なら個別計測は無効）
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")
+# 個別計測の結果をいくつまで保持するか
+PROFILER_KEEP = int(os.getenv("PROFILER_KEEP", "20"))
+# 1リクエストは短いので、個別計測は細かい間隔で取る
+# （CPUを使い続けるコードの間は、GILの切り替え間隔 sys.getswitchinterval() より細かくは取れない）
+REQUEST_INTERVAL_SECONDS = 0.001
+
+# (ファイル名, 関数名, 定義行)
+FrameKey = tuple
+
+
+@dataclass
+class Profile:
+    """サンプリング結果（同じスタックが何回観測されたか）"""
+
+    name: str
+    interval: float
+    started_at: float
+    duration: float = 0.0
+    stacks: Counter = field(default_factory=Counter)
+
+    @property
+    def samples(self) -> int:
+        """サンプル数"""
+        return sum(self.stacks.values())
+
+    def to_collapsed(self) -> str:
+        """
+        collapsed stacks 形式（"呼び出し元;…;呼び出し先 回数" を1行ずつ）にする
+
+        flamegraph.pl や speedscope にそのまま読み込める。
+        """
+        lines = [
+            ";".join(_frame_label(frame) for frame in stack) + f" {count}"
+            for stack, count in self.stacks.most_common()
+        ]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def to_speedscope(self) -> dict:
+        """speedscope（https://www.speedscope.app）の sampled プロファイルにする"""
+        frame_index: dict = {}
+        frames = []
+        samples = []
+        weights = []
+        for stack, count in self.stacks.most_common():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    filename, function, line = frame
+                    frames.append({"name": function, "file": filename, "line": line})
+                indexes.append(frame_index[frame])
+            samples.append(indexes)
+            weights.append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": "wan-mission",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": self.name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": self.duration,
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+
+
+def _frame_label(frame: FrameKey) -> str:
+    filename, function, line = frame
+    return f"{function} ({os.path.basename(filename)}:{line})"
+
+
+class SamplingProfiler:
+    """
+    別スレッドで interval ごとにスタックを記録するプロファイラー
+
+    Args:
+        name (str): プロファイルの名前（speedscope の表示名）
+        interval (float): サンプリング間隔（秒）
+        thread_ids (set | None): 計測するスレッド（None なら自分以外の全スレッド）
+        root_frame (FrameType | None): このフレームを含むスタックだけを記録する
+            （同じイベントループ上の他のリクエストを除くため）
+    """
+
+    def __init__(
+        self,
+        name: str = "profile",
+        *,
+        interval: float = PROFILER_INTERVAL_SECONDS,
+        thread_ids: Optional[set] = None,
+        root_frame: Optional[FrameType] = None,
+        max_depth: int = 128,
+    ):
+        self.profile = Profile(name=name, interval=interval, started_at=time.time())
+        self.thread_ids = thread_ids
+        self.root_frame = root_frame
+        self.max_depth = max_depth
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SamplingProfiler":
+        """サンプリングを開始する"""
+        self.profile.started_at = time.time()
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> Profile:
+        """サンプリングを止めて結果を返す（サンプリングスレッドの終了を待つ）"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.profile.duration = time.time() - self.profile.started_at
+        return self.profile
+
+    async def stop_async(self) -> Profile:
+        """
+        イベントループを止めずに stop() する（async のコードからはこちらを使う）
+
+        停止の合図はすぐに出し、スレッドの終了は別スレッドで待つ。
+        待っている間にキャンセルされても、サンプリングスレッドは止まる。
+        """
+        self._stopped.set()
+        return await asyncio.to_thread(self.stop)
+
+    def sample(self) -> None:
+        """全スレッドのスタックを1回記録する"""
+        own = threading.get_ident()
+        for (
+            thread_id,
+            frame,
+        ) in sys._current_frames().items():  # pylint: disable=protected-access
+            if thread_id == own:
+                continue
+            if self.thread_ids is not None and thread_id not in self.thread_ids:
+                continue
+            stack = []
+            found_root = self.root_frame is None
+            while frame is not None and len(stack) < self.max_depth:
+                if frame is self.root_frame:
+                    found_root = True
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_name, code.co_firstlineno))
+                frame = frame.f_back
+            if found_root and stack:
+                self.profile.stacks[tuple(reversed(stack))] += 1
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.profile.interval):
+            self.sample()
+
+
+# X-Profile で計測したリクエストのプロファイル（新しいものから PROFILER_KEEP 件）
+recent_profiles: "OrderedDict[str, Profile]" = OrderedDict()
+
+
+def remember_profile(profile_id: str, profile: Profile) -> None:
+    """個別計測の結果を保持する（古いものから捨てる）"""
+    recent_profiles[profile_id] = profile
+    while len(recent_profiles) > PROFILER_KEEP:
+        recent_profiles.popitem(last=False)
+
+
+class ProfileMiddleware:
+    """
+    X-Profile ヘッダーに PROFILER_TOKEN が付いたリクエストだけをプロファイルするASGIミドルウェア
+
+    イベントループのスレッドで、このリクエストの処理中に取れたスタックだけを記録する。
+    レスポンスには X-Profile-Id を付けるので、/api/debug/profiles/{id} で結果を取得する。
+    """
+
+    def __init__(self, app, token: Optional[str] = None):
+        self.app = app
+        self.token = PROFILER_TOKEN if token is None else token
+
+    def _requested(self, scope) -> bool:
+        if not self.token:
+            return False
+        for name, value in scope.get("headers", []):
+            if name == b"x-profile":
+                return hmac.compare_digest(value, self.token.encode())
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        profiler = SamplingProfiler(
+            f"{scope.get('method', 'GET')} {scope.get('path', '')}",
+            interval=REQUEST_INTERVAL_SECONDS,
+            thread_ids={threading.get_ident()},
+            # このコルーチンのフレームを含むスタック＝このリクエストの処理
+            root_frame=sys._getframe(),  # pylint: disable=protected-access
+        ).start()
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            remember_profile(profile_id, await profiler.stop_async())
@@ -0,0 +1,43 @@
+# JSONレスポンスの作成（orjson）
+# アプリ全体の default_response_class は ORJSONResponse（main.py）。ハンドラーが返した値は、
+# response_model があればモデルで検証し直してから、なければ jsonable_encoder で1つずつ変換してから JSON になる。
+# 返す値をハンドラー自身が組み立てていて型が決まっているルートは TrustedJSONResponse を返し、
+# この2回目の検証・変換を飛ばす（レスポンスを返すと FastAPI は response_model を使わない）。
+# response_model はドキュメント（OpenAPI）のためにデコレーターに残しておく。
+
+from typing import Any
+
+from fastapi.responses import ORJSONResponse
+from fastapi_cache.coder import JsonCoder
+from pydantic import BaseModel
+
+
+class TrustedJSONResponse(ORJSONResponse):
+    """検証済みの値をそのまま JSON にするレスポンス
+
+    content は pydantic のモデル（pydantic-core でそのまま JSON にする）、
+    orjson で JSON にできる値（dict/list/str/int/bool/None/datetime など）、
+    またはエンコード済みの JSON（bytes）。
+    status_code はデコレーターの値が使われないので、200 以外は指定すること。
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        if isinstance(content, BaseModel):
+            return content.model_dump_json().encode()
+        return super().render(content)
+
+
+class TrustedJSONCoder(JsonCoder):
+    """TrustedJSONResponse を返すルートの @cache 用のコーダー
+
+    保存するのはレスポンスの本文（JsonCoder と同じ）。キャッシュヒット時は本文を dict に戻さず、
+    そのまま TrustedJSONResponse にして返す。
+    """
+
+    @classmethod
+    def decode(cls, value: Any) -> TrustedJSONResponse:
+        if isinstance(value, str):
+            value = value.encode()
+        return TrustedJSONResponse(value)
@@ -15,10 +15,14 @@ from app.schemas.care_logs import (
     CareLogTodayResponse,
 )
 from app.dependencies import verify_firebase_token
+from app.responses import TrustedJSONCoder, TrustedJSONResponse
 
 # キャッシュ導入によるデコレーターをインポート
 from fastapi_cache.decorator import cache
 from fastapi_cache.key_builder import default_key_builder
+from app.logger import get_logger
+
+logger = get_logger(__name__)
 
 care_logs_router = APIRouter(prefix="/api/care_logs", tags=["care_logs"])
 
@@ -37,7 +41,7 @@ async def update_care_log(
     お世話記録の更新API（fed_morning / fed_night / walk_result の部分更新）
     """
     try:
-        print(f"[care_logs] PATCH受信: care_log_id={care_log_id}, request={request}")
+        logger.debug("PATCH受信: care_log_id=%s, request=%s", care_log_id, request)
 
         # care_log_id と firebase_uid が紐づくかチェック（不正なIDで他人のログ更新を防ぐ）
         existing_log = await prisma_client.care_logs.find_first(
@@ -48,24 +52,24 @@ async def update_care_log(
         )
 
         if not existing_log:
-            print(f"[care_logs] care_log not found or not authorized: {care_log_id}")
+            logger.info("care_log not found or not authorized: %s", care_log_id)
             raise HTTPException(status_code=404, detail="Care log not found")
 
         update_data = request.model_dump(exclude_unset=True)
-        print(f"[care_logs] 更新データ: {update_data}")
+        logger.debug("更新データ: %s", update_data)
 
         updated_log = await prisma_client.care_logs.update(
             where={"id": care_log_id},
             data=update_data,
         )
 
-        print(f"[care_logs] 更新成功: {updated_log.id}")
+        logger.info("更新成功: %s", updated_log.id)
         return updated_log
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[care_logs] PATCH エラー詳細: {type(e).__name__}: {e}")
+        logger.error("PATCH エラー詳細: %s: %s", type(e).__name__, e)
         raise HTTPException(
             status_code=500,
             detail="お世話記録の更新中にエラーが発生しました",
@@ -86,7 +90,7 @@ async def create_care_log(
     ※ 通常は1日1件。重複記録は不可（エラー返却）
     """
     try:
-        print(f"[care_logs] POST受信: firebase_uid={firebase_uid}, request={request}")
+        logger.debug("POST受信: firebase_uid=%s, request=%s", firebase_uid, request)
 
         # UID → users.id を取得
         user = await prisma_client.users.find_unique(
@@ -108,19 +112,19 @@ async def create_care_log(
         )
 
         if existing_log:
-            print(f"[care_logs] 既存記録発見: {existing_log.id}")
+            logger.info("既存記録発見: %s", existing_log.id)
             raise HTTPException(
                 status_code=400,
                 detail="この日付の記録は既に存在します。PATCHで更新してください。",
             )
 
         # 新規作成
-        print(f"[care_logs] POST受信: firebase_uid={firebase_uid}, request={request}")
-        print(f"[care_logs] 新規記録作成: request={request}, date={request.date}")
+        logger.debug("POST受信: firebase_uid=%s, request=%s", firebase_uid, request)
+        logger.info("新規記録作成: request=%s, date=%s", request, request.date)
         dt = datetime.fromisoformat(request.date)
-        print(f"[care_logs] 日付変換成功: {dt}")
+        logger.debug("日付変換成功: %s", dt)
         formatted_date = dt.strftime("%Y-%m-%d")
-        print(f"[care_logs] フォーマット済み日付: {formatted_date}")
+        logger.debug("フォーマット済み日付: %s", formatted_date)
         new_log = await prisma_client.care_logs.create(
             data={
                 "care_setting_id": care_setting.id,
@@ -132,13 +136,13 @@ async def create_care_log(
             }
         )
 
-        print(f"[care_logs] 新規記録作成成功: {new_log.id}")
+        logger.info("新規記録作成成功: %s", new_log.id)
         return new_log
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[care_logs] POST エラー詳細: {type(e).__name__}: {e}")
+        logger.error("POST エラー詳細: %s: %s", type(e).__name__, e)
         raise HTTPException(
             status_code=500, detail="お世話記録の登録中にエラーが発生しました"
         ) from e
@@ -159,11 +163,12 @@ async def get_today_care_log(
     指定日付文字列（例: "2025-07-01"）のお世話記録と散歩タスク完了状況を取得するAPI
     """
     try:
-        print(
-            f"[care_logs] GET today受信: "
-            f"care_setting_id={care_setting_id}, firebase_uid={firebase_uid}"
+        logger.debug(
+            "GET today受信: care_setting_id=%s, firebase_uid=%s",
+            care_setting_id,
+            firebase_uid,
         )
-        print(f"[care_logs] 検索日付: {date}")
+        logger.debug("検索日付: %s", date)
 
         # care_setting_id が本人のものか確認
         care_setting = await prisma_client.care_settings.find_first(
@@ -181,14 +186,14 @@ async def get_today_care_log(
         )
 
         if not care_log:
-            print("[care_logs] 今日の記録なし、デフォルト値で返却")
+            logger.info("今日の記録なし、デフォルト値で返却")
             return CareLogTodayResponse(
                 care_log_id=None,
                 fed_morning=False,
                 fed_night=False,
                 walked=False,
             )
-        print(f"[care_logs] 今日の記録取得成功: {care_log.id}")
+        logger.info("今日の記録取得成功: %s", care_log.id)
         return CareLogTodayResponse(
             care_log_id=care_log.id,
             fed_morning=care_log.fed_morning or False,
@@ -199,7 +204,7 @@ async def get_today_care_log(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[care_logs] GET today エラー詳細: {type(e).__name__}: {e}")
+        logger.error("GET today エラー詳細: %s: %s", type(e).__name__, e)
         raise HTTPException(
             status_code=500,
             detail="今日のお世話記録取得中にエラーが発生しました",
@@ -221,14 +226,15 @@ async def get_care_log_by_date(
     """
     指定日付文字列（例: "2025-07-01"）のお世話記録を取得するAPI
     """
-    print("🔥 /by_date：キャッシュ未使用時だけ表示される！")
+    logger.debug("/by_date：キャッシュ未使用時だけ表示される！")
 
     try:
-        print(
-            f"[care_logs] GET by_date受信: "
-            f"care_setting_id={care_setting_id}, firebase_uid={firebase_uid}"
+        logger.debug(
+            "GET by_date受信: care_setting_id=%s, firebase_uid=%s",
+            care_setting_id,
+            firebase_uid,
         )
-        print(f"[care_logs] 検索日付: {date}")
+        logger.debug("検索日付: %s", date)
 
         # care_setting_id が本人のものか確認
         care_setting = await prisma_client.care_settings.find_first(
@@ -262,7 +268,7 @@ async def get_care_log_by_date(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[care_logs] GET by_date エラー詳細: {type(e).__name__}: {e}")
+        logger.error("GET by_date エラー詳細: %s: %s", type(e).__name__, e)
         raise HTTPException(
             status_code=500,
             detail="指定日の記録取得中にエラーが発生しました",
@@ -274,7 +280,9 @@ async def get_care_log_by_date(
     "/list",
     status_code=status.HTTP_200_OK,
 )
-@cache(expire=60, key_builder=default_key_builder)  # 60秒（1分）キャッシュ
+@cache(
+    expire=60, key_builder=default_key_builder, coder=TrustedJSONCoder
+)  # 60秒（1分）キャッシュ
 async def get_care_logs_list(
     care_setting_id: int = Query(...),
     firebase_uid: str = Depends(verify_firebase_token),
@@ -282,10 +290,10 @@ async def get_care_logs_list(
     """
     特定care_setting_idの全care_logsを取得するAPI
     """
-    print("🔥 /list：キャッシュ未使用時だけ表示される！")
+    logger.debug("/list：キャッシュ未使用時だけ表示される！")
 
     try:
-        print(f"[care_logs] GET list受信: care_setting_id={care_setting_id}")
+        logger.debug("GET list受信: care_setting_id=%s", care_setting_id)
 
         # care_setting_id が本人のものか確認
         care_setting = await prisma_client.care_settings.find_first(
@@ -300,26 +308,25 @@ async def get_care_logs_list(
             order={"date": "asc"},
         )
 
-        print(f"[care_logs] 取得したcare_logs数: {len(care_logs)}")
-
-        # 必要な情報のみ返却
-        result = []
-        for log in care_logs:
-            result.append(
-                {
-                    "id": log.id,
-                    "date": log.date,
-                    "walk_result": log.walk_result,
-                    "care_setting_id": log.care_setting_id,
-                }
-            )
+        logger.debug("取得したcare_logs数: %s", len(care_logs))
+
+        # 必要な情報のみ返却（値はすべてJSONの型なので、jsonable_encoder を通さずにJSONにする）
+        result = [
+            {
+                "id": log.id,
+                "date": log.date,
+                "walk_result": log.walk_result,
+                "care_setting_id": log.care_setting_id,
+            }
+            for log in care_logs
+        ]
 
-        return {"care_logs": result}
+        return TrustedJSONResponse({"care_logs": result})
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[care_logs] GET list エラー詳細: {type(e).__name__}: {e}")
+        logger.error("GET list エラー詳細: %s: %s", type(e).__name__, e)
         raise HTTPException(
             status_code=500,
             detail="care_logs一覧取得中にエラーが発生しました",
@@ -18,9 +18,13 @@ from app.schemas.care_settings import (
 )
 
 from app.dependencies import verify_firebase_token
+from app.responses import TrustedJSONCoder, TrustedJSONResponse
 
 from fastapi_cache.decorator import cache
 from fastapi_cache.key_builder import default_key_builder
+from app.logger import get_logger
+
+logger = get_logger(__name__)
 
 care_settings_router = APIRouter(prefix="/api/care_settings", tags=["care_settings"])
 
@@ -69,7 +73,8 @@ async def create_care_setting(
             }
         )
 
-        return CareSettingCreateResponse(
+        # 組み立てたモデルをそのままJSONにする（response_model で検証し直さない）
+        response = CareSettingCreateResponse(
             id=care_setting.id,
             user_id=care_setting.user_id,
             parent_name=care_setting.parent_name,
@@ -85,6 +90,7 @@ async def create_care_setting(
             created_at=care_setting.created_at,
             updated_at=care_setting.updated_at,
         )
+        return TrustedJSONResponse(response, status_code=status.HTTP_201_CREATED)
 
     except HTTPException:
         raise
@@ -100,15 +106,17 @@ async def create_care_setting(
     response_model=CareSettingMeResponse,
     status_code=status.HTTP_200_OK,
 )
-@cache(expire=60, key_builder=default_key_builder)  # キャッシュ追加
+@cache(
+    expire=60, key_builder=default_key_builder, coder=TrustedJSONCoder
+)  # キャッシュ追加
 async def get_my_care_setting(firebase_uid: str = Depends(verify_firebase_token)):
     """
     ログインユーザーのケア設定取得API
     """
-    print("🔥 /me：キャッシュ未使用時だけ表示される！")
+    logger.debug("/me：キャッシュ未使用時だけ表示される！")
 
     try:
-        print("✅ firebase_uid:", firebase_uid)
+        logger.debug("firebase_uid: %s", firebase_uid)
         # Firebase UID からユーザー取得
         user = await prisma_client.users.find_unique(
             where={"firebase_uid": firebase_uid}
@@ -121,21 +129,23 @@ async def get_my_care_setting(firebase_uid: str = Depends(verify_firebase_token)
             where={"user_id": user.id}
         )
 
-        print("✅ care_setting:", care_setting)
+        logger.debug("care_setting: %s", care_setting)
 
         if not care_setting:
             raise HTTPException(status_code=404, detail="Care setting not found")
 
-        return CareSettingMeResponse(
-            id=care_setting.id,
-            parent_name=care_setting.parent_name,
-            child_name=care_setting.child_name,
-            dog_name=care_setting.dog_name,
-            care_start_date=care_setting.care_start_date.date(),
-            care_end_date=care_setting.care_end_date.date(),
-            morning_meal_time=care_setting.morning_meal_time.time(),
-            night_meal_time=care_setting.night_meal_time.time(),
-            walk_time=care_setting.walk_time.time(),
+        return TrustedJSONResponse(
+            CareSettingMeResponse(
+                id=care_setting.id,
+                parent_name=care_setting.parent_name,
+                child_name=care_setting.child_name,
+                dog_name=care_setting.dog_name,
+                care_start_date=care_setting.care_start_date.date(),
+                care_end_date=care_setting.care_end_date.date(),
+                morning_meal_time=care_setting.morning_meal_time.time(),
+                night_meal_time=care_setting.night_meal_time.time(),
+                walk_time=care_setting.walk_time.time(),
+            )
         )
 
     except HTTPException:
@@ -0,0 +1,102 @@
+"""稼働中のワーカーを調べるためのデバッグ用（debug）APIルーターの定義"""
+
+# 標準ライブラリ
+import asyncio
+from typing import Literal
+
+# サードパーティライブラリ
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+# ローカルアプリケーション
+from app.dependencies import verify_admin
+from app.logger import get_logger
+from app.profiler import Profile, SamplingProfiler, recent_profiles
+from app.schemas.debug import ProfileListResponse, ProfileSummary
+
+logger = get_logger(__name__)
+
+debug_router = APIRouter(prefix="/api/debug", tags=["debug"])
+
+# 同じワーカーで複数のプロファイラーを同時に動かさない
+_profile_lock = asyncio.Lock()
+
+ProfileFormat = Literal["collapsed", "speedscope"]
+
+
+def render_profile(profile: Profile, output: str):
+    """プロファイルを指定の形式のレスポンスにする"""
+    if output == "speedscope":
+        return JSONResponse(
+            profile.to_speedscope(),
+            headers={
+                "Content-Disposition": "attachment; filename=profile.speedscope.json"
+            },
+        )
+    return PlainTextResponse(profile.to_collapsed())
+
+
+@debug_router.get("/profile", status_code=status.HTTP_200_OK)
+async def profile_worker(
+    seconds: float = Query(10.0, gt=0, le=60, description="計測する秒数"),
+    interval_ms: float = Query(10.0, ge=1, le=1000, description="サンプリング間隔（ミリ秒）"),
+    output: ProfileFormat = Query("collapsed", alias="format"),
+    _admin_uid: str = Depends(verify_admin),
+):
+    """
+    このリクエストを受けたワーカーの全スレッドを seconds 秒間サンプリングして返すAPI（管理者のみ）
+
+    計測中もイベントループは止めないので、ほかのリクエストはそのまま処理される。
+    複数ワーカーで動かしている場合は、どれか1つのワーカーの結果になる。
+    """
+    if _profile_lock.locked():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="このワーカーではすでにプロファイルを計測中です",
+        )
+
+    async with _profile_lock:
+        profiler = SamplingProfiler("worker", interval=interval_ms / 1000).start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profile = await profiler.stop_async()
+
+    logger.info("プロファイルを計測しました: seconds=%s samples=%s", seconds, profile.samples)
+    return render_profile(profile, output)
+
+
+@debug_router.get(
+    "/profiles",
+    response_model=ProfileListResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def list_profiles(_admin_uid: str = Depends(verify_admin)):
+    """X-Profile ヘッダーで計測したリクエストのプロファイルを新しい順に返すAPI（管理者のみ）"""
+    return ProfileListResponse(
+        profiles=[
+            ProfileSummary(
+                profile_id=profile_id,
+                name=profile.name,
+                samples=profile.samples,
+                duration=profile.duration,
+            )
+            for profile_id, profile in reversed(recent_profiles.items())
+        ]
+    )
+
+
+@debug_router.get("/profiles/{profile_id}", status_code=status.HTTP_200_OK)
+async def get_profile(
+    profile_id: str,
+    output: ProfileFormat = Query("collapsed", alias="format"),
+    _admin_uid: str = Depends(verify_admin),
+):
+    """X-Profile-Id で返したプロファイルを取得するAPI（管理者のみ）"""
+    profile = recent_profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="プロファイルが見つかりません（古いものは破棄されます）",
+        )
+    return render_profile(profile, output)
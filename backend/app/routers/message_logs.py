@@ -3,23 +3,106 @@
 無料プランは固定メッセージ、プレミアムはOpenAIで生成。
 """
 
+import asyncio
+import json
 import os
 import random
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import JSONResponse
-from app.db import prisma_client
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Optional
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.services.entitlements import entitlement_service
 from app.dependencies import verify_firebase_token
-from openai import OpenAI, OpenAIError
+from app.logger import get_logger
+from app.services.message_log_queue import message_log_queue
+from app.services.resilience import CircuitBreaker, hedged_call
+from app.metrics import ERROR, OK, OPENAI_COMPLETION_SECONDS, timed
+from app.tracing import open_span, span
+from openai import AsyncOpenAI, OpenAI, OpenAIError
+
+logger = get_logger(__name__)
 
 message_logs_router = APIRouter(prefix="/api/message_logs", tags=["message_logs"])
 
 # To-do: ひらがなにする
 FREE_PLAN_MESSAGES = ["わん！", "おなかすいたわん！", "おさんぽいくわん！"]
 
+OPENAI_MODEL = "gpt-4o-mini"
+
+# OpenAIが劣化したときに毎回タイムアウトまで待たないためのサーキットブレーカー
+# 開いている間は固定メッセージを即座に返す
+llm_breaker = CircuitBreaker(
+    "openai",
+    failure_rate_threshold=float(os.getenv("OPENAI_BREAKER_FAILURE_RATE", "0.5")),
+    slow_call_seconds=float(os.getenv("OPENAI_BREAKER_SLOW_CALL_SECONDS", "3.0")),
+    open_seconds=float(os.getenv("OPENAI_BREAKER_OPEN_SECONDS", "30")),
+)
+
+# p95レイテンシを過ぎても返ってこない場合に2本目を投げる（ヘッジリクエスト）
+OPENAI_HEDGE_ENABLED = os.getenv("OPENAI_HEDGE_ENABLED", "false").lower() == "true"
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="openai-hedge")
+
+SYSTEM_PROMPT = (
+    "あなたは犬のキャラクターです。8歳の子どもに話しかけるようにお世話知識を一言で話して。"
+    "漢字使用禁止です。"
+    "「犬は」という主語を使わないでください。"
+    "飼う前に必ず知っておいて欲しい教育豆知識を教えて下さい。"
+    "1犬の習性"
+    "2犬の迷惑なところ"
+    "3躾しないといけないこと"
+    "4犬の病気、医学知識"
+    "今回は「{step}」番のことを1つだけ話してほしいです。"
+    "条件"
+    "お散歩以外の豆知識を順番に出してください。"
+    "ひらがな厳守"
+    "語尾には「〜だわん」「〜するわん」など犬っぽい言い方を必ずつけてください。"
+    "20文字以内の一文で答えてください。"
+    "「犬は」と冒頭につけないでください。"
+)
+
+
+def _request_openai_message(api_key: str) -> str:
+    """
+    OpenAI APIを1回呼び出してメッセージを生成する（フォールバックなし）
+
+    Args:
+        api_key (str): OpenAIのAPIキー
+
+    Returns:
+        str: 生成されたメッセージ
+
+    Raises:
+        OpenAIError: API呼び出しに失敗した場合
+        ValueError: 応答が空の場合
+    """
+    # クライアントを明示的に初期化
+    client = OpenAI(api_key=api_key)
+
+    response = client.chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=[
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT,
+            },
+        ],
+        max_tokens=30,
+        temperature=0.8,
+        timeout=10,
+    )
+
+    message = response.choices[0].message.content
+    if message:
+        return message.strip()
+
+    raise ValueError("OpenAIからの応答が空です")
+
 
 def get_openai_message() -> str:
     """
     OpenAI APIを呼び出してメッセージを生成する
+    サーキットブレーカーが開いている場合は呼び出さずに固定メッセージを返す
 
     Returns:
         str: 生成されたメッセージ
@@ -30,51 +113,200 @@ def get_openai_message() -> str:
         if not api_key:
             raise ValueError("OPENAI_API_KEY が設定されていません")
 
-        # クライアントを明示的に初期化
-        client = OpenAI(api_key=api_key)
+        if not llm_breaker.allow_request():
+            logger.warning("OpenAIのブレーカーが開いているため固定メッセージを返します")
+            return random.choice(FREE_PLAN_MESSAGES)
+
+        started = time.monotonic()
+        try:
+            hedge_delay = llm_breaker.latency_percentile(0.95)
+            hedged = OPENAI_HEDGE_ENABLED and hedge_delay is not None
+            # ヘッジの2本目は別スレッドで動くので、呼び出し全体を1つのスパンにする
+            with span(
+                "openai.chat.completions.create",
+                **{"peer.service": "openai", "gen_ai.request.model": OPENAI_MODEL},
+                hedged=hedged,
+            ), timed(OPENAI_COMPLETION_SECONDS, mode="completion"):
+                if hedged:
+                    message = hedged_call(
+                        lambda: _request_openai_message(api_key),
+                        hedge_delay,
+                        _hedge_executor,
+                        name="openai",
+                    )
+                else:
+                    message = _request_openai_message(api_key)
+        except (OpenAIError, ValueError):
+            llm_breaker.record_failure(time.monotonic() - started)
+            raise
+
+        llm_breaker.record_success(time.monotonic() - started)
+        return message
+
+    except OpenAIError as openai_error:
+        logger.error("OpenAI API エラー: %s", openai_error)
+        # エラーが発生した場合は固定メッセージを返す
+        return random.choice(FREE_PLAN_MESSAGES)
+    except ValueError as value_error:
+        logger.error("OpenAI API 設定エラー: %s", value_error)
+        return random.choice(FREE_PLAN_MESSAGES)
+
+
+async def stream_openai_message() -> AsyncIterator[str]:
+    """
+    OpenAI APIをストリーミングで呼び出し、生成されたトークンを順に返す
+
+    接続先は OPENAI_BASE_URL 環境変数で差し替え可能（テストではローカルのスタブサーバーを使う）。
+    呼び出し側がジェネレーターを閉じた場合（クライアント切断など）は上流のHTTP接続も閉じる。
+
+    Yields:
+        str: 生成されたトークン（1トークンも得られなかった場合は固定メッセージを1件）
+    """
+    received = False
+    requested = False
+    cancelled = False
+    started = time.monotonic()
+    # yield をまたぐのでコンテキストを切り替えないスパンにして、finally で閉じる
+    stream_span = open_span(
+        "openai.chat.completions.stream",
+        **{"peer.service": "openai", "gen_ai.request.model": OPENAI_MODEL},
+    )
+    try:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY が設定されていません")
+
+        if not llm_breaker.allow_request():
+            logger.warning("OpenAIのブレーカーが開いているため固定メッセージを返します")
+            yield random.choice(FREE_PLAN_MESSAGES)
+            return
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        requested = True
+        client = AsyncOpenAI(api_key=api_key)
+        stream = await client.chat.completions.create(
+            model=OPENAI_MODEL,
             messages=[
                 {
                     "role": "system",
-                    "content": (
-                        "あなたは犬のキャラクターです。8歳の子どもに話しかけるようにお世話知識を一言で話して。"
-                        "漢字使用禁止です。"
-                        "「犬は」という主語を使わないでください。"
-                        "飼う前に必ず知っておいて欲しい教育豆知識を教えて下さい。"
-                        "1犬の習性"
-                        "2犬の迷惑なところ"
-                        "3躾しないといけないこと"
-                        "4犬の病気、医学知識"
-                        "今回は「{step}」番のことを1つだけ話してほしいです。"
-                        "条件"
-                        "お散歩以外の豆知識を順番に出してください。"
-                        "ひらがな厳守"
-                        "語尾には「〜だわん」「〜するわん」など犬っぽい言い方を必ずつけてください。"
-                        "20文字以内の一文で答えてください。"
-                        "「犬は」と冒頭につけないでください。"
-                    ),
+                    "content": SYSTEM_PROMPT,
                 },
             ],
             max_tokens=30,
             temperature=0.8,
             timeout=10,
+            stream=True,
         )
-
-        message = response.choices[0].message.content
-        if message:
-            return message.strip()
-
-        raise ValueError("OpenAIからの応答が空です")
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if token:
+                    if not received:
+                        # ストリーミングでは最初のトークンまでの時間で健全性を判定する
+                        llm_breaker.record_success(time.monotonic() - started)
+                        stream_span.add_event("first_token")
+                    received = True
+                    yield token
+        finally:
+            # 途中で打ち切られた場合も上流の接続を確実に解放する
+            await stream.close()
 
     except OpenAIError as openai_error:
-        print(f"OpenAI API エラー: {openai_error}")
-        # エラーが発生した場合は固定メッセージを返す
-        return random.choice(FREE_PLAN_MESSAGES)
+        logger.error("OpenAI API ストリーミングエラー: %s", openai_error)
+        stream_span.record_exception(openai_error)
     except ValueError as value_error:
-        print(f"OpenAI API 設定エラー: {value_error}")
-        return random.choice(FREE_PLAN_MESSAGES)
+        logger.error("OpenAI API 設定エラー: %s", value_error)
+    except (asyncio.CancelledError, GeneratorExit):
+        cancelled = True
+        raise
+    finally:
+        stream_span.end()
+        # 最初のトークンが来なかった呼び出しは、理由によらずここで結果を記録する
+        # （記録しないと half_open のプローブ枠が open_seconds の間ふさがったままになる）
+        if requested and not received:
+            if cancelled:
+                # クライアントの切断はOpenAIの失敗ではないので、枠だけ返す
+                llm_breaker.release_probe()
+            else:
+                llm_breaker.record_failure(time.monotonic() - started)
+        if requested:
+            OPENAI_COMPLETION_SECONDS.labels(
+                mode="stream", outcome=OK if received else ERROR
+            ).observe(time.monotonic() - started)
+
+    if not received:
+        yield random.choice(FREE_PLAN_MESSAGES)
+
+
+def format_sse(data: dict, event: str | None = None) -> str:
+    """
+    Server-Sent Events の1イベント分の文字列を組み立てる
+
+    Args:
+        data (dict): data行にJSONとして載せる内容
+        event (str | None): イベント名（省略時はデフォルトの message イベント）
+
+    Returns:
+        str: SSEフォーマットの文字列
+    """
+    payload = json.dumps(data, ensure_ascii=False)
+    if event:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return f"data: {payload}\n\n"
+
+
+async def message_event_stream(
+    request: Request,
+    tokens: AsyncIterator[str],
+    on_complete: Optional[Callable[[str], None]] = None,
+) -> AsyncIterator[str]:
+    """
+    トークン列をSSEイベントに変換する。クライアントが切断したら生成を打ち切る。
+
+    Args:
+        request (Request): 切断検知に使うリクエスト
+        tokens (AsyncIterator[str]): 生成されたトークン列
+        on_complete (Optional[Callable[[str], None]]): 最後まで生成できたときに全文で呼ぶ
+
+    Yields:
+        str: SSEイベント（トークンごとの message イベントと、最後の done イベント）
+    """
+    chunks = []
+    try:
+        async for token in tokens:
+            if await request.is_disconnected():
+                logger.info("クライアント切断のためストリーミングを中断")
+                return
+            chunks.append(token)
+            yield format_sse({"token": token})
+
+        message = "".join(chunks).strip()
+        if on_complete is not None:
+            on_complete(message)
+        yield format_sse({"message": message}, event="done")
+    finally:
+        # ジェネレーターを明示的に閉じて上流（OpenAI）へのリクエストをキャンセルする
+        aclose = getattr(tokens, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def save_message_log(entitlement, message: str) -> None:
+    """
+    生成したメッセージを書き込みキューに積む（DB保存はバッチで非同期に行う）
+
+    Args:
+        entitlement (Entitlement): ユーザーIDとプラン
+        message (str): 生成されたメッセージ
+    """
+    is_llm_based = entitlement.is_premium and message not in FREE_PLAN_MESSAGES
+    message_log_queue.enqueue(entitlement.user_id, message, is_llm_based)
+
+
+async def _single_message(message: str) -> AsyncIterator[str]:
+    """固定メッセージを1トークンとして返すジェネレーター"""
+    yield message
 
 
 @message_logs_router.post("/generate")
@@ -96,27 +328,84 @@ async def generate_message_log(
         HTTPException: ユーザーが見つからない場合
     """
     try:
-        # firebase_uidからusersテーブルのuserを特定
-        user = await prisma_client.users.find_unique(
-            where={"firebase_uid": firebase_uid}
-        )
+        # firebase_uidからユーザーIDとプランを特定（キャッシュにあればDBは読まない）
+        user = await entitlement_service.get(firebase_uid)
 
         if not user:
             raise HTTPException(
                 status_code=400, detail="指定されたFirebase UIDのユーザーが存在しません"
             )
 
-        if user.current_plan == "premium":
+        if user.is_premium:
             # プレミアムプランの場合はOpenAI APIを使用
-            message = get_openai_message()
+            # 同期クライアントの呼び出しなので、イベントループを止めないよう別スレッドで待つ
+            message = await asyncio.to_thread(get_openai_message)
         else:
             # 無料プランの場合は固定メッセージからランダム選択
             message = random.choice(FREE_PLAN_MESSAGES)
 
+        # 保存はバックグラウンドでまとめて行い、レスポンスを待たせない
+        save_message_log(user, message)
+
         return JSONResponse(content={"message": message})
 
     except (KeyError, AttributeError, TypeError) as general_error:
-        print(f"[ERROR] generate_message_log: {general_error}")
+        logger.error("generate_message_log: %s", general_error)
         # 予期しないエラーの場合でも、最低限固定メッセージを返す
         fallback_message = random.choice(FREE_PLAN_MESSAGES)
         return JSONResponse(content={"message": fallback_message})
+
+
+@message_logs_router.get("/stream")
+async def stream_message_log(
+    request: Request,
+    firebase_uid: str = Depends(verify_firebase_token),
+) -> StreamingResponse:
+    """
+    犬のひとことを Server-Sent Events でストリーミング返却するAPI
+    プレミアムプラン：OpenAIの生成トークンを届いた順に送る（最初の1文字が早く表示される）
+    無料プラン：固定セリフを1イベントで送る
+
+    イベント形式:
+        data: {"token": "..."}            生成されたトークン
+        event: done / data: {"message": "..."}  生成完了（全文）
+
+    Args:
+        request (Request): クライアント切断の検知に使う
+        firebase_uid (str): Firebase認証UID
+
+    Returns:
+        StreamingResponse: text/event-stream のレスポンス
+
+    Raises:
+        HTTPException: ユーザーが見つからない場合
+    """
+    try:
+        user = await entitlement_service.get(firebase_uid)
+        if not user:
+            raise HTTPException(
+                status_code=400, detail="指定されたFirebase UIDのユーザーが存在しません"
+            )
+
+        if user.is_premium:
+            tokens = stream_openai_message()
+        else:
+            tokens = _single_message(random.choice(FREE_PLAN_MESSAGES))
+
+        def on_complete(message: str) -> None:
+            save_message_log(user, message)
+
+    except (KeyError, AttributeError, TypeError) as general_error:
+        logger.error("stream_message_log: %s", general_error)
+        tokens = _single_message(random.choice(FREE_PLAN_MESSAGES))
+        on_complete = None
+
+    return StreamingResponse(
+        message_event_stream(request, tokens, on_complete),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # リバースプロキシ（nginx等）のバッファリングを無効化
+            "X-Accel-Buffering": "no",
+        },
+    )
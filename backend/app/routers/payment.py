@@ -7,7 +7,10 @@ from fastapi.responses import JSONResponse
 
 # token追加
 from app.dependencies import verify_firebase_token
-from app.db import prisma_client
+from app.logger import get_logger
+from app.services.entitlements import entitlement_service
+
+logger = get_logger(__name__)
 
 payment_router = APIRouter(prefix="/api/payments", tags=["payments"])
 
@@ -23,22 +26,20 @@ async def create_checkout_session(
     → Stripe決済ページへのURLを返す
     """
     try:
-        print(f"[INFO] サーバーで取り出したFirebase UID: {firebase_uid}")
+        logger.info("サーバーで取り出したFirebase UID: %s", firebase_uid)
 
-        # ユーザー情報をDBから取得
-        user = await prisma_client.users.find_unique(
-            where={"firebase_uid": firebase_uid}
-        )
+        # ユーザーのプランを取得（キャッシュにあればDBは読まない）
+        user = await entitlement_service.get(firebase_uid)
 
         # 既にプレミアムプランなら弾く
-        if user and user.current_plan == "premium":
+        if user and user.is_premium:
             raise HTTPException(
                 status_code=400,
                 detail="すでにプレミアムプランです。再度の購入は不要です。",
             )
 
-        # StripeのCheckoutセッションを作成
-        session_url = stripe_service.create_checkout_session(firebase_uid)
+        # StripeのCheckoutセッションを作成（未完了のセッションがあればそのURLを再利用）
+        session_url = await stripe_service.create_checkout_session(firebase_uid)
 
         # セッションのURLを返す
         return JSONResponse(
@@ -50,7 +51,7 @@ async def create_checkout_session(
         # 400など自分で投げたものはそのまま返す
         raise e
     except Exception as e:
-        print(f"[ERROR] create_checkout_session: {e}")
+        logger.error("create_checkout_session: %s", e)
         raise HTTPException(
             status_code=500,
             detail="決済セッション生成中にサーバーエラーが発生しました",
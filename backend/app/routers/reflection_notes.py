@@ -10,6 +10,9 @@ from app.schemas.reflection_notes import (
 )
 
 from app.dependencies import verify_firebase_token
+from app.logger import get_logger
+
+logger = get_logger(__name__)
 
 # 反省文用のAPIルーターを作成
 reflection_notes_router = APIRouter(
@@ -30,7 +33,7 @@ async def create_reflection_note(
     """
     反省文の新規登録API（子ども）
     """
-    print("POST 受信:", note)
+    logger.debug("POST 受信: %s", note)
     try:
         # Firebase UID からユーザー取得
         user = await prisma_client.users.find_unique(
@@ -54,13 +57,13 @@ async def create_reflection_note(
                 "approved_by_parent": False,
             }
         )
-        print("作成結果:", result)
+        logger.debug("作成結果: %s", result)
         return result
 
     except HTTPException:
         raise
     except Exception as e:
-        print("🔥DBエラー詳細:", e)
+        logger.error("DBエラー詳細: %s", e)
         raise HTTPException(
             status_code=500, detail="DB登録時にエラーが発生しました"
         ) from e
@@ -89,7 +92,7 @@ async def get_reflection_notes(firebase_uid: str = Depends(verify_firebase_token
         if not care_setting:
             raise HTTPException(status_code=404, detail="お世話設定が見つかりません")
         # care_setting_id に紐づく反省文を取得
-        print("care_setting_id:", care_setting.id)
+        logger.debug("care_setting_id: %s", care_setting.id)
         # care_setting_id に紐づく反省文を取得
         results = await prisma_client.reflection_notes.find_many(
             where={"care_setting_id": care_setting.id},
@@ -101,7 +104,7 @@ async def get_reflection_notes(firebase_uid: str = Depends(verify_firebase_token
     except HTTPException:
         raise
     except Exception as e:
-        print("DBエラー詳細:", e)
+        logger.error("DBエラー詳細: %s", e)
         raise HTTPException(
             status_code=500, detail="DB取得時にエラーが発生しました"
         ) from e
@@ -148,7 +151,7 @@ async def update_reflection_note(
     except HTTPException:
         raise
     except Exception as e:
-        print("DBエラー詳細:", e)
+        logger.error("DBエラー詳細: %s", e)
         raise HTTPException(
             status_code=500, detail="反省文の更新中にエラーが発生しました"
         ) from e
@@ -0,0 +1,67 @@
+"""管理者向けレポート（reports）APIルーターの定義"""
+
+# 標準ライブラリ
+from datetime import date, timedelta
+from typing import Optional
+
+# サードパーティライブラリ
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+# ローカルアプリケーション
+from app.db import prisma_client
+from app.dependencies import verify_admin
+from app.logger import get_logger
+from app.schemas.reports import PaymentDailyReportResponse, PaymentDailyReportRow
+from app.services.reports import fetch_payment_report
+
+logger = get_logger(__name__)
+
+reports_router = APIRouter(prefix="/api/reports", tags=["reports"])
+
+
+@reports_router.get(
+    "/payments/daily",
+    response_model=PaymentDailyReportResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_payment_daily_report(
+    since: Optional[date] = Query(None, description="開始日（含む、既定は30日前）"),
+    until: Optional[date] = Query(None, description="終了日（含まない、既定は明日）"),
+    currency: Optional[str] = Query(None),
+    _admin_uid: str = Depends(verify_admin),
+):
+    """
+    日別・通貨別の売上とプレミアム転換を返すAPI（管理者のみ）
+
+    マテリアライズドビューを読むだけなので、アプリ本体のテーブルには負荷をかけない。
+    集計は定期更新のタイミング（REPORT_REFRESH_INTERVAL_SECONDS）までの値になる。
+    """
+    until = until or date.today() + timedelta(days=1)
+    since = since or until - timedelta(days=31)
+    if since >= until:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="since は until より前の日付を指定してください",
+        )
+
+    try:
+        rows = await fetch_payment_report(prisma_client, since, until, currency)
+    except Exception as e:
+        logger.error("レポートの取得に失敗しました: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="レポートの取得中にエラーが発生しました",
+        ) from e
+
+    report_rows = [PaymentDailyReportRow(**row) for row in rows]
+    revenue_by_currency = {}
+    for row in report_rows:
+        revenue_by_currency[row.currency] = (
+            revenue_by_currency.get(row.currency, 0) + row.revenue
+        )
+
+    return PaymentDailyReportResponse(
+        rows=report_rows,
+        total_conversions=sum(row.conversions for row in report_rows),
+        revenue_by_currency=revenue_by_currency,
+    )
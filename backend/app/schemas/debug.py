@@ -0,0 +1,24 @@
+"""デバッグ用（debug）APIのPydanticスキーマ定義"""
+
+# 標準ライブラリ
+from typing import List
+
+# サードパーティライブラリ
+from pydantic import BaseModel
+
+
+# GET /api/debug/profiles の1件分
+class ProfileSummary(BaseModel):
+    """X-Profile で計測したリクエストのプロファイルの概要"""
+
+    profile_id: str
+    name: str  # "メソッド パス"
+    samples: int  # 取れたサンプル数
+    duration: float  # 計測した秒数
+
+
+# GET /api/debug/profiles のレスポンスモデル
+class ProfileListResponse(BaseModel):
+    """保持しているプロファイル（新しい順）"""
+
+    profiles: List[ProfileSummary]
@@ -0,0 +1,29 @@
+"""管理者向けレポート（reports）用のPydanticスキーマ定義"""
+
+# 標準ライブラリ
+from datetime import date
+from typing import List, Optional
+
+# サードパーティライブラリ
+from pydantic import BaseModel
+
+
+# GET /api/reports/payments/daily の1行分
+class PaymentDailyReportRow(BaseModel):
+    """日別・通貨別の売上とプレミアム転換"""
+
+    day: date
+    currency: str
+    payments: int  # 支払い件数
+    conversions: int  # その日に初めて支払ったユーザー数
+    revenue: int  # 売上（Stripeの最小通貨単位）
+    avg_seconds_to_purchase: Optional[float]  # 登録から初回購入までの平均秒数
+
+
+# GET /api/reports/payments/daily のレスポンスモデル
+class PaymentDailyReportResponse(BaseModel):
+    """日別レポートと、期間内の通貨別合計"""
+
+    rows: List[PaymentDailyReportRow]
+    total_conversions: int
+    revenue_by_currency: dict
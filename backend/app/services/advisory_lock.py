@@ -0,0 +1,30 @@
+# 複数プロセス（gunicorn のワーカー・複数インスタンス）のうち1つだけに定期処理をさせるためのロック
+# Prisma はコネクションプールを使うので、セッション単位の pg_advisory_lock は取った接続とは別の接続で
+# 解放しようとして失敗することがある。そのためトランザクション単位のロック（pg_try_advisory_xact_lock）を使い、
+# ロックを取ったトランザクションの中で処理する（コミット・ロールバックと同時に解放される）。
+
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import AsyncIterator, Optional
+
+TRY_LOCK_SQL = 'SELECT pg_try_advisory_xact_lock(hashtext($1)) AS "locked"'
+
+
+@asynccontextmanager
+async def locked_transaction(
+    client, name: str, *, timeout: timedelta = timedelta(seconds=30)
+) -> AsyncIterator[Optional[object]]:
+    """
+    name のロックを取ったトランザクションを開始する（待たずに取れなければ諦める）
+
+    Args:
+        client: Prismaクライアント
+        name (str): ロック名（処理ごとに決めた文字列）
+        timeout (timedelta): トランザクションの制限時間
+
+    Yields:
+        ロックを取れたらトランザクションのクライアント、他のプロセスが実行中なら None
+    """
+    async with client.tx(timeout=timeout) as transaction:
+        rows = await transaction.query_raw(TRY_LOCK_SQL, name)
+        yield transaction if rows and rows[0]["locked"] else None
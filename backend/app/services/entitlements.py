@@ -0,0 +1,153 @@
+# ユーザーのプラン（premiumかどうか）を返すエンタイトルメントサービス
+# メッセージ生成や決済のたびに users の行を丸ごと読まないよう、
+# firebase_uid → (users.id, current_plan) だけをプロセス内キャッシュ（＋任意でRedisハッシュ）に持つ。
+# プランを変えるのはWebhookのアップグレード処理だけなので、そこで set_plan() してキャッシュを更新する。
+
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+import redis.asyncio as redis
+
+from app.db import prisma_client
+from app.logger import get_logger
+from app.tracing import TracedRedis
+
+logger = get_logger(__name__)
+
+# Redisに置くハッシュのキー（フィールドが firebase_uid、値が "plan:user_id"）
+REDIS_HASH_KEY = "entitlements"
+
+
+@dataclass(frozen=True)
+class Entitlement:
+    """プラン判定に必要な最小限のユーザー情報"""
+
+    user_id: str
+    plan: str
+
+    @property
+    def is_premium(self) -> bool:
+        """プレミアムプランかどうか"""
+        return self.plan == "premium"
+
+
+class EntitlementService:
+    """
+    firebase_uid からプランを引くキャッシュ
+
+    - まずプロセス内のLRUキャッシュ（ttl_seconds で期限切れ）を見る
+    - なければRedisハッシュ（設定時のみ）、それもなければ users を1回読んで両方に入れる
+    - 存在しないユーザーはキャッシュしない（登録直後に400が続かないように）
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl_seconds: float = 60.0,
+        max_entries: int = 10000,
+        redis_client: Optional[redis.Redis] = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.redis_client = redis_client
+        self._cache: OrderedDict = OrderedDict()
+
+    async def get(self, firebase_uid: str) -> Optional[Entitlement]:
+        """
+        ユーザーのプランを返す
+
+        Args:
+            firebase_uid (str): Firebase認証UID
+
+        Returns:
+            Optional[Entitlement]: ユーザーが存在しなければ None
+        """
+        cached = self._cache.get(firebase_uid)
+        if cached is not None:
+            expires_at, entitlement = cached
+            if expires_at > time.monotonic():
+                self._cache.move_to_end(firebase_uid)
+                return entitlement
+            del self._cache[firebase_uid]
+
+        entitlement = await self._get_from_redis(firebase_uid)
+        if entitlement is None:
+            user = await prisma_client.users.find_unique(
+                where={"firebase_uid": firebase_uid}
+            )
+            if not user:
+                return None
+            entitlement = Entitlement(user_id=user.id, plan=user.current_plan)
+            await self._set_redis(firebase_uid, entitlement)
+
+        self._remember(firebase_uid, entitlement)
+        return entitlement
+
+    async def set_plan(self, firebase_uid: str, user_id: str, plan: str) -> None:
+        """
+        プランの変更をキャッシュに反映する（Webhookのアップグレード処理から呼ぶ）
+
+        Args:
+            firebase_uid (str): Firebase認証UID
+            user_id (str): users.id
+            plan (str): 新しいプラン
+        """
+        entitlement = Entitlement(user_id=user_id, plan=plan)
+        self._remember(firebase_uid, entitlement)
+        await self._set_redis(firebase_uid, entitlement)
+
+    def invalidate(self, firebase_uid: str) -> None:
+        """プロセス内キャッシュから外す（次回はRedisかDBから読み直す）"""
+        self._cache.pop(firebase_uid, None)
+
+    def clear(self) -> None:
+        """プロセス内キャッシュを空にする"""
+        self._cache.clear()
+
+    def _remember(self, firebase_uid: str, entitlement: Entitlement) -> None:
+        self._cache[firebase_uid] = (time.monotonic() + self.ttl_seconds, entitlement)
+        self._cache.move_to_end(firebase_uid)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def _get_from_redis(self, firebase_uid: str) -> Optional[Entitlement]:
+        if self.redis_client is None:
+            return None
+        try:
+            value = await self.redis_client.hget(REDIS_HASH_KEY, firebase_uid)
+        except redis.RedisError as e:
+            # Redisが落ちていてもDBから読めばよいので、ログだけ残す
+            logger.error("Redisからの読み込みに失敗しました: %s", e)
+            return None
+        if not value:
+            return None
+        plan, _, user_id = value.partition(":")
+        return Entitlement(user_id=user_id, plan=plan)
+
+    async def _set_redis(self, firebase_uid: str, entitlement: Entitlement) -> None:
+        if self.redis_client is None:
+            return
+        try:
+            await self.redis_client.hset(
+                REDIS_HASH_KEY,
+                firebase_uid,
+                f"{entitlement.plan}:{entitlement.user_id}",
+            )
+        except redis.RedisError as e:
+            logger.error("Redisへの書き込みに失敗しました: %s", e)
+
+
+# プロセス間でプランを共有する場合はRedisのURLを指定する（未設定ならプロセス内キャッシュのみ）
+ENTITLEMENT_REDIS_URL = os.getenv("ENTITLEMENT_REDIS_URL")
+
+entitlement_service = EntitlementService(
+    ttl_seconds=float(os.getenv("ENTITLEMENT_CACHE_TTL_SECONDS", "60")),
+    redis_client=(
+        TracedRedis.from_url(ENTITLEMENT_REDIS_URL, decode_responses=True)
+        if ENTITLEMENT_REDIS_URL
+        else None
+    ),
+)
@@ -0,0 +1,161 @@
+# 犬のひとこと（message_logs）をまとめて書き込むための非同期キュー
+# リクエスト処理中にDB書き込みを待たないよう、生成したメッセージを一旦バッファし、
+# 件数または時間の条件を満たしたら create_many でまとめて保存する
+
+import asyncio
+import os
+from typing import Optional
+
+from app.db import prisma_client
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class MessageLogWriteQueue:
+    """
+    message_logs をバッチで書き込むプロセス内キュー
+
+    - enqueue() はブロックせずにキューへ積むだけ（満杯なら破棄してリクエストを優先）
+    - バックグラウンドタスクが batch_size 件たまるか flush_interval 秒経過で create_many
+    - stop() で残りをすべて書き出してから終了する
+    """
+
+    def __init__(
+        self,
+        client,
+        *,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_queue_size: int = 10000,
+    ):
+        self.client = client
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        """バックグラウンドの書き込みタスクが動いているか"""
+        return self._task is not None and not self._task.done()
+
+    def enqueue(self, user_id: str, content: str, is_llm_based: bool) -> bool:
+        """
+        保存するメッセージをキューに積む
+
+        Args:
+            user_id (str): users.id
+            content (str): 生成されたメッセージ
+            is_llm_based (bool): OpenAIで生成したメッセージか
+
+        Returns:
+            bool: キューに積めた場合は True（未起動・満杯の場合は False）
+        """
+        if not self.running or self._closing.is_set():
+            return False
+        try:
+            self._queue.put_nowait(
+                {
+                    "user_id": user_id,
+                    "content": content,
+                    "is_llm_based": is_llm_based,
+                }
+            )
+            return True
+        except asyncio.QueueFull:
+            logger.warning("キューが満杯のためメッセージを破棄しました")
+            return False
+
+    async def start(self) -> None:
+        """書き込みタスクを起動する（lifespanの起動時に呼ぶ）"""
+        if self.running:
+            return
+        self._closing = asyncio.Event()
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        キューに残ったメッセージを書き出してから停止する（lifespanの終了時に呼ぶ）
+
+        Args:
+            timeout (float): 書き出しを待つ最大秒数
+        """
+        if not self.running:
+            return
+        # 新規の受付を止め、積まれている分がすべて保存されるのを待つ
+        self._closing.set()
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            remaining = self._queue.qsize()
+            logger.warning("停止待ちがタイムアウト（未保存: %s件）", remaining)
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # 1件目が来るまで待つ
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+
+            # batch_size 件たまるか、flush_interval 秒経つまで集める（停止中は待たない）
+            while len(batch) < self.batch_size:
+                if self._closing.is_set():
+                    batch.extend(self._drain_nowait(self.batch_size - len(batch)))
+                    break
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                item = await self._get_until(remaining)
+                if item is not None:
+                    batch.append(item)
+
+            await self._flush(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _get_until(self, timeout: float) -> Optional[dict]:
+        """timeout 秒以内に次の1件を取り出す。タイムアウトか停止要求なら None"""
+        getter = asyncio.ensure_future(self._queue.get())
+        closing = asyncio.ensure_future(self._closing.wait())
+        done, _ = await asyncio.wait(
+            {getter, closing}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+        )
+        closing.cancel()
+        if getter in done:
+            return getter.result()
+        # 取り出し前にキャンセルされた場合、要素はキューに残る
+        getter.cancel()
+        return None
+
+    def _drain_nowait(self, limit: int) -> list:
+        items = []
+        while len(items) < limit and not self._queue.empty():
+            items.append(self._queue.get_nowait())
+        return items
+
+    async def _flush(self, batch: list) -> None:
+        if not batch:
+            return
+        try:
+            await self.client.message_logs.create_many(data=batch)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # 履歴の保存失敗でAPIを止めないよう、ログだけ残して破棄する
+            logger.error("%s件の保存に失敗しました: %s", len(batch), e)
+
+
+message_log_queue = MessageLogWriteQueue(
+    prisma_client,
+    batch_size=int(os.getenv("MESSAGE_LOG_BATCH_SIZE", "100")),
+    flush_interval=float(os.getenv("MESSAGE_LOG_FLUSH_INTERVAL", "1.0")),
+)
@@ -0,0 +1,356 @@
+# トランザクショナルアウトボックスのリレーと購読側
+# プランのアップグレードなどは業務データと同じトランザクションで outbox_events に1行積んでおき、
+# リレーがまとめて取り出して配信する（コミットされた変更だけが、少なくとも1回は必ず届く）。
+# - Redisが設定されていれば pub/sub のチャンネルに配信し、各プロセスの購読側がキャッシュを無効化する
+# - 設定されていなければ同じプロセス内のキャッシュにだけ反映する（単一プロセス構成）
+# - max_attempts 回確保しても配信できなかった行はそれ以上取り出さない（published_at が NULL のまま残るデッドレター）
+# - 配信済みの行は retention_days 日を過ぎたら削除する（テーブルが増え続けないように）
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+import orjson
+import redis.asyncio as redis
+
+from app.db import prisma_client
+from app.logger import get_logger
+from app.services.entitlements import entitlement_service
+from app.services.stripe_service import checkout_service
+from app.tracing import TracedRedis
+
+logger = get_logger(__name__)
+
+# プレミアムプランへのアップグレード（payload: firebase_uid, user_id, plan）
+PLAN_UPGRADED = "plan.upgraded"
+
+# 未配信・リース切れで、試行回数が上限未満の行を確保し、リース期限と試行回数を更新する
+CLAIM_OUTBOX_SQL = """
+UPDATE "outbox_events"
+SET "locked_until" = (NOW() AT TIME ZONE 'UTC') + make_interval(secs => $2::float8),
+    "attempts" = "attempts" + 1
+WHERE "id" IN (
+    SELECT "id" FROM "outbox_events"
+    WHERE "published_at" IS NULL
+      AND "attempts" < $3
+      AND ("locked_until" IS NULL OR "locked_until" < NOW() AT TIME ZONE 'UTC')
+    ORDER BY "created_at"
+    LIMIT $1
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING "id", "topic", "payload", "created_at", "attempts"
+"""
+
+# 配信してから $1 日を過ぎた行を $2 件まで削除する（複数プロセスで同時に実行しても問題ない）
+PURGE_OUTBOX_SQL = """
+DELETE FROM "outbox_events"
+WHERE "id" IN (
+    SELECT "id" FROM "outbox_events"
+    WHERE "published_at" < (NOW() AT TIME ZONE 'UTC') - make_interval(days => $1::int)
+    LIMIT $2
+    FOR UPDATE SKIP LOCKED
+)
+"""
+
+
+@dataclass
+class OutboxEvent:
+    """配信するアウトボックスの1件"""
+
+    id: str
+    topic: str
+    payload: dict
+
+    def to_message(self) -> bytes:
+        """pub/sub に流すメッセージ"""
+        return orjson.dumps(
+            {"id": self.id, "topic": self.topic, "payload": self.payload}
+        )
+
+
+def build_outbox_row(topic: str, payload: dict) -> dict:
+    """
+    outbox_events に積む1行分のデータを作る
+
+    Args:
+        topic (str): イベントの種類（PLAN_UPGRADED など）
+        payload (dict): 購読側に渡す内容
+
+    Returns:
+        dict: outbox_events.create / create_many に渡す行
+    """
+    return {"topic": topic, "payload": orjson.dumps(payload).decode()}
+
+
+async def apply_outbox_event(topic: str, payload: dict) -> None:
+    """
+    届いたイベントをこのプロセスのキャッシュに反映する
+
+    同じイベントが2回届いても結果が変わらない操作だけを行う。
+    """
+    if topic == PLAN_UPGRADED:
+        # 次のプラン判定でRedis（なければDB）から読み直させる
+        entitlement_service.invalidate(payload["firebase_uid"])
+        checkout_service.forget(payload["firebase_uid"])
+
+
+class OutboxRelay:
+    """
+    outbox_events を取り出して配信するバックグラウンドタスク
+
+    - batch_size 件ずつ SKIP LOCKED で確保するので、複数プロセスで動かしても二重配信しにくい
+    - 配信に失敗したバッチはリースを外し、次の周期で再配信する
+    - max_attempts 回確保しても配信できなかった行は取り出さなくなる（デッドレターとして残す）
+    - purge_interval 秒ごとに、配信から retention_days 日を過ぎた行を削除する
+    - notify() で待機中のリレーを即座に起こせる（コミット直後に配信する）
+    """
+
+    def __init__(
+        self,
+        client,
+        *,
+        redis_client: Optional[redis.Redis] = None,
+        channel: str = "wan-mission:outbox",
+        batch_size: int = 100,
+        poll_interval: float = 1.0,
+        lease_seconds: float = 30.0,
+        max_attempts: int = 10,
+        retention_days: int = 7,
+        purge_interval: float = 60 * 60,
+        purge_batch_size: int = 1000,
+    ):
+        self.client = client
+        self.redis_client = redis_client
+        self.channel = channel
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention_days = retention_days
+        self.purge_interval = purge_interval
+        self.purge_batch_size = purge_batch_size
+        self._next_purge_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        """配信タスクが動いているか"""
+        return self._task is not None and not self._task.done()
+
+    def notify(self) -> None:
+        """アウトボックスに行を積んだことを伝え、待機中のリレーを起こす"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        """配信タスクを起動する（lifespanの起動時に呼ぶ）"""
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """配信タスクを止める（未配信の行は次回起動時に配信される）"""
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run_once(self) -> int:
+        """
+        未配信のイベントを1バッチ分確保して配信する
+
+        Returns:
+            int: 確保したイベントの件数
+        """
+        rows = await self.client.query_raw(
+            CLAIM_OUTBOX_SQL, self.batch_size, self.lease_seconds, self.max_attempts
+        )
+        if not rows:
+            return 0
+
+        events = [
+            OutboxEvent(
+                id=row["id"], topic=row["topic"], payload=orjson.loads(row["payload"])
+            )
+            for row in rows
+        ]
+        ids = [event.id for event in events]
+        try:
+            await self._publish(events)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.error("配信に失敗しました: %s", e)
+            dead = [row["id"] for row in rows if row["attempts"] >= self.max_attempts]
+            if dead:
+                logger.error("%d回配信できなかったので再配信をやめます: %s", self.max_attempts, dead)
+            await self.client.outbox_events.update_many(
+                where={"id": {"in": ids}},
+                data={"locked_until": None, "last_error": str(e)},
+            )
+            return len(ids)
+
+        await self.client.outbox_events.update_many(
+            where={"id": {"in": ids}},
+            data={"published_at": datetime.now(timezone.utc), "locked_until": None},
+        )
+        return len(ids)
+
+    async def purge_published(self) -> int:
+        """
+        配信から retention_days 日を過ぎた行を削除する
+
+        Returns:
+            int: 削除した件数
+        """
+        deleted = 0
+        while True:
+            count = await self.client.execute_raw(
+                PURGE_OUTBOX_SQL, self.retention_days, self.purge_batch_size
+            )
+            deleted += count
+            if count < self.purge_batch_size:
+                return deleted
+
+    async def _publish(self, events: list) -> None:
+        for event in events:
+            if event.topic == PLAN_UPGRADED:
+                # 共有しているRedisハッシュを先に正しいプランにしておく
+                await entitlement_service.set_plan(
+                    event.payload["firebase_uid"],
+                    event.payload["user_id"],
+                    event.payload["plan"],
+                )
+
+        if self.redis_client is None:
+            for event in events:
+                await apply_outbox_event(event.topic, event.payload)
+            return
+
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for event in events:
+                pipe.publish(self.channel, event.to_message())
+            await pipe.execute()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                claimed = await self.run_once()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.error("イベントの取り出しに失敗しました: %s", e)
+                claimed = 0
+
+            if time.monotonic() >= self._next_purge_at:
+                self._next_purge_at = time.monotonic() + self.purge_interval
+                try:
+                    await self.purge_published()
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    logger.error("配信済みイベントの削除に失敗しました: %s", e)
+
+            # バッチが埋まっていたらまだ残っている可能性が高いので待たずに続ける
+            if claimed >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+
+class OutboxSubscriber:
+    """
+    Redis pub/sub のチャンネルを購読して、このプロセスのキャッシュに反映する
+
+    切断中に流れたイベントは受け取れないが、プロセス内キャッシュのTTLで古い値は自然に消える。
+    反映や購読で例外が起きても、ログに出して購読を続ける（タスクは止めない）。
+    """
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis],
+        *,
+        channel: str = "wan-mission:outbox",
+        reconnect_seconds: float = 1.0,
+    ):
+        self.redis_client = redis_client
+        self.channel = channel
+        self.reconnect_seconds = reconnect_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        """購読タスクが動いているか"""
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """購読タスクを起動する（Redisが未設定なら何もしない）"""
+        if self.redis_client is None or self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """購読タスクを止める"""
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def handle_message(self, message: dict) -> None:
+        """pub/sub から受け取ったメッセージを反映する"""
+        if message.get("type") != "message":
+            return
+        try:
+            data = orjson.loads(message["data"])
+            await apply_outbox_event(data["topic"], data["payload"])
+        except (orjson.JSONDecodeError, KeyError, TypeError) as e:
+            logger.warning("不正なメッセージを無視します: %s", e)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # 1件の反映に失敗しても購読は続ける（止まるとキャッシュの無効化が届かなくなる）
+            logger.error("イベントの反映に失敗しました: %s", e)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with self.redis_client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        await self.handle_message(message)
+            except redis.RedisError as e:
+                logger.warning("購読が切れたので再接続します: %s", e)
+                await asyncio.sleep(self.reconnect_seconds)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.error("購読中にエラーが発生したので再接続します: %s", e)
+                await asyncio.sleep(self.reconnect_seconds)
+
+
+# 配信先のRedis（未設定ならプラン判定キャッシュと同じRedis、どちらもなければプロセス内だけ）
+OUTBOX_REDIS_URL = os.getenv("OUTBOX_REDIS_URL", os.getenv("ENTITLEMENT_REDIS_URL"))
+OUTBOX_CHANNEL = os.getenv("OUTBOX_CHANNEL", "wan-mission:outbox")
+
+_outbox_redis = (
+    TracedRedis.from_url(OUTBOX_REDIS_URL, decode_responses=True)
+    if OUTBOX_REDIS_URL
+    else None
+)
+
+outbox_relay = OutboxRelay(
+    prisma_client,
+    redis_client=_outbox_redis,
+    channel=OUTBOX_CHANNEL,
+    batch_size=int(os.getenv("OUTBOX_RELAY_BATCH_SIZE", "100")),
+    poll_interval=float(os.getenv("OUTBOX_RELAY_POLL_INTERVAL", "1.0")),
+    max_attempts=int(os.getenv("OUTBOX_RELAY_MAX_ATTEMPTS", "10")),
+    retention_days=int(os.getenv("OUTBOX_RETENTION_DAYS", "7")),
+)
+outbox_subscriber = OutboxSubscriber(_outbox_redis, channel=OUTBOX_CHANNEL)
@@ -0,0 +1,130 @@
+# 管理者向けレポート（売上・プレミアム転換）のサービス層
+# 集計はマテリアライズドビュー payment_daily_report に任せ、APIはそこを読むだけにする。
+# ビューは定期タスクが REFRESH ... CONCURRENTLY で更新する（更新中も読み込みを止めない）。
+# 定期タスクを複数プロセスで有効にしても、アドバイザリーロックを取った1プロセスだけが更新する。
+
+import asyncio
+import os
+from datetime import date, timedelta
+from typing import Optional
+
+from app.db import prisma_client
+from app.logger import get_logger
+from app.services.advisory_lock import locked_transaction
+
+logger = get_logger(__name__)
+
+LOCK_NAME = "payment_daily_report_refresh"
+REFRESH_TIMEOUT = timedelta(minutes=10)
+
+REFRESH_PAYMENT_REPORT_SQL = (
+    'REFRESH MATERIALIZED VIEW CONCURRENTLY "payment_daily_report"'
+)
+
+SELECT_PAYMENT_REPORT_SQL = """
+SELECT "day"::text AS "day", "currency", "payments", "conversions", "revenue",
+       "avg_seconds_to_purchase"
+FROM "payment_daily_report"
+WHERE "day" >= $1::date AND "day" < $2::date
+  AND ($3::text IS NULL OR "currency" = $3::text)
+ORDER BY "day", "currency"
+"""
+
+
+async def fetch_payment_report(
+    client, since: date, until: date, currency: Optional[str] = None
+) -> list:
+    """
+    日別・通貨別の売上と転換数を返す
+
+    Args:
+        client: Prismaクライアント
+        since (date): 開始日（含む）
+        until (date): 終了日（含まない）
+        currency (Optional[str]): 通貨で絞り込む場合に指定
+
+    Returns:
+        list[dict]: payment_daily_report の行
+    """
+    return await client.query_raw(
+        SELECT_PAYMENT_REPORT_SQL, since.isoformat(), until.isoformat(), currency
+    )
+
+
+async def refresh_payment_report(client) -> bool:
+    """
+    マテリアライズドビューを更新する（読み込みはブロックしない）
+
+    Returns:
+        bool: 更新したら True、他のプロセスが更新中なら False
+    """
+    async with locked_transaction(
+        client, LOCK_NAME, timeout=REFRESH_TIMEOUT
+    ) as transaction:
+        if transaction is None:
+            return False
+        await transaction.execute_raw(REFRESH_PAYMENT_REPORT_SQL)
+        return True
+
+
+class ReportRefreshTask:
+    """
+    レポート用のマテリアライズドビューを定期的に更新するlifespanタスク
+
+    既定では無効（REPORT_REFRESH_ENABLED=true で有効にする）。
+    複数プロセスで有効にしても、同時に更新するのはロックを取った1プロセスだけ。
+    """
+
+    def __init__(
+        self,
+        client,
+        *,
+        interval_seconds: float = 15 * 60,
+        enabled: bool = True,
+    ):
+        self.client = client
+        self.interval_seconds = interval_seconds
+        self.enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        """定期実行タスクが動いているか"""
+        return self._task is not None and not self._task.done()
+
+    async def run_once(self) -> bool:
+        """ビューを1回更新する（他のプロセスが更新中なら何もしない）"""
+        return await refresh_payment_report(self.client)
+
+    async def start(self) -> None:
+        """定期実行タスクを起動する（lifespanの起動時に呼ぶ）"""
+        if not self.enabled or self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """定期実行タスクを止める（lifespanの終了時に呼ぶ）"""
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                # 失敗しても前回の集計は読めるので、次の周期で再実行する
+                logger.error("レポートの更新に失敗しました: %s", e)
+            await asyncio.sleep(self.interval_seconds)
+
+
+report_refresh_task = ReportRefreshTask(
+    prisma_client,
+    interval_seconds=float(os.getenv("REPORT_REFRESH_INTERVAL_SECONDS", "900")),
+    enabled=os.getenv("REPORT_REFRESH_ENABLED", "false").lower() == "true",
+)
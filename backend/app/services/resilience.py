@@ -0,0 +1,239 @@
+# 外部依存（OpenAIなど）の呼び出しを守るためのサーキットブレーカーとヘッジリクエスト
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, wait
+from typing import Callable, Optional, TypeVar
+
+from prometheus_client import Counter, Gauge
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+# Prometheusで見える化するための状態値（Grafanaで閾値表示しやすいよう数値にする）
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+CIRCUIT_BREAKER_STATE = Gauge(
+    "circuit_breaker_state",
+    "サーキットブレーカーの状態（0=closed, 1=half_open, 2=open）",
+    ["name"],
+    # 複数ワーカーでは動いているワーカーのうち一番悪い状態を出す
+    multiprocess_mode="livemax",
+)
+CIRCUIT_BREAKER_TRANSITIONS = Counter(
+    "circuit_breaker_transitions_total",
+    "サーキットブレーカーの状態遷移回数",
+    ["name", "state"],
+)
+CIRCUIT_BREAKER_REJECTED = Counter(
+    "circuit_breaker_rejected_total",
+    "ブレーカーが開いていたため外部呼び出しを行わなかった回数",
+    ["name"],
+)
+HEDGED_REQUESTS = Counter(
+    "hedged_requests_total",
+    "ヘッジ（2本目）リクエストを送った回数",
+    ["name"],
+)
+
+
+class CircuitBreaker:
+    """
+    エラー率・遅延率で開くサーキットブレーカー
+
+    - closed: 通常状態。直近 window_size 件の結果を記録し、
+      失敗率か遅延率が閾値を超えたら open にする
+    - open: 外部呼び出しをせず即座に拒否する。open_seconds 経過後に half_open へ
+    - half_open: 少数のプローブだけ通し、成功なら closed、失敗なら再び open
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        window_size: int = 20,
+        min_calls: int = 5,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 3.0,
+        slow_call_rate_threshold: float = 0.5,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (成功したか, 遅延秒) の直近履歴
+        self._window: deque = deque(maxlen=window_size)
+        # ヘッジの待ち時間（p95）計算用の成功時レイテンシ履歴
+        self._latencies: deque = deque(maxlen=200)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        # half_open中に送り出したプローブの開始時刻
+        self._probes: list = []
+        CIRCUIT_BREAKER_STATE.labels(name=name).set(STATE_VALUES[CLOSED])
+
+    @property
+    def state(self) -> str:
+        """現在の状態（open の待機時間が過ぎていれば half_open として扱う）"""
+        with self._lock:
+            self._refresh_state()
+            return self._state
+
+    def allow_request(self) -> bool:
+        """
+        外部呼び出しをしてよいか判定する
+
+        Returns:
+            bool: 呼び出してよければ True（half_open ではプローブ枠を1つ消費する）
+        """
+        with self._lock:
+            self._refresh_state()
+            if self._state == CLOSED:
+                return True
+
+            if self._state == HALF_OPEN:
+                now = self._clock()
+                # 結果が返ってこないまま放置されたプローブは枠を解放する
+                self._probes = [
+                    started
+                    for started in self._probes
+                    if now - started < self.open_seconds
+                ]
+                if len(self._probes) < self.half_open_max_calls:
+                    self._probes.append(now)
+                    return True
+
+            CIRCUIT_BREAKER_REJECTED.labels(name=self.name).inc()
+            return False
+
+    def record_success(self, latency: float) -> None:
+        """成功を記録する（slow_call_seconds を超えた場合は遅延として扱う）"""
+        with self._lock:
+            self._latencies.append(latency)
+            slow = latency >= self.slow_call_seconds
+            if self._state == HALF_OPEN:
+                if slow:
+                    self._transition(OPEN)
+                else:
+                    self._transition(CLOSED)
+                return
+            self._window.append((True, latency))
+            self._evaluate()
+
+    def record_failure(self, latency: float) -> None:
+        """失敗を記録する"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._transition(OPEN)
+                return
+            self._window.append((False, latency))
+            self._evaluate()
+
+    def release_probe(self) -> None:
+        """結果を記録せずにプローブ枠を1つ返す（呼び出し側が途中で打ち切った場合）"""
+        with self._lock:
+            if self._probes:
+                self._probes.pop(0)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """
+        成功時レイテンシのパーセンタイルを返す
+
+        Args:
+            percentile (float): 0〜1（例: 0.95）
+
+        Returns:
+            Optional[float]: サンプルが min_calls 件未満なら None
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_calls:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * percentile))
+        return ordered[index]
+
+    def reset(self) -> None:
+        """履歴を消して closed に戻す"""
+        with self._lock:
+            self._latencies.clear()
+            self._transition(CLOSED)
+
+    def _refresh_state(self) -> None:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+
+    def _evaluate(self) -> None:
+        if self._state != CLOSED or len(self._window) < self.min_calls:
+            return
+        total = len(self._window)
+        failures = sum(1 for ok, _ in self._window if not ok)
+        slow_calls = sum(
+            1 for _, latency in self._window if latency >= self.slow_call_seconds
+        )
+        if (
+            failures / total >= self.failure_rate_threshold
+            or slow_calls / total >= self.slow_call_rate_threshold
+        ):
+            self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state == OPEN:
+            self._opened_at = self._clock()
+        if state in (OPEN, CLOSED):
+            self._window.clear()
+            self._probes = []
+        if state != self._state:
+            logger.info("%s: %s -> %s", self.name, self._state, state)
+            CIRCUIT_BREAKER_TRANSITIONS.labels(name=self.name, state=state).inc()
+        self._state = state
+        CIRCUIT_BREAKER_STATE.labels(name=self.name).set(STATE_VALUES[state])
+
+
+def hedged_call(
+    func: Callable[[], T],
+    delay: float,
+    executor: Executor,
+    name: str = "default",
+) -> T:
+    """
+    func を実行し、delay 秒以内に終わらなければ同じ処理をもう1本投げて早い方を返す
+
+    Args:
+        func (Callable[[], T]): 同期関数（冪等であること）
+        delay (float): 2本目を投げるまでの待ち時間（秒）。通常は p95 レイテンシ
+        executor (Executor): 実行に使うスレッドプール
+        name (str): メトリクス用の名前
+
+    Returns:
+        T: 先に成功した方の戻り値（両方失敗した場合は最初の例外を送出）
+    """
+    first = executor.submit(func)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        return first.result()
+
+    HEDGED_REQUESTS.labels(name=name).inc()
+    pending = {first, executor.submit(func)}
+    first_error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            error = future.exception()
+            if error is None:
+                return future.result()
+            first_error = first_error or error
+    raise first_error
@@ -1,31 +1,182 @@
 # paymentルーターに呼ばれるStripeサービス層
+# - 非同期のStripeクライアント（httpxのコネクションプールを使い回す）でイベントループを止めない
+# - 期限内の未完了Checkoutセッションは firebase_uid ごとに覚えておき、
+#   アップグレードボタンを何度押されても同じURLを返す（セッションを作り直さない）
+#   ただし覚えておくのはプロセスごと（ワーカー間では共有しない）
 
+import asyncio
 import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
 import stripe
 
+from app.metrics import STRIPE_REQUEST_SECONDS, timed
+from app.tracing import span
+
 # 環境変数からStripeの秘密鍵と価格IDを取得
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 PRICE_ID = os.getenv("STRIPE_PRICE_ID")
 YOUR_DOMAIN = os.getenv("YOUR_DOMAIN")
+# テストやローカル検証でフェイクのStripeサーバーに向けるためのURL（未設定なら本番API）
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE")
+
+
+@dataclass
+class OpenCheckoutSession:
+    """再利用できる未完了のCheckoutセッション"""
+
+    session_id: str
+    url: str
+    expires_at: float
+
+
+class CheckoutSessionService:
+    """
+    Checkoutセッションの作成と、未完了セッションの再利用を行う
+
+    - セッションは expires_at を指定して作成し、期限まで reuse_margin_seconds 以上残っていれば再利用する
+    - 同じユーザーの同時リクエストは1つの作成処理にまとめる（連打で複数作らない）
+    - 決済が完了したら forget() でキャッシュから外す
+
+    未完了セッションのキャッシュと作成中リクエストのまとめ込みは、どちらもプロセス内のメモリにある。
+    gunicorn の複数ワーカーや複数インスタンスでは共有されないため、別のワーカーに届いたクリックでは
+    セッションが新しく作られる（同じワーカーに届いた連打だけがまとまる）。
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        price_id: Optional[str],
+        domain: Optional[str],
+        *,
+        api_base: Optional[str] = None,
+        session_ttl_seconds: int = 60 * 60,
+        reuse_margin_seconds: int = 5 * 60,
+        timeout: float = 10.0,
+        max_network_retries: int = 2,
+    ):
+        self.api_key = api_key
+        self.price_id = price_id
+        self.domain = domain
+        self.api_base = api_base
+        self.session_ttl_seconds = session_ttl_seconds
+        self.reuse_margin_seconds = reuse_margin_seconds
+        self.timeout = timeout
+        self.max_network_retries = max_network_retries
+        self._client: Optional[stripe.StripeClient] = None
+        self._http_client: Optional[stripe.HTTPXClient] = None
+        self._sessions: dict = {}
+        self._pending: dict = {}
+
+    @property
+    def client(self) -> stripe.StripeClient:
+        """初回利用時にStripeクライアントを作る（秘密鍵が未設定でもimportは失敗させない）"""
+        if self._client is None:
+            self._http_client = stripe.HTTPXClient(timeout=self.timeout)
+            self._client = stripe.StripeClient(
+                self.api_key,
+                http_client=self._http_client,
+                base_addresses={"api": self.api_base} if self.api_base else {},
+                max_network_retries=self.max_network_retries,
+            )
+        return self._client
+
+    def get_open_session(self, firebase_uid: str) -> Optional[OpenCheckoutSession]:
+        """期限まで十分に残っている未完了セッションを返す"""
+        session = self._sessions.get(firebase_uid)
+        if session is None:
+            return None
+        if session.expires_at - time.time() < self.reuse_margin_seconds:
+            del self._sessions[firebase_uid]
+            return None
+        return session
+
+    def forget(self, firebase_uid: str) -> None:
+        """決済が完了したセッションをキャッシュから外す"""
+        self._sessions.pop(firebase_uid, None)
+
+    async def create_checkout_session(self, firebase_uid: str) -> str:
+        """
+        CheckoutセッションのURLを返す（未完了のセッションがあればそれを再利用する）
+
+        Args:
+            firebase_uid (str): 購入するユーザーのFirebase UID
+
+        Returns:
+            str: Stripe決済ページのURL
+        """
+        session = self.get_open_session(firebase_uid)
+        if session is not None:
+            return session.url
+
+        # 作成中のリクエストがあれば、その結果を待つ
+        pending = self._pending.get(firebase_uid)
+        if pending is None:
+            pending = asyncio.ensure_future(self._create(firebase_uid))
+            self._pending[firebase_uid] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(firebase_uid, None))
+        session = await asyncio.shield(pending)
+        return session.url
+
+    async def _create(self, firebase_uid: str) -> OpenCheckoutSession:
+        with span(
+            "stripe.checkout.sessions.create", **{"peer.service": "stripe"}
+        ), timed(STRIPE_REQUEST_SECONDS, operation="checkout.sessions.create"):
+            checkout_session = await self.client.checkout.sessions.create_async(
+                params={
+                    "payment_method_types": ["card"],
+                    # 決済するアイテム情報のリスト
+                    # Stripeダッシュボードで事前に登録した商品・価格を使う
+                    "line_items": [
+                        {
+                            "price": self.price_id,
+                            "quantity": 1,
+                        },
+                    ],
+                    "mode": "payment",
+                    "success_url": self.domain + "/admin/payment/success",
+                    "cancel_url": self.domain + "/admin/payment/cancel",
+                    "metadata": {
+                        "firebase_uid": firebase_uid,  # Firebase UIDをメタデータに保存
+                    },
+                    # 期限を決めておき、その間だけ同じセッションを使い回す
+                    "expires_at": int(time.time()) + self.session_ttl_seconds,
+                }
+            )
+        session = OpenCheckoutSession(
+            session_id=checkout_session.id,
+            url=checkout_session.url,
+            expires_at=float(checkout_session.expires_at),
+        )
+        self._prune()
+        self._sessions[firebase_uid] = session
+        return session
+
+    def _prune(self) -> None:
+        """期限切れのセッションを捨てる（キャッシュが増え続けないように）"""
+        now = time.time()
+        for uid in [uid for uid, s in self._sessions.items() if s.expires_at <= now]:
+            del self._sessions[uid]
+
+    async def close(self) -> None:
+        """コネクションプールを閉じる（lifespanの終了時に呼ぶ）"""
+        if self._http_client is not None:
+            await self._http_client.close_async()
+        self._client = None
+        self._http_client = None
+
+
+checkout_service = CheckoutSessionService(
+    STRIPE_SECRET_KEY,
+    PRICE_ID,
+    YOUR_DOMAIN,
+    api_base=STRIPE_API_BASE,
+    session_ttl_seconds=int(os.getenv("STRIPE_CHECKOUT_SESSION_TTL_SECONDS", "3600")),
+)
 
 
-def create_checkout_session(firebase_uid: str):
-    checkout_session = stripe.checkout.Session.create(
-        payment_method_types=["card"],
-        # 決済するアイテム情報のリスト
-        # Stripeダッシュボードで事前に登録した商品・価格を使う
-        line_items=[
-            {
-                "price": PRICE_ID,
-                "quantity": 1,
-            },
-        ],
-        mode="payment",
-        success_url=YOUR_DOMAIN + "/admin/payment/success",
-        cancel_url=YOUR_DOMAIN + "/admin/payment/cancel",
-        metadata={
-            "firebase_uid": firebase_uid,  # Firebase UIDをメタデータに保存
-        },
-    )
-    # セッションのURLを返す
-    return checkout_session.url
+async def create_checkout_session(firebase_uid: str) -> str:
+    """CheckoutセッションのURLを返す（paymentルーターから呼ばれる）"""
+    return await checkout_service.create_checkout_session(firebase_uid)
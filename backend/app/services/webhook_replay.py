@@ -0,0 +1,191 @@
+# 過去のWebhookイベントを received_at の範囲で読み直して再処理するリプレイ処理
+# 処理ロジックの修正後に、溜まった webhook_events をまとめて反映し直すために使う
+# （CLIは prisma/replay_webhooks.py）
+
+import asyncio
+import json
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+from app.db import prisma_client
+from app.services.webhook_service import BatchResult, process_webhook_event_chunk
+
+
+@dataclass
+class ReplayCheckpoint:
+    """
+    どこまで処理し終えたかの記録（途中で止まっても続きから再開できるようにする）
+
+    received_at / event_id は「ここまでのイベントはすべて処理済み」という位置で、
+    並行に処理しているバッチが前から順に完了した分だけ進める。
+    """
+
+    since: str
+    until: str
+    event_type: str
+    received_at: Optional[str] = None
+    event_id: Optional[str] = None
+    processed: int = 0
+    skipped: int = 0
+    failed: int = 0
+
+    def save(self, path: Path) -> None:
+        """チェックポイントをJSONファイルに書き出す（書き込み途中で壊れないよう置き換える）"""
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps(asdict(self), ensure_ascii=False, indent=2))
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "ReplayCheckpoint":
+        """JSONファイルからチェックポイントを読み込む"""
+        return cls(**json.loads(path.read_text()))
+
+
+def _range_where(
+    since: datetime,
+    until: datetime,
+    event_type: str,
+    include_processed: bool,
+    checkpoint: ReplayCheckpoint,
+) -> dict:
+    where = {
+        "event_type": event_type,
+        "received_at": {"gte": since, "lt": until},
+    }
+    if not include_processed:
+        where["processed"] = False
+    if checkpoint.received_at is not None:
+        # (received_at, id) の順でチェックポイントより後ろのイベントだけを読む
+        last_received_at = datetime.fromisoformat(checkpoint.received_at)
+        where["OR"] = [
+            {"received_at": {"gt": last_received_at}},
+            {"received_at": last_received_at, "id": {"gt": checkpoint.event_id}},
+        ]
+    return where
+
+
+async def replay_webhook_events(
+    since: datetime,
+    until: datetime,
+    *,
+    event_type: str = "checkout.session.completed",
+    batch_size: int = 200,
+    concurrency: int = 4,
+    include_processed: bool = False,
+    dry_run: bool = False,
+    checkpoint_path: Optional[Path] = None,
+    resume: bool = False,
+    on_progress: Optional[Callable[[BatchResult, ReplayCheckpoint], None]] = None,
+) -> BatchResult:
+    """
+    received_at が [since, until) のWebhookイベントをバッチに分けて並行に再処理する
+
+    Args:
+        since (datetime): 対象期間の開始（含む）
+        until (datetime): 対象期間の終了（含まない）
+        event_type (str): 対象のイベント種別
+        batch_size (int): 1バッチのイベント数（1バッチ = 1トランザクション）
+        concurrency (int): 同時に処理するバッチ数
+        include_processed (bool): 処理済みのイベントも再処理するか
+            （paymentはstripe_session_idで重複登録しないので再処理しても安全）
+        dry_run (bool): 書き込みを行わず、処理される件数だけを数える
+        checkpoint_path (Optional[Path]): チェックポイントの保存先（dry_run時は保存しない）
+        resume (bool): checkpoint_path のチェックポイントから再開するか
+        on_progress (Optional[Callable]): バッチが完了するたびに呼ばれるコールバック
+
+    Returns:
+        BatchResult: 今回の実行で処理した件数と処理時間
+            （再開前からの累計はチェックポイントに記録される）
+
+    Raises:
+        ValueError: 再開しようとしたチェックポイントが別の期間・イベント種別のものだった場合
+    """
+    checkpoint = ReplayCheckpoint(
+        since=since.isoformat(), until=until.isoformat(), event_type=event_type
+    )
+    if resume and checkpoint_path is not None and checkpoint_path.exists():
+        saved = ReplayCheckpoint.load(checkpoint_path)
+        if (saved.since, saved.until, saved.event_type) != (
+            checkpoint.since,
+            checkpoint.until,
+            checkpoint.event_type,
+        ):
+            raise ValueError(
+                "チェックポイントの期間・イベント種別が指定と一致しません: "
+                f"{saved.since}〜{saved.until} ({saved.event_type})"
+            )
+        checkpoint = saved
+
+    started = time.perf_counter()
+    result = BatchResult()
+    semaphore = asyncio.Semaphore(concurrency)
+    # 読み込み順に並んだ (バッチ末尾のイベント, 処理タスク)
+    pending: deque = deque()
+
+    async def run_batch(events: list) -> BatchResult:
+        try:
+            return await process_webhook_event_chunk(events, dry_run=dry_run)
+        finally:
+            semaphore.release()
+
+    def advance() -> None:
+        # 先頭から連続して完了したバッチの分だけチェックポイントを進める
+        # （例外で終わったバッチがあれば、そこから先は進めない）
+        while pending and pending[0][1].done() and not pending[0][1].exception():
+            last_event, task = pending.popleft()
+            batch_result = task.result()
+            for counts in (result, checkpoint):
+                counts.processed += batch_result.processed
+                counts.skipped += batch_result.skipped
+                counts.failed += batch_result.failed
+            result.elapsed_seconds = time.perf_counter() - started
+            checkpoint.received_at = last_event.received_at.isoformat()
+            checkpoint.event_id = last_event.id
+            if checkpoint_path is not None and not dry_run:
+                checkpoint.save(checkpoint_path)
+            if on_progress is not None:
+                on_progress(result, checkpoint)
+
+    # 読み込み用のカーソル（チェックポイントとは別に、処理中のバッチの先まで進む）
+    cursor = ReplayCheckpoint(
+        since=checkpoint.since,
+        until=checkpoint.until,
+        event_type=event_type,
+        received_at=checkpoint.received_at,
+        event_id=checkpoint.event_id,
+    )
+    try:
+        while True:
+            events = await prisma_client.webhook_events.find_many(
+                where=_range_where(since, until, event_type, include_processed, cursor),
+                order=[{"received_at": "asc"}, {"id": "asc"}],
+                take=batch_size,
+            )
+            if not events:
+                break
+
+            # 処理中のバッチが concurrency 個に達していたら空くまで読み込みを待つ
+            await semaphore.acquire()
+            task = asyncio.create_task(run_batch(events))
+            pending.append((events[-1], task))
+            task.add_done_callback(lambda _: advance())
+
+            cursor.received_at = events[-1].received_at.isoformat()
+            cursor.event_id = events[-1].id
+            if len(events) < batch_size:
+                break
+    finally:
+        # 読み込みで失敗しても、起動済みのバッチは最後まで処理してチェックポイントを残す
+        await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+        advance()
+
+    if pending:
+        # ユーザー検索などで失敗したバッチ。チェックポイントはその手前で止まっている
+        raise pending[0][1].exception()
+
+    result.elapsed_seconds = time.perf_counter() - started
+    return result
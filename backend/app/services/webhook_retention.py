@@ -0,0 +1,283 @@
+# webhook_events の月パーティション（event_created_at）の作成と、古いパーティションの payload の圧縮退避
+# - 先の月のパーティションを前もって作成する（デフォルトパーティションに溜めない）
+# - 保持期間を過ぎた月の payload を gzip の JSON Lines に書き出してから NULL にし、
+#   ホットなパーティションとTOAST領域を小さく保つ（処理に使うカラムはそのまま残る）
+# - 複数プロセスで動いても、アドバイザリーロックを取った1プロセスだけが実行する
+
+import asyncio
+import gzip
+import json
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from app.db import prisma_client
+from app.logger import get_logger
+from app.services.advisory_lock import locked_transaction
+
+logger = get_logger(__name__)
+
+# payload の退避先。退避後は DB から payload を消すので、永続ストレージ（永続ボリュームやマウントした
+# バケットなど）を指定すること。コンテナ内のディレクトリは再デプロイで消える。
+# 未設定の場合は退避（payload を NULL にする処理）を行わない。
+ARCHIVE_DIR = os.getenv("WEBHOOK_ARCHIVE_DIR")
+
+# パーティション作成と退避を1プロセスだけで実行するためのロック名
+LOCK_NAME = "webhook_events_retention"
+# 1パーティション分の退避を行うトランザクションの制限時間
+COMPACTION_TIMEOUT = timedelta(minutes=30)
+
+PARTITION_NAME_PATTERN = re.compile(r"^webhook_events_p(\d{4})(\d{2})$")
+
+LIST_PARTITIONS_SQL = """
+SELECT c.relname AS name
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = '"webhook_events"'::regclass
+ORDER BY c.relname
+"""
+
+ENSURE_PARTITIONS_SQL = """
+SELECT "ensure_webhook_events_partitions"(NOW() AT TIME ZONE 'UTC', $1::int) AS created
+"""
+
+
+@dataclass
+class CompactionResult:
+    """1パーティション分の退避結果"""
+
+    partition: str
+    rows: int
+    archive_path: Optional[Path]
+    # 他のプロセスが実行中で、このプロセスでは退避しなかった
+    skipped: bool = False
+
+
+def partition_end(name: str) -> Optional[datetime]:
+    """
+    月パーティション名（webhook_events_pYYYYMM）からその範囲の終端（翌月1日）を返す
+
+    Returns:
+        Optional[datetime]: 月パーティションでなければ None（デフォルトパーティションなど）
+    """
+    match = PARTITION_NAME_PATTERN.match(name)
+    if not match:
+        return None
+    year, month = int(match.group(1)), int(match.group(2))
+    if month == 12:
+        return datetime(year + 1, 1, 1, tzinfo=timezone.utc)
+    return datetime(year, month + 1, 1, tzinfo=timezone.utc)
+
+
+async def ensure_partitions(client, months_ahead: int = 3) -> int:
+    """
+    今月から months_ahead ヶ月先までの月パーティションを作成する
+
+    Returns:
+        int: 新しく作成したパーティション数（他のプロセスが実行中なら 0）
+    """
+    async with locked_transaction(client, LOCK_NAME) as transaction:
+        if transaction is None:
+            return 0
+        rows = await transaction.query_raw(ENSURE_PARTITIONS_SQL, months_ahead)
+    return rows[0]["created"] if rows else 0
+
+
+def _append_archive(path: Path, rows: list) -> None:
+    """
+    1ページ分を gzip のメンバーとして追記し、ディスクに書かれるまで待つ
+
+    ページごとに独立した gzip メンバーにするので、途中で止まってもそれまでのページは読める
+    （gzip.open / zcat は連結されたメンバーを続けて読む）。
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = "".join(
+        json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows
+    )
+    with open(path, "ab") as archive:
+        archive.write(gzip.compress(lines.encode("utf-8")))
+        archive.flush()
+        os.fsync(archive.fileno())
+
+
+async def compact_partition(
+    client,
+    partition: str,
+    archive_dir: Path,
+    page_size: int = 1000,
+) -> CompactionResult:
+    """
+    パーティション内の payload を1ページずつ退避してから NULL にする
+
+    ページごとに「ファイルに追記して fsync → そのページの payload を NULL」の順で進めるので、
+    退避ファイルに書かれていない payload を消すことはない。ファイルの書き込みは別スレッドで行う。
+
+    Args:
+        client: Prismaクライアント（またはトランザクション）
+        partition (str): 月パーティション名（webhook_events_pYYYYMM）
+        archive_dir (Path): 退避先ディレクトリ（永続ストレージ）
+        page_size (int): 1回に読み込む・更新する行数
+
+    Returns:
+        CompactionResult: 退避した行数とファイル
+
+    Raises:
+        ValueError: 月パーティション以外の名前が渡された場合
+    """
+    if partition_end(partition) is None:
+        raise ValueError(f"月パーティションではありません: {partition}")
+
+    # 名前はパターンで検証済みなので識別子として埋め込んでよい
+    select_sql = (
+        f'SELECT "id", "event_created_at", "received_at", "event_type", "payload" '
+        f'FROM "{partition}" '
+        'WHERE "payload" IS NOT NULL AND "id" > $1 ORDER BY "id" LIMIT $2'
+    )
+    clear_sql = (
+        f'UPDATE "{partition}" SET "payload" = NULL '
+        'WHERE "id" = ANY($1::text[]) AND "payload" IS NOT NULL'
+    )
+
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    archive_path = archive_dir / f"{partition}.{stamp}.jsonl.gz"
+    archived = 0
+    last_id = ""
+    while True:
+        rows = await client.query_raw(select_sql, last_id, page_size)
+        if not rows:
+            break
+        await asyncio.to_thread(_append_archive, archive_path, rows)
+        await client.execute_raw(clear_sql, [row["id"] for row in rows])
+        archived += len(rows)
+        last_id = rows[-1]["id"]
+
+    return CompactionResult(
+        partition=partition,
+        rows=archived,
+        archive_path=archive_path if archived else None,
+    )
+
+
+async def compact_old_partitions(
+    client,
+    retention_days: int,
+    archive_dir: Path,
+    now: Optional[datetime] = None,
+) -> list:
+    """
+    保持期間（retention_days）を過ぎた月パーティションの payload を退避する
+
+    パーティションごとにロックを取ったトランザクションで退避する。
+    他のプロセスが退避中のパーティションは skipped として返す。
+
+    Returns:
+        list[CompactionResult]: 対象になったパーティションごとの結果
+    """
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=retention_days)
+    rows = await client.query_raw(LIST_PARTITIONS_SQL)
+
+    results = []
+    for row in rows:
+        end = partition_end(row["name"])
+        # 月の終端が保持期間より前のパーティションだけ（今月・デフォルトは対象外）
+        if end is None or end > cutoff:
+            continue
+        async with locked_transaction(
+            client, LOCK_NAME, timeout=COMPACTION_TIMEOUT
+        ) as transaction:
+            if transaction is None:
+                logger.info("%s: 他のプロセスが退避中のためスキップします", row["name"])
+                results.append(CompactionResult(row["name"], 0, None, skipped=True))
+                continue
+            result = await compact_partition(transaction, row["name"], archive_dir)
+        if result.rows:
+            logger.info(
+                "%s: %s件のpayloadを退避しました (%s)",
+                result.partition,
+                result.rows,
+                result.archive_path,
+            )
+        results.append(result)
+    return results
+
+
+class WebhookRetentionTask:
+    """
+    パーティション作成と payload の退避を定期実行するlifespanタスク
+
+    既定では無効（WEBHOOK_RETENTION_ENABLED=true で有効にする）。複数プロセスで有効にしても
+    アドバイザリーロックを取った1プロセスだけが実行する。archive_dir（WEBHOOK_ARCHIVE_DIR）が
+    未設定ならパーティションの作成だけを行い、payload は消さない。
+    """
+
+    def __init__(
+        self,
+        client,
+        *,
+        interval_seconds: float = 6 * 60 * 60,
+        months_ahead: int = 3,
+        retention_days: int = 90,
+        archive_dir: Optional[Path] = None,
+        enabled: bool = True,
+    ):
+        self.client = client
+        self.interval_seconds = interval_seconds
+        self.months_ahead = months_ahead
+        self.retention_days = retention_days
+        self.archive_dir = archive_dir
+        self.enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        """定期実行タスクが動いているか"""
+        return self._task is not None and not self._task.done()
+
+    async def run_once(self) -> None:
+        """パーティション作成と payload の退避を1回実行する"""
+        created = await ensure_partitions(self.client, self.months_ahead)
+        if created:
+            logger.info("パーティションを%s個作成しました", created)
+        if self.archive_dir is None:
+            logger.warning("WEBHOOK_ARCHIVE_DIR が未設定のため payload の退避は行いません")
+            return
+        await compact_old_partitions(self.client, self.retention_days, self.archive_dir)
+
+    async def start(self) -> None:
+        """定期実行タスクを起動する（lifespanの起動時に呼ぶ）"""
+        if not self.enabled or self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """定期実行タスクを止める（lifespanの終了時に呼ぶ）"""
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                # 失敗しても次の周期で再実行する（デフォルトパーティションが受け止める）
+                logger.error("定期実行に失敗しました: %s", e)
+            await asyncio.sleep(self.interval_seconds)
+
+
+webhook_retention_task = WebhookRetentionTask(
+    prisma_client,
+    interval_seconds=float(os.getenv("WEBHOOK_RETENTION_INTERVAL_SECONDS", "21600")),
+    months_ahead=int(os.getenv("WEBHOOK_PARTITION_MONTHS_AHEAD", "3")),
+    retention_days=int(os.getenv("WEBHOOK_PAYLOAD_RETENTION_DAYS", "90")),
+    archive_dir=Path(ARCHIVE_DIR) if ARCHIVE_DIR else None,
+    enabled=os.getenv("WEBHOOK_RETENTION_ENABLED", "false").lower() == "true",
+)
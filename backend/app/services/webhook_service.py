@@ -0,0 +1,390 @@
+# Stripe Webhookイベントを処理してpayment / usersテーブルに反映するサービス層
+# webhook_eventsルーター（手動処理）とバックグラウンドワーカーの両方から呼ばれる
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+import orjson
+from fastapi import HTTPException
+
+from app.db import prisma_client
+from app.logger import get_logger
+from app.services.entitlements import entitlement_service
+from app.services.outbox import PLAN_UPGRADED, build_outbox_row, outbox_relay
+from app.services.stripe_service import checkout_service
+
+logger = get_logger(__name__)
+
+# /process で一度に読み込んで1トランザクションで書き込むイベント数と、同時に処理するチャンク数
+PROCESS_CHUNK_SIZE = int(os.getenv("WEBHOOK_PROCESS_CHUNK_SIZE", "100"))
+PROCESS_CONCURRENCY = int(os.getenv("WEBHOOK_PROCESS_CONCURRENCY", "4"))
+
+# created のないイベントの event_created_at（固定値なのでデフォルトパーティションに入り、再送も重複になる）
+EVENT_CREATED_AT_UNKNOWN = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass
+class BatchResult:
+    """まとめて処理した結果（件数と処理時間）"""
+
+    processed: int = 0
+    skipped: int = 0
+    failed: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def total(self) -> int:
+        """読み込んだイベントの総数"""
+        return self.processed + self.skipped + self.failed
+
+    @property
+    def events_per_second(self) -> float:
+        """スループット（読み込んだイベント数 / 秒）"""
+        if self.elapsed_seconds <= 0:
+            return 0.0
+        return self.total / self.elapsed_seconds
+
+
+def build_webhook_event_row(body: bytes) -> dict:
+    """
+    受信したWebhookのリクエストボディから webhook_events に保存する1行を作る
+
+    ボディはそのまま payload に保存し（再シリアライズしない）、
+    処理で使うフィールドだけを orjson で取り出してカラムに入れる。
+
+    Args:
+        body (bytes): Stripeから受信したリクエストボディ
+
+    Returns:
+        dict: webhook_events.create_many に渡す行
+    """
+    event = orjson.loads(body)
+    event_type = event.get("type")
+    data_object = event.get("data", {}).get("object", {})
+
+    if event_type == "checkout.session.completed":
+        # Checkoutセッション完了イベントの場合、セッションIDと支払い情報を取得
+        stripe_session_id = data_object.get("id")
+        firebase_uid = (data_object.get("metadata") or {}).get("firebase_uid")
+        amount = data_object.get("amount_total")
+        payment_status = data_object.get("payment_status")
+    else:
+        # 他のイベントタイプの場合はセッションIDはNone
+        stripe_session_id = None
+        firebase_uid = None
+        amount = data_object.get("amount")
+        payment_status = data_object.get("status")
+
+    # パーティションキー兼主キーの一部。再送でも同じ値になるようStripeのイベント作成時刻を使う
+    # created がない場合も受信時刻では代用しない（再送のたびに別の行になり重複を検出できないため）
+    created = event.get("created")
+    event_created_at = (
+        datetime.fromtimestamp(created, tz=timezone.utc)
+        if isinstance(created, (int, float)) and not isinstance(created, bool)
+        else EVENT_CREATED_AT_UNKNOWN
+    )
+
+    return {
+        "id": event.get("id"),  # Stripeが発行する「このWebhookイベント自体のID」
+        "event_created_at": event_created_at,
+        "received_at": datetime.now(timezone.utc),  # こちらで受信した時刻
+        "event_type": event_type,
+        "stripe_session_id": stripe_session_id,  # CheckoutセッションID
+        "stripe_payment_intent_id": data_object.get("payment_intent"),
+        "customer_email": (data_object.get("billing_details") or {}).get("email"),
+        "amount": amount,
+        "currency": data_object.get("currency"),
+        "payment_status": payment_status,
+        "payload": body.decode("utf-8"),  # 受信したボディをそのまま保存
+        "processed": False,  # 未処理フラグ
+        "firebase_uid": firebase_uid,  # Firebase UIDを保存
+    }
+
+
+def webhook_event_key(event) -> dict:
+    """
+    webhook_events の1行を主キー (id, event_created_at) で指定する where を作る
+
+    パーティションキーの event_created_at を含めるので、Postgresは対象のパーティションだけを読む。
+
+    Args:
+        event: webhook_eventsのレコード
+
+    Returns:
+        dict: update_many などに渡す where
+    """
+    return {"id": event.id, "event_created_at": event.event_created_at}
+
+
+def build_payment_row(event, user_id: str) -> dict:
+    """
+    paymentテーブルに登録する1行分のデータを作る
+
+    payloadは読まず、受信時に抽出して保存したカラムから作る。
+
+    Args:
+        event: webhook_eventsのレコード
+        user_id (str): users.id
+
+    Returns:
+        dict: payment.create_many に渡す行
+    """
+    return {
+        "user_id": user_id,  # 本当はFirebaseUIDからマッピングする
+        "firebase_uid": event.firebase_uid,  # webhook_eventsテーブルに入ってるfirebase_uidカラムの値
+        "stripe_session_id": event.stripe_session_id,
+        "stripe_payment_intent_id": event.stripe_payment_intent_id,
+        "amount": event.amount,
+        "currency": event.currency,
+        "status": event.payment_status,
+    }
+
+
+# 条件に合う未処理のWebhookイベントを処理してpaymentテーブルに送る関数
+async def process_webhook_event(event) -> bool:
+    """
+    未処理のWebhookイベントを処理してpaymentテーブルに送る関数
+
+    Returns:
+        bool: 処理済みにできた場合は True（スキップ・失敗時は False で、ワーカーが再試行する）
+    """
+    logger.info("自動処理開始: %s", event.id)
+    try:
+        # 受信時に抽出済みのカラムを使う
+        if not event.stripe_session_id:
+            logger.warning("session_idが取れないのでスキップ: %s", event.id)
+            return False
+
+        # webhook_eventsテーブルからeventを取って、event.firebase_uidを取り出す
+        firebase_uid = event.firebase_uid
+        if not firebase_uid:
+            logger.warning("Firebase UIDが見つからないのでスキップ: %s", event.id)
+            return False
+
+        # ユーザーをfirebase_uidで探す
+        user_record = await prisma_client.users.find_unique(
+            where={"firebase_uid": firebase_uid}
+        )
+        if not user_record:
+            logger.warning("Firebase UIDに対応するユーザーが見つからないのでスキップ: %s", firebase_uid)
+            return False
+
+        user_id = user_record.id  # ユーザーIDを取得
+
+        # payment登録・プラン更新・処理済みフラグ・アウトボックスを1トランザクションで書き込む
+        # （途中で失敗しても中途半端な状態が残らず、ワーカーがそのまま再試行できる）
+        async with prisma_client.tx() as transaction:
+            # paymentテーブルにINSERT
+            # stripe_session_idはユニークなので、再送・再処理で登録済みなら何もしない
+            # （既存の支払いがあってもプラン更新と処理済みフラグは最後まで進める）
+            await transaction.payment.create_many(
+                data=[build_payment_row(event, user_id)],
+                skip_duplicates=True,
+            )
+
+            # ユーザープランをpremiumに更新
+            await transaction.users.update(
+                where={"id": user_id},
+                data={"current_plan": "premium"},  # ユーザープランをプレミアムに更新
+            )
+
+            # 処理が完了したら、webhook_events.processedをTrueに更新
+            await transaction.webhook_events.update_many(
+                where=webhook_event_key(event), data={"processed": True}
+            )
+
+            # 他プロセスのキャッシュ無効化・下流への通知はリレーが配信する
+            await transaction.outbox_events.create(
+                data=build_outbox_row(
+                    PLAN_UPGRADED,
+                    {
+                        "firebase_uid": firebase_uid,
+                        "user_id": user_id,
+                        "plan": "premium",
+                    },
+                )
+            )
+
+        # このプロセスのキャッシュはすぐに更新し、決済済みのCheckoutセッションは再利用させない
+        await entitlement_service.set_plan(firebase_uid, user_id, "premium")
+        checkout_service.forget(firebase_uid)
+        outbox_relay.notify()
+        return True
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Webhookイベントの処理に失敗しました: %s", e)
+        # エラー内容をwebhook_eventsテーブルに保存
+        await prisma_client.webhook_events.update_many(
+            where=webhook_event_key(event), data={"error_message": str(e)}
+        )
+        return False
+
+
+async def process_webhook_event_chunk(
+    events: list, dry_run: bool = False
+) -> BatchResult:
+    """
+    Webhookイベントのチャンクを集合操作でまとめて処理する
+
+    - ユーザーは firebase_uid の IN 検索1回で解決する
+    - payment登録・プラン更新・処理済みフラグ・アウトボックスは1トランザクション内の4ステートメントで書き込む
+    - 書き込みに失敗した場合はチャンク全体をロールバックし、error_message を記録する
+
+    Args:
+        events (list): webhook_eventsのレコード
+        dry_run (bool): True なら書き込まずに、処理される件数だけを数える
+
+    Returns:
+        BatchResult: チャンクの処理件数
+    """
+    result = BatchResult()
+
+    # session_idとfirebase_uidが揃っているものだけ残す
+    candidates = []
+    for event in events:
+        if not event.stripe_session_id or not event.firebase_uid:
+            logger.warning("session_idまたはFirebase UIDが取れないのでスキップ: %s", event.id)
+            result.skipped += 1
+            continue
+        candidates.append(event)
+
+    if not candidates:
+        return result
+
+    firebase_uids = list({event.firebase_uid for event in candidates})
+    users = await prisma_client.users.find_many(
+        where={"firebase_uid": {"in": firebase_uids}}
+    )
+    user_ids = {user.firebase_uid: user.id for user in users}
+
+    payments = []
+    event_ids = []
+    event_keys = []
+    for event in candidates:
+        user_id = user_ids.get(event.firebase_uid)
+        if not user_id:
+            logger.warning(
+                "Firebase UIDに対応するユーザーが見つからないのでスキップ: %s",
+                event.firebase_uid,
+            )
+            result.skipped += 1
+            continue
+        payments.append(build_payment_row(event, user_id))
+        event_ids.append(event.id)
+        event_keys.append(webhook_event_key(event))
+
+    if not event_ids or dry_run:
+        result.processed += len(event_ids)
+        return result
+
+    # 同じユーザーの決済が複数あっても、アップグレードの通知は1件にまとめる
+    upgraded_users = {row["firebase_uid"]: row["user_id"] for row in payments}
+    outbox_rows = [
+        build_outbox_row(
+            PLAN_UPGRADED,
+            {"firebase_uid": firebase_uid, "user_id": user_id, "plan": "premium"},
+        )
+        for firebase_uid, user_id in upgraded_users.items()
+    ]
+
+    try:
+        async with prisma_client.tx() as transaction:
+            await transaction.payment.create_many(data=payments, skip_duplicates=True)
+            await transaction.users.update_many(
+                where={"id": {"in": list({row["user_id"] for row in payments})}},
+                data={"current_plan": "premium"},
+            )
+            await transaction.webhook_events.update_many(
+                where={"OR": event_keys}, data={"processed": True}
+            )
+            await transaction.outbox_events.create_many(data=outbox_rows)
+        result.processed += len(event_ids)
+        for payment_row in payments:
+            await entitlement_service.set_plan(
+                payment_row["firebase_uid"], payment_row["user_id"], "premium"
+            )
+            checkout_service.forget(payment_row["firebase_uid"])
+        outbox_relay.notify()
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logger.error("Webhookイベントのチャンク処理に失敗しました: %s", e)
+        result.failed += len(event_ids)
+        try:
+            await prisma_client.webhook_events.update_many(
+                where={"OR": event_keys}, data={"error_message": str(e)}
+            )
+        except Exception as update_error:  # pylint: disable=broad-exception-caught
+            logger.error("error_messageの保存に失敗しました: %s", update_error)
+    return result
+
+
+async def process_pending_webhook_events(
+    chunk_size: int = PROCESS_CHUNK_SIZE,
+    concurrency: int = PROCESS_CONCURRENCY,
+) -> BatchResult:
+    """
+    未処理のcheckout.session.completedイベントをチャンクに分けて並行に処理する
+
+    イベントID順にカーソルで読み進め、読み込んだチャンクから順に最大 concurrency 個まで
+    同時に処理する（全件をメモリに載せない）。
+
+    Args:
+        chunk_size (int): 1チャンクのイベント数
+        concurrency (int): 同時に処理するチャンク数
+
+    Returns:
+        BatchResult: 全体の処理件数と処理時間
+    """
+    started = time.perf_counter()
+    result = BatchResult()
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = []
+
+    async def run_chunk(chunk: list) -> BatchResult:
+        try:
+            return await process_webhook_event_chunk(chunk)
+        finally:
+            semaphore.release()
+
+    last_id: Optional[str] = None
+    try:
+        while True:
+            where = {"processed": False, "event_type": "checkout.session.completed"}
+            if last_id is not None:
+                where["id"] = {"gt": last_id}
+            chunk = await prisma_client.webhook_events.find_many(
+                where=where, order={"id": "asc"}, take=chunk_size
+            )
+            if not chunk:
+                break
+
+            # 処理中のチャンクが concurrency 個に達していたら空くまで読み込みを待つ
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(run_chunk(chunk)))
+
+            last_id = chunk[-1].id
+            if len(chunk) < chunk_size:
+                break
+    finally:
+        # 読み込みで失敗しても、起動済みのチャンクは最後まで処理させる
+        chunk_results = await asyncio.gather(*tasks)
+
+    for chunk_result in chunk_results:
+        result.processed += chunk_result.processed
+        result.skipped += chunk_result.skipped
+        result.failed += chunk_result.failed
+    result.elapsed_seconds = time.perf_counter() - started
+
+    logger.info(
+        "Webhookイベントを一括処理しました: 処理 %s 件 / スキップ %s 件 / 失敗 %s 件 (%.1f events/sec)",
+        result.processed,
+        result.skipped,
+        result.failed,
+        result.events_per_second,
+    )
+    return result
@@ -0,0 +1,205 @@
+# 保存済みのStripe Webhookイベントをバックグラウンドで処理するワーカー
+# 受信エンドポイントはINSERTだけして即200を返し、実際の反映（payment作成・プラン更新）は
+# このワーカーが webhook_events テーブルをキューとして取り出して行う。
+# 複数プロセスで動いても同じ行を二重に処理しないよう FOR UPDATE SKIP LOCKED で確保する。
+
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+
+from app.db import prisma_client
+from app.logger import get_logger
+from app.services.webhook_service import process_webhook_event, webhook_event_key
+
+logger = get_logger(__name__)
+
+# 未処理・再試行時刻到来・リース切れの行を確保し、リース期限と試行回数を更新する
+CLAIM_EVENTS_SQL = """
+UPDATE "webhook_events"
+SET "locked_until" = (NOW() AT TIME ZONE 'UTC') + make_interval(secs => $2::float8),
+    "attempts" = "attempts" + 1
+WHERE ("id", "event_created_at") IN (
+    SELECT "id", "event_created_at" FROM "webhook_events"
+    WHERE "processed" = false
+      AND "event_type" = 'checkout.session.completed'
+      AND "attempts" < $3
+      AND ("next_attempt_at" IS NULL OR "next_attempt_at" <= NOW() AT TIME ZONE 'UTC')
+      AND ("locked_until" IS NULL OR "locked_until" < NOW() AT TIME ZONE 'UTC')
+    ORDER BY "received_at"
+    LIMIT $1
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING "id"
+"""
+
+
+class WebhookWorker:
+    """
+    webhook_events を取り出して処理するバックグラウンドワーカー
+
+    - batch_size 件ずつ SKIP LOCKED で確保し、concurrency 件まで並行に処理する
+    - 失敗したイベントは指数バックオフ（ジッター付き）で next_attempt_at を先送りする
+    - max_attempts 回失敗したイベントは取り出さない（error_message を見て手動対応）
+    - notify() で待機中のワーカーを即座に起こせる（受信直後の処理遅延を減らす）
+    """
+
+    def __init__(
+        self,
+        client,
+        *,
+        processor: Callable[..., Awaitable[bool]] = process_webhook_event,
+        batch_size: int = 20,
+        concurrency: int = 5,
+        poll_interval: float = 1.0,
+        lease_seconds: float = 60.0,
+        max_attempts: int = 8,
+        base_backoff: float = 2.0,
+        max_backoff: float = 600.0,
+    ):
+        self.client = client
+        self.processor = processor
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        """バックグラウンドの処理タスクが動いているか"""
+        return self._task is not None and not self._task.done()
+
+    def notify(self) -> None:
+        """新しいイベントが保存されたことを伝え、待機中のワーカーを起こす"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        """処理タスクを起動する（lifespanの起動時に呼ぶ）"""
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        処理中のバッチが終わるのを待ってから停止する（lifespanの終了時に呼ぶ）
+
+        Args:
+            timeout (float): 処理中のバッチを待つ最大秒数
+        """
+        if not self.running:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            # 確保済みの行はリース期限切れ後に再度取り出される
+            logger.warning("停止待ちがタイムアウトしたため処理を中断します")
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def run_once(self) -> int:
+        """
+        処理可能なイベントを1バッチ分確保して処理する
+
+        Returns:
+            int: 確保したイベントの件数
+        """
+        rows = await self.client.query_raw(
+            CLAIM_EVENTS_SQL,
+            self.batch_size,
+            self.lease_seconds,
+            self.max_attempts,
+        )
+        if not rows:
+            return 0
+
+        ids = [row["id"] for row in rows]
+        events = await self.client.webhook_events.find_many(where={"id": {"in": ids}})
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def handle(event):
+            async with semaphore:
+                await self._handle(event)
+
+        await asyncio.gather(*(handle(event) for event in events))
+        return len(ids)
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                claimed = await self.run_once()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                # DB接続断などでワーカーが止まらないよう、ログを残して次の周期で再試行する
+                logger.error("イベントの取り出しに失敗しました: %s", e)
+                claimed = 0
+
+            # バッチが埋まっていたらまだ残っている可能性が高いので待たずに続ける
+            if claimed >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _handle(self, event) -> None:
+        try:
+            processed = await self.processor(event)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.error("イベント処理中に例外が発生しました: %s: %s", event.id, e)
+            processed = False
+
+        if processed:
+            return
+
+        try:
+            await self.client.webhook_events.update_many(
+                where=webhook_event_key(event),
+                data={
+                    "next_attempt_at": datetime.now(timezone.utc)
+                    + timedelta(seconds=self.backoff_seconds(event.attempts)),
+                    "locked_until": None,
+                },
+            )
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # 更新できなくてもリース期限切れ後に再試行される
+            logger.error("再試行時刻の更新に失敗しました: %s: %s", event.id, e)
+
+    def backoff_seconds(self, attempts: int) -> float:
+        """
+        次の再試行までの待ち時間を返す
+
+        Args:
+            attempts (int): これまでの試行回数（今回の分を含む）
+
+        Returns:
+            float: base_backoff * 2^(attempts-1) を max_backoff で頭打ちにし、
+                   同時に失敗したイベントが一斉に再試行しないよう 50〜100% のジッターをかけた秒数
+        """
+        delay = min(self.max_backoff, self.base_backoff * 2 ** max(attempts - 1, 0))
+        return delay * random.uniform(0.5, 1.0)
+
+
+webhook_worker = WebhookWorker(
+    prisma_client,
+    batch_size=int(os.getenv("WEBHOOK_WORKER_BATCH_SIZE", "20")),
+    concurrency=int(os.getenv("WEBHOOK_WORKER_CONCURRENCY", "5")),
+    poll_interval=float(os.getenv("WEBHOOK_WORKER_POLL_INTERVAL", "1.0")),
+    max_attempts=int(os.getenv("WEBHOOK_WORKER_MAX_ATTEMPTS", "8")),
+)
@@ -0,0 +1,300 @@
+"""分散トレーシング（OpenTelemetry）の設定
+
+- リクエストごとにサーバースパンを作り（TracingMiddleware）、traceparent ヘッダーがあれば引き継ぐ
+- Prisma・Redis・Firebase・OpenAI・Stripe の呼び出しをそれぞれ子スパンで囲む（span()）
+- スパンは TRACING_EXPORTER に応じてファイル（JSON Lines）かローカルのコレクター（OTLP）に送る
+
+ファイルに書き出したスパンは、あとから1リクエスト分のフレームチャートに組み立てられる:
+    PYTHONPATH=. python -m app.tracing traces/spans.jsonl            # 一番遅いリクエスト
+    PYTHONPATH=. python -m app.tracing traces/spans.jsonl --trace-id <trace_id>
+"""
+
+import argparse
+import os
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import orjson
+import redis.asyncio as redis
+from opentelemetry import propagate, trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+from app.metrics import REDIS_COMMAND_SECONDS, redis_command_label, timed
+
+# none（無効）/ file（JSON Lines）/ otlp（ローカルのコレクター）/ console（標準出力）
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_FILE = os.getenv("TRACING_FILE", "traces/spans.jsonl")
+# 親スパンがないリクエストのうち記録する割合（親があれば親の判定に従う）
+TRACING_SAMPLE_RATIO = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "wan-mission-backend")
+
+# 未設定のあいだは何も記録しない（OpenTelemetry API の既定の no-op トレーサー）
+_tracer: trace.Tracer = trace.get_tracer("app")
+_provider = None
+
+
+def span_to_json(finished) -> str:
+    """1スパンを1行のJSONにする（フレームチャートを組み立てられる最小限の項目）"""
+    context = finished.get_span_context()
+    return (
+        orjson.dumps(
+            {
+                "trace_id": format(context.trace_id, "032x"),
+                "span_id": format(context.span_id, "016x"),
+                "parent_id": (
+                    format(finished.parent.span_id, "016x") if finished.parent else None
+                ),
+                "name": finished.name,
+                "kind": finished.kind.name,
+                "start_ns": finished.start_time,
+                "end_ns": finished.end_time,
+                "status": finished.status.status_code.name,
+                "attributes": dict(finished.attributes or {}),
+                "events": [
+                    {"name": event.name, "ts_ns": event.timestamp}
+                    for event in finished.events
+                ],
+            },
+            default=str,
+        ).decode()
+        + "\n"
+    )
+
+
+def configure_tracing(
+    exporter: str = TRACING_EXPORTER,
+    *,
+    path: str = TRACING_FILE,
+    sample_ratio: float = TRACING_SAMPLE_RATIO,
+    span_exporter=None,
+):
+    """
+    トレーサーを設定する（exporter が none なら何もしない）
+
+    Args:
+        exporter (str): none / file / otlp / console
+        path (str): file のときの出力先
+        sample_ratio (float): 親スパンがないリクエストを記録する割合
+        span_exporter: 任意のエクスポーター（テストでメモリに溜める場合など）
+
+    Returns:
+        TracerProvider | None: 設定したプロバイダー
+    """
+    global _tracer, _provider  # pylint: disable=global-statement
+    if exporter == "none" and span_exporter is None:
+        return None
+
+    # SDK はトレーシングを有効にしたときだけ読み込む
+    # pylint: disable=import-outside-toplevel
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        ConsoleSpanExporter,
+        SimpleSpanProcessor,
+    )
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    shutdown_tracing()
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(sample_ratio)),
+    )
+    if span_exporter is not None:
+        provider.add_span_processor(SimpleSpanProcessor(span_exporter))
+    elif exporter == "file":
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # pylint: disable-next=consider-using-with
+        output = open(path, "a", encoding="utf-8")
+        provider.add_span_processor(
+            BatchSpanProcessor(ConsoleSpanExporter(out=output, formatter=span_to_json))
+        )
+    elif exporter == "otlp":
+        # 接続先は OTEL_EXPORTER_OTLP_ENDPOINT（既定は http://localhost:4318）
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    elif exporter == "console":
+        provider.add_span_processor(
+            BatchSpanProcessor(ConsoleSpanExporter(formatter=span_to_json))
+        )
+    else:
+        raise ValueError(f"未対応の TRACING_EXPORTER です: {exporter}")
+
+    _provider = provider
+    _tracer = provider.get_tracer("app")
+    return provider
+
+
+def shutdown_tracing() -> None:
+    """未送信のスパンを書き出してプロバイダーを閉じる（lifespanの終了時に呼ぶ）"""
+    global _tracer, _provider  # pylint: disable=global-statement
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
+        _tracer = trace.get_tracer("app")
+
+
+@contextmanager
+def span(
+    name: str, kind: SpanKind = SpanKind.CLIENT, **attributes
+) -> Iterator[trace.Span]:
+    """
+    外部呼び出しをスパンで囲む（例外はスパンに記録して、そのまま送出する）
+
+    使い方:
+        with span("stripe.checkout.sessions.create", **{"peer.service": "stripe"}):
+            ...
+    """
+    with _tracer.start_as_current_span(
+        name, kind=kind, attributes=attributes
+    ) as current:
+        yield current
+
+
+def open_span(name: str, kind: SpanKind = SpanKind.CLIENT, **attributes) -> trace.Span:
+    """
+    現在のスパンの子スパンを開始する（終了は呼び出し側で end() する）
+
+    async ジェネレーターのように yield をまたぐ処理では、コンテキストを切り替えない
+    こちらを使う。
+    """
+    return _tracer.start_span(name, kind=kind, attributes=attributes)
+
+
+def current_trace_id() -> Optional[str]:
+    """記録中のスパンがあればトレースIDを返す（ログとトレースを突き合わせるため）"""
+    context = trace.get_current_span().get_span_context()
+    if not context.is_valid:
+        return None
+    return format(context.trace_id, "032x")
+
+
+class TracedRedis(redis.Redis):
+    """コマンドごとにスパンと所要時間を記録するRedisクライアント（pipeline で束ねたコマンドは対象外）"""
+
+    async def execute_command(self, *args, **options):
+        command = str(args[0]) if args else "UNKNOWN"
+        with span(
+            f"redis.{command}", **{"db.system": "redis", "db.operation": command}
+        ), timed(REDIS_COMMAND_SECONDS, command=redis_command_label(command)):
+            return await super().execute_command(*args, **options)
+
+
+class TracingMiddleware:
+    """
+    リクエストごとにサーバースパンを作るASGIミドルウェア
+
+    traceparent ヘッダーがあれば呼び出し元のトレースを引き継ぐ。スパン名は
+    ルーティング後にパスのテンプレート（例: GET /api/care_logs/{care_log_id}）にする。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        carrier = {
+            name.decode("latin-1"): value.decode("latin-1")
+            for name, value in scope.get("headers", [])
+        }
+        method = scope.get("method", "GET")
+        path = scope.get("path", "")
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        with _tracer.start_as_current_span(
+            f"{method} {path}",
+            context=propagate.extract(carrier),
+            kind=SpanKind.SERVER,
+            attributes={"http.request.method": method, "url.path": path},
+        ) as server_span:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = scope.get("route")
+                if route is not None and hasattr(route, "path"):
+                    server_span.update_name(f"{method} {route.path}")
+                    server_span.set_attribute("http.route", route.path)
+                server_span.set_attribute("http.response.status_code", status_code)
+                if status_code >= 500:
+                    server_span.set_status(Status(StatusCode.ERROR))
+
+
+def load_spans(path: str) -> list:
+    """span_to_json で書き出したファイルを読む"""
+    with open(path, "rb") as f:
+        return [orjson.loads(line) for line in f if line.strip()]
+
+
+def render_trace(spans: list, width: int = 40) -> str:
+    """
+    1トレース分のスパンを、開始位置と長さを横棒で表したテキストのフレームチャートにする
+
+    Args:
+        spans (list): 同じ trace_id のスパン
+        width (int): 横棒の幅（文字数）
+
+    Returns:
+        str: 1スパン1行のチャート
+    """
+    children = {}
+    for item in spans:
+        children.setdefault(item["parent_id"], []).append(item)
+    span_ids = {item["span_id"] for item in spans}
+    roots = [item for item in spans if item["parent_id"] not in span_ids]
+    started = min(item["start_ns"] for item in spans)
+    total = max(max(item["end_ns"] for item in spans) - started, 1)
+
+    lines = []
+
+    def walk(item: dict, depth: int) -> None:
+        offset = int((item["start_ns"] - started) / total * width)
+        length = max(int((item["end_ns"] - item["start_ns"]) / total * width), 1)
+        bar = (" " * offset + "█" * length).ljust(width)[:width]
+        label = ("  " * depth + item["name"])[:48]
+        duration_ms = (item["end_ns"] - item["start_ns"]) / 1e6
+        error = " !" if item["status"] == "ERROR" else ""
+        lines.append(f"{label:<48} {duration_ms:9.2f}ms |{bar}|{error}")
+        for child in sorted(
+            children.get(item["span_id"], []), key=lambda c: c["start_ns"]
+        ):
+            walk(child, depth + 1)
+
+    for root in sorted(roots, key=lambda r: r["start_ns"]):
+        walk(root, 0)
+    return "\n".join(lines)
+
+
+def main(argv=None) -> None:
+    """ファイルに書き出したスパンから、1リクエスト分のフレームチャートを表示する"""
+    parser = argparse.ArgumentParser(description="トレースのフレームチャートを表示する")
+    parser.add_argument("path", nargs="?", default=TRACING_FILE)
+    parser.add_argument("--trace-id", help="表示するトレース（省略時は一番遅いリクエスト）")
+    args = parser.parse_args(argv)
+
+    spans = load_spans(args.path)
+    trace_id = args.trace_id
+    if trace_id is None:
+        servers = [item for item in spans if item["kind"] == "SERVER"] or spans
+        slowest = max(servers, key=lambda item: item["end_ns"] - item["start_ns"])
+        trace_id = slowest["trace_id"]
+    selected = [item for item in spans if item["trace_id"] == trace_id]
+    if not selected:
+        raise SystemExit(f"trace_id={trace_id} のスパンが見つかりません")
+    print(f"trace_id={trace_id}")
+    print(render_trace(selected))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# gunicorn の設定（本番用。複数ワーカーでの起動）
+# 起動: gunicorn -c gunicorn.conf.py app.main:app
+# 各ワーカーのPrometheusメトリクスは PROMETHEUS_MULTIPROC_DIR に書き出され、
+# どのワーカーの /metrics からも全ワーカー分を集計した値が返る（app/metrics.py）。
+# マイグレーションはここでは実行しない（デプロイ前に prisma migrate deploy を1回だけ実行する）。
+
+import glob
+import math
+import os
+import sys
+import tempfile
+
+from uvicorn_worker import UvicornWorker
+
+# prometheus_client は最初の import のときに PROMETHEUS_MULTIPROC_DIR を見て値の保持方法を決める。
+# このファイルでは下で環境変数を設定するまで prometheus_client を import しない（child_exit の中で読み込む）
+
+
+def _read(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def cgroup_cpu_quota(root: str = "/sys/fs/cgroup"):
+    """
+    cgroup で制限されたCPU数（docker run --cpus や Kubernetes の limits）。制限がなければ None
+
+    cgroup v2 は cpu.max（"<quota> <period>" か "max <period>"）、
+    v1 は cpu/cpu.cfs_quota_us と cpu/cpu.cfs_period_us（quota が -1 なら無制限）を読む。
+    """
+    try:
+        quota, period = _read(os.path.join(root, "cpu.max")).split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int(_read(os.path.join(root, "cpu", "cpu.cfs_quota_us")))
+        period = int(_read(os.path.join(root, "cpu", "cpu.cfs_period_us")))
+        return quota / period if quota > 0 and period > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus(root: str = "/sys/fs/cgroup") -> float:
+    """このプロセスが使えるCPU数（割り当てられたコア数と cgroup のクォータの小さい方）"""
+    if hasattr(os, "sched_getaffinity"):
+        cores = len(os.sched_getaffinity(0))
+    else:
+        cores = os.cpu_count() or 1
+    quota = cgroup_cpu_quota(root)
+    return min(cores, quota) if quota else cores
+
+
+def default_workers(root: str = "/sys/fs/cgroup") -> int:
+    """CPU 1つにつき1ワーカー（クォータが 1.5 なら 2）。async のワーカーは I/O 待ちの間も他のリクエストを処理する"""
+    return max(1, math.ceil(available_cpus(root)))
+
+
+class UvloopWorker(UvicornWorker):
+    """uvloop のイベントループと httptools のHTTPパーサーを使うワーカー（入っていなければ起動時にエラー）"""
+
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
+
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+# WEB_CONCURRENCY を指定しなければ、コンテナのCPUクォータからワーカー数を決める
+workers = int(os.getenv("WEB_CONCURRENCY") or default_workers())
+worker_class = UvloopWorker
+
+# アプリを親プロセスで1回だけ読み込んでから fork する（起動が速く、読み込んだコードのメモリを共有する）
+# 親プロセスで起動したスレッドは子プロセスに引き継がれないので、post_fork で作り直す
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+# 上流のロードバランサーのアイドルタイムアウト（多くは60秒）より長くし、接続はLB側から閉じさせる
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "75"))
+# 停止・再起動（SIGTERM / SIGHUP）のとき、処理中のリクエストを待つ秒数
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+# この秒数応答しないワーカーは強制終了して起動し直す
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+# メモリの増加に備えてワーカーを定期的に入れ替える（全ワーカーが同時に入れ替わらないよう jitter でずらす）
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+# ワーカーが prometheus_client を読み込む前に設定しておく（fork した子プロセスに引き継がれる）
+# 大量の小さな書き込みが発生するので、tmpfs（/dev/shm など）を指定するとよい
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "wan-mission-metrics"),
+)
+# preload_app では on_starting より先にアプリ（prometheus_client）を読み込むので、ここで作っておく
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+
+def on_starting(server):
+    """前回の起動で残ったメトリクスのファイルを消してから、ワーカーを起動する"""
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    os.makedirs(path, exist_ok=True)
+    for stale in glob.glob(os.path.join(path, "*.db")):
+        os.remove(stale)
+    server.log.info("Prometheus multiprocess dir: %s", path)
+
+
+def post_fork(server, worker):  # pylint: disable=unused-argument
+    """preload_app のとき、親プロセスで起動したログの書き込みスレッドを子プロセスで作り直す"""
+    logger_module = sys.modules.get("app.logger")
+    if logger_module is not None:
+        logger_module.configure_logging(force=True)
+
+
+def child_exit(server, worker):  # pylint: disable=unused-argument
+    """停止したワーカーのゲージを集計から外す（カウンター・ヒストグラムの値は残す）"""
+    # pylint: disable-next=import-outside-toplevel
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
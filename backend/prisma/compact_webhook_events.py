@@ -0,0 +1,56 @@
+"""compact_webhook_events.py: webhook_events のパーティション作成と古い payload の退避を行うスクリプト
+
+アプリの定期タスク（WEBHOOK_RETENTION_ENABLED）を使わずに cron などから実行する場合に使う。
+退避先（--archive-dir または WEBHOOK_ARCHIVE_DIR）は永続ストレージを指定すること（退避後は DB から消える）。
+アプリの定期タスクと同時に動いても、ロックを取った一方だけが退避する。
+
+使い方（backendディレクトリで実行）:
+    PYTHONPATH=. python prisma/compact_webhook_events.py --retention-days 90 \
+        --archive-dir /mnt/archive/webhook_events
+"""
+
+import argparse
+import asyncio
+import os
+from pathlib import Path
+
+from app.db import prisma_client
+from app.logger import configure_logging
+from app.services.webhook_retention import compact_old_partitions, ensure_partitions
+
+
+async def main(argv=None) -> None:
+    """月パーティションを作成し、保持期間を過ぎたパーティションの payload を退避する"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--months-ahead", type=int, default=3)
+    parser.add_argument("--retention-days", type=int, default=90)
+    parser.add_argument(
+        "--archive-dir",
+        type=Path,
+        default=os.getenv("WEBHOOK_ARCHIVE_DIR") or None,
+        help="payload の退避先（gzip の JSON Lines。省略時は WEBHOOK_ARCHIVE_DIR）",
+    )
+    args = parser.parse_args(argv)
+    if args.archive_dir is None:
+        parser.error("--archive-dir か WEBHOOK_ARCHIVE_DIR で退避先を指定してください")
+    configure_logging()
+
+    await prisma_client.connect()
+    try:
+        created = await ensure_partitions(prisma_client, args.months_ahead)
+        print(f"[INFO] パーティションを{created}個作成しました")
+        results = await compact_old_partitions(
+            prisma_client, args.retention_days, Path(args.archive_dir)
+        )
+    finally:
+        await prisma_client.disconnect()
+
+    total = sum(result.rows for result in results)
+    print(f"[INFO] {len(results)}個のパーティションから{total}件のpayloadを退避しました")
+    skipped = [result.partition for result in results if result.skipped]
+    if skipped:
+        print(f"[INFO] 他のプロセスが退避中のためスキップ: {', '.join(skipped)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
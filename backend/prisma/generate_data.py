@@ -0,0 +1,598 @@
+"""generate_data.py: インデックスやページングのベンチマーク用に大量のデータを生成して投入するスクリプト
+
+N人分のユーザー・お世話設定・数年分の毎日のお世話記録・反省文・Webhookイベント（と支払い）を作る。
+乱数はユーザーごとに「seed とユーザー番号」から作るので、同じ seed なら何度実行しても、
+バッチの大きさを変えても同じデータになる。
+
+投入方法は2つ:
+- create_many（既定）: Prisma の create_many で、まとめて INSERT する
+- csv: テーブルごとのCSVと、psql の \\copy（COPY）で読み込む load.sql を書き出す（数百万行ならこちらが速い）
+
+使い方（backendディレクトリで実行）:
+    PYTHONPATH=. python prisma/generate_data.py --users 10000 --years 3 --seed 42
+    PYTHONPATH=. python prisma/generate_data.py --users 10000 --years 3 --format csv --out-dir generated
+    psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f generated/load.sql
+"""
+
+import argparse
+import asyncio
+import csv
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+
+import orjson
+
+# 外部キーの順（親テーブルが先）
+TABLE_COLUMNS = {
+    "users": [
+        "id",
+        "firebase_uid",
+        "email",
+        "current_plan",
+        "is_verified",
+        "created_at",
+        "updated_at",
+    ],
+    "care_settings": [
+        "id",
+        "user_id",
+        "parent_name",
+        "child_name",
+        "dog_name",
+        "care_start_date",
+        "care_end_date",
+        "morning_meal_time",
+        "night_meal_time",
+        "walk_time",
+        "care_clear_status",
+        "care_password",
+        "created_at",
+        "updated_at",
+    ],
+    "care_logs": [
+        "id",
+        "care_setting_id",
+        "date",
+        "fed_morning",
+        "fed_night",
+        "walk_result",
+        "walk_total_distance_m",
+        "created_at",
+    ],
+    "reflection_notes": [
+        "id",
+        "care_setting_id",
+        "content",
+        "approved_by_parent",
+        "created_at",
+        "updated_at",
+    ],
+    "payment": [
+        "id",
+        "user_id",
+        "firebase_uid",
+        "stripe_session_id",
+        "stripe_payment_intent_id",
+        "stripe_charge_id",
+        "amount",
+        "currency",
+        "status",
+        "created_at",
+    ],
+    "webhook_events": [
+        "id",
+        "event_type",
+        "stripe_session_id",
+        "stripe_payment_intent_id",
+        "customer_email",
+        "amount",
+        "currency",
+        "payment_status",
+        "payload",
+        "event_created_at",
+        "received_at",
+        "processed",
+        "firebase_uid",
+        "attempts",
+    ],
+}
+
+# 自動採番のIDを持つテーブル（投入後にシーケンスを進める）
+SERIAL_TABLES = ["care_settings", "care_logs", "reflection_notes", "payment"]
+
+PREMIUM_RATE = 0.15  # プレミアムプランのユーザーの割合
+CARE_SETTING_RATE = 0.9  # お世話設定まで進んだユーザーの割合
+ABANDONED_CHECKOUT_RATE = 0.03  # 無料ユーザーのうち、決済を途中でやめた割合
+PREMIUM_PRICE_JPY = 980
+
+DOG_NAMES = ["ポチ", "ハチ", "モモ", "ココ", "ソラ", "マロン", "チョコ", "レオ", "ハナ", "コタロウ"]
+CHILD_NAMES = ["たろう", "はなこ", "けんた", "さくら", "ゆうと", "あおい", "そうた", "めい"]
+PARENT_NAMES = ["おかあさん", "おとうさん", "おばあちゃん", "おじいちゃん"]
+NOTE_CONTENTS = [
+    "きょうはおさんぽをわすれてしまいました",
+    "ごはんのじかんにあそんでいました",
+    "あしたはちゃんとおせわします",
+    "ポチがまっていたのにいけませんでした",
+]
+
+
+@dataclass
+class IdSequence:
+    """自動採番のカラムに入れるID（投入先の最大値の次から振る）"""
+
+    next_ids: dict = field(default_factory=dict)
+
+    def take(self, table: str) -> int:
+        value = self.next_ids[table]
+        self.next_ids[table] = value + 1
+        return value
+
+
+def user_rng(seed: int, index: int) -> random.Random:
+    """ユーザーごとの乱数（バッチの区切り方によらず同じ値になる）"""
+    return random.Random(f"{seed}:{index}")
+
+
+def generate_user(
+    index: int,
+    *,
+    seed: int,
+    years: float,
+    today: date,
+    ids: IdSequence,
+    uid_prefix: str = "gen-",
+) -> dict:
+    """
+    1ユーザー分の全テーブルの行を作る
+
+    - 登録日は過去 years 年に一様に散らばる
+    - お世話期間は対数正規分布（中央値およそ3か月、長い人は数年）で、今日を超えない
+    - ユーザーごとのまじめさ（Beta分布）でごはん・散歩を忘れる確率が決まり、週末は散歩をさぼりやすい
+    - 散歩に失敗した日のうち一部で反省文を書く
+    - プレミアムのユーザーは Checkout 完了の Webhook イベントと支払いを1件ずつ持つ
+
+    Returns:
+        dict: テーブル名ごとの行のリスト
+    """
+    rng = user_rng(seed, index)
+    rows = {table: [] for table in TABLE_COLUMNS}
+    uid = f"{uid_prefix}{index:08d}"
+    user_id = str(uuid.uuid5(uuid.NAMESPACE_URL, uid))
+    email = f"{uid}@example.com"
+    history_days = max(int(years * 365), 1)
+    signed_up = datetime.combine(
+        today - timedelta(days=rng.randrange(history_days)),
+        datetime.min.time(),
+    ) + timedelta(seconds=rng.randrange(86400))
+    premium = rng.random() < PREMIUM_RATE
+
+    rows["users"].append(
+        {
+            "id": user_id,
+            "firebase_uid": uid,
+            "email": email,
+            "current_plan": "premium" if premium else "free",
+            "is_verified": rng.random() < 0.95,
+            "created_at": signed_up,
+            "updated_at": signed_up,
+        }
+    )
+
+    if premium:
+        purchased = signed_up + timedelta(seconds=int(rng.expovariate(1 / (7 * 86400))))
+        purchased = min(purchased, datetime.combine(today, datetime.min.time()))
+        _add_checkout(rows, rng, ids, user_id, uid, email, purchased, completed=True)
+    elif rng.random() < ABANDONED_CHECKOUT_RATE:
+        _add_checkout(
+            rows,
+            rng,
+            ids,
+            user_id,
+            uid,
+            email,
+            signed_up + timedelta(hours=1),
+            completed=False,
+        )
+
+    if rng.random() >= CARE_SETTING_RATE:
+        return rows
+
+    start = (signed_up + timedelta(days=int(rng.expovariate(1 / 3)))).date()
+    start = min(start, today)
+    planned_days = max(int(rng.lognormvariate(math.log(90), 1.0)), 7)
+    end = start + timedelta(days=planned_days)
+    logged_until = min(end, today)
+    diligence = rng.betavariate(8, 2)
+    setting_id = ids.take("care_settings")
+    meal_base = datetime.combine(start, datetime.min.time())
+
+    walked_days = 0
+    logged_days = 0
+    day = start
+    while day < logged_until:
+        logged_days += 1
+        logged_at = datetime.combine(day, datetime.min.time()) + timedelta(
+            hours=rng.randint(17, 21), minutes=rng.randrange(60)
+        )
+        walk_rate = diligence * (0.75 if day.weekday() >= 5 else 0.9)
+        attempted = rng.random() < 0.95
+        walked = attempted and rng.random() < walk_rate
+        walked_days += walked
+        rows["care_logs"].append(
+            {
+                "id": ids.take("care_logs"),
+                "care_setting_id": setting_id,
+                "date": day.isoformat(),
+                "fed_morning": rng.random() < diligence,
+                "fed_night": rng.random() < diligence * 0.95,
+                "walk_result": walked if attempted else None,
+                "walk_total_distance_m": (
+                    int(rng.lognormvariate(math.log(1500), 0.4)) if walked else None
+                ),
+                "created_at": logged_at,
+            }
+        )
+        if attempted and not walked and rng.random() < 0.15:
+            rows["reflection_notes"].append(
+                {
+                    "id": ids.take("reflection_notes"),
+                    "care_setting_id": setting_id,
+                    "content": rng.choice(NOTE_CONTENTS),
+                    "approved_by_parent": rng.random() < 0.7,
+                    "created_at": logged_at + timedelta(minutes=30),
+                    "updated_at": logged_at + timedelta(hours=2),
+                }
+            )
+        day += timedelta(days=1)
+
+    finished = end <= today
+    cleared = finished and logged_days and walked_days / logged_days >= 0.8
+    rows["care_settings"].append(
+        {
+            "id": setting_id,
+            "user_id": user_id,
+            "parent_name": rng.choice(PARENT_NAMES),
+            "child_name": rng.choice(CHILD_NAMES),
+            "dog_name": rng.choice(DOG_NAMES),
+            "care_start_date": datetime.combine(start, datetime.min.time()),
+            "care_end_date": datetime.combine(end, datetime.min.time()),
+            "morning_meal_time": meal_base.replace(hour=rng.choice([6, 7, 8])),
+            "night_meal_time": meal_base.replace(hour=rng.choice([18, 19, 20])),
+            "walk_time": meal_base.replace(hour=rng.choice([7, 16, 17, 18])),
+            "care_clear_status": "達成" if cleared else "未達成",
+            "care_password": f"{rng.randrange(10000):04d}",
+            "created_at": datetime.combine(start, datetime.min.time()),
+            "updated_at": datetime.combine(logged_until, datetime.min.time()),
+        }
+    )
+    return rows
+
+
+def _add_checkout(
+    rows: dict,
+    rng: random.Random,
+    ids: IdSequence,
+    user_id: str,
+    uid: str,
+    email: str,
+    at: datetime,
+    *,
+    completed: bool,
+) -> None:
+    """Checkoutセッションの Webhook イベント（完了なら支払いも）を追加する"""
+    token = f"{rng.getrandbits(64):016x}"
+    session_id = f"cs_gen_{token}"
+    intent_id = f"pi_gen_{token}" if completed else None
+    event_type = (
+        "checkout.session.completed" if completed else "checkout.session.expired"
+    )
+    payment_status = "paid" if completed else "unpaid"
+    payload = orjson.dumps(
+        {
+            "id": f"evt_gen_{token}",
+            "object": "event",
+            "type": event_type,
+            "created": int(at.replace(tzinfo=timezone.utc).timestamp()),
+            "data": {
+                "object": {
+                    "id": session_id,
+                    "object": "checkout.session",
+                    "amount_total": PREMIUM_PRICE_JPY,
+                    "currency": "jpy",
+                    "customer_email": email,
+                    "payment_intent": intent_id,
+                    "payment_status": payment_status,
+                    "metadata": {"firebase_uid": uid},
+                }
+            },
+        }
+    ).decode()
+    rows["webhook_events"].append(
+        {
+            "id": f"evt_gen_{token}",
+            "event_type": event_type,
+            "stripe_session_id": session_id if completed else None,
+            "stripe_payment_intent_id": intent_id,
+            "customer_email": email,
+            "amount": PREMIUM_PRICE_JPY,
+            "currency": "jpy",
+            "payment_status": payment_status,
+            "payload": payload,
+            "event_created_at": at,
+            "received_at": at,
+            "processed": True,
+            "firebase_uid": uid if completed else None,
+            "attempts": 1,
+        }
+    )
+    if completed:
+        rows["payment"].append(
+            {
+                "id": ids.take("payment"),
+                "user_id": user_id,
+                "firebase_uid": uid,
+                "stripe_session_id": session_id,
+                "stripe_payment_intent_id": intent_id,
+                "stripe_charge_id": f"ch_gen_{token}",
+                "amount": PREMIUM_PRICE_JPY,
+                "currency": "jpy",
+                "status": "paid",
+                "created_at": at + timedelta(seconds=rng.randint(1, 30)),
+            }
+        )
+
+
+def generate_batches(
+    users: int,
+    *,
+    seed: int,
+    years: float,
+    today: date,
+    ids: IdSequence,
+    batch_size: int,
+    uid_prefix: str = "gen-",
+) -> Iterator[dict]:
+    """batch_size 人ずつ、テーブルごとの行をまとめて返す（メモリに全件を持たない）"""
+    for batch_start in range(0, users, batch_size):
+        batch = {table: [] for table in TABLE_COLUMNS}
+        for index in range(batch_start, min(batch_start + batch_size, users)):
+            rows = generate_user(
+                index,
+                seed=seed,
+                years=years,
+                today=today,
+                ids=ids,
+                uid_prefix=uid_prefix,
+            )
+            for table, table_rows in rows.items():
+                batch[table].extend(table_rows)
+        yield batch
+
+
+def csv_value(value) -> str:
+    """COPY の CSV 形式の値（NULL は空欄）"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="milliseconds")
+    return str(value)
+
+
+class CsvSink:
+    """テーブルごとのCSVと、COPYで読み込む load.sql を書き出す"""
+
+    def __init__(self, out_dir: Path):
+        self.out_dir = out_dir
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self._files = {}
+        self._writers = {}
+        for table, columns in TABLE_COLUMNS.items():
+            # pylint: disable-next=consider-using-with
+            f = open(out_dir / f"{table}.csv", "w", encoding="utf-8", newline="")
+            self._files[table] = f
+            self._writers[table] = csv.writer(f)
+            self._writers[table].writerow(columns)
+
+    async def write(self, batch: dict) -> None:
+        for table, rows in batch.items():
+            columns = TABLE_COLUMNS[table]
+            self._writers[table].writerows(
+                [csv_value(row[column]) for column in columns] for row in rows
+            )
+
+    async def close(self, earliest: datetime) -> None:
+        for f in self._files.values():
+            f.close()
+        lines = [
+            "-- generate_data.py が書き出したCSVを COPY で読み込む",
+            "BEGIN;",
+            # 古い月の webhook_events もデフォルトパーティションに入らないように月パーティションを作る
+            f"SELECT \"ensure_webhook_events_partitions\"('{earliest.isoformat(sep=' ')}', 3);",
+        ]
+        for table, columns in TABLE_COLUMNS.items():
+            column_list = ", ".join(f'"{column}"' for column in columns)
+            path = (self.out_dir / f"{table}.csv").resolve()
+            lines.append(
+                f"\\copy \"{table}\" ({column_list}) FROM '{path}' "
+                "WITH (FORMAT csv, HEADER true)"
+            )
+        lines += [_setval_sql(table) + ";" for table in SERIAL_TABLES]
+        lines += ["COMMIT;", "ANALYZE;", ""]
+        (self.out_dir / "load.sql").write_text("\n".join(lines), encoding="utf-8")
+
+
+def _setval_sql(table: str) -> str:
+    """明示的にIDを入れたあと、次の自動採番が重複しないようにシーケンスを進める"""
+    return (
+        f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+        f'(SELECT COALESCE(MAX("id"), 1) FROM "{table}"))'
+    )
+
+
+class PrismaSink:
+    """
+    Prisma の create_many で投入する
+
+    親テーブル（users → care_settings）を入れ終わってから、子テーブルを chunk_size 行ずつ
+    concurrency 本まで並行に入れる。
+    """
+
+    def __init__(self, client, chunk_size: int, concurrency: int):
+        self.client = client
+        self.chunk_size = chunk_size
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def _insert(self, table: str, rows: list) -> None:
+        async with self._semaphore:
+            await getattr(self.client, table).create_many(data=rows)
+
+    async def _insert_all(self, table: str, rows: list) -> None:
+        await asyncio.gather(
+            *(
+                self._insert(table, rows[start : start + self.chunk_size])
+                for start in range(0, len(rows), self.chunk_size)
+            )
+        )
+
+    async def write(self, batch: dict) -> None:
+        await self._insert_all("users", batch["users"])
+        await self._insert_all("care_settings", batch["care_settings"])
+        await asyncio.gather(
+            *(
+                self._insert_all(table, batch[table])
+                for table in (
+                    "care_logs",
+                    "reflection_notes",
+                    "payment",
+                    "webhook_events",
+                )
+            )
+        )
+
+    async def close(
+        self, earliest: datetime
+    ) -> None:  # pylint: disable=unused-argument
+        for table in SERIAL_TABLES:
+            await self.client.execute_raw(_setval_sql(table))
+
+
+async def next_ids_from_database(client) -> IdSequence:
+    """投入先の各テーブルの最大IDの次から振る"""
+    next_ids = {}
+    for table in SERIAL_TABLES:
+        rows = await client.query_raw(
+            f'SELECT COALESCE(MAX("id"), 0) + 1 AS next_id FROM "{table}"'
+        )
+        next_ids[table] = int(rows[0]["next_id"])
+    return IdSequence(next_ids)
+
+
+async def generate(
+    sink,
+    *,
+    users: int,
+    seed: int,
+    years: float,
+    ids: IdSequence,
+    batch_size: int,
+    uid_prefix: str = "gen-",
+    today: Optional[date] = None,
+) -> dict:
+    """データを生成して sink に書き込み、テーブルごとの行数を返す"""
+    today = today or date.today()
+    counts = {table: 0 for table in TABLE_COLUMNS}
+    started = time.perf_counter()
+    for batch in generate_batches(
+        users,
+        seed=seed,
+        years=years,
+        today=today,
+        ids=ids,
+        batch_size=batch_size,
+        uid_prefix=uid_prefix,
+    ):
+        await sink.write(batch)
+        for table, rows in batch.items():
+            counts[table] += len(rows)
+        total = sum(counts.values())
+        elapsed = time.perf_counter() - started
+        print(
+            f"[INFO] users={counts['users']}/{users} rows={total} "
+            f"({total / elapsed:,.0f} rows/s)"
+        )
+    earliest = datetime.combine(
+        today - timedelta(days=max(int(years * 365), 1)), datetime.min.time()
+    )
+    await sink.close(earliest)
+    return counts
+
+
+async def main(argv=None) -> None:
+    """大量のダミーデータを生成して投入する（またはCSVに書き出す）"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--years", type=float, default=3.0, help="登録日を散らす期間")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--uid-prefix", default="gen-", help="firebase_uid の接頭辞")
+    parser.add_argument(
+        "--format", choices=["create_many", "csv"], default="create_many"
+    )
+    parser.add_argument("--out-dir", type=Path, default=Path("generated"))
+    parser.add_argument("--batch-size", type=int, default=500, help="1回に生成するユーザー数")
+    parser.add_argument(
+        "--chunk-size", type=int, default=5000, help="create_many 1回の行数"
+    )
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--id-start",
+        type=int,
+        default=1,
+        help="csv のときの自動採番カラムの開始値（空のDBに読み込むなら1）",
+    )
+    args = parser.parse_args(argv)
+
+    options = {
+        "users": args.users,
+        "seed": args.seed,
+        "years": args.years,
+        "batch_size": args.batch_size,
+        "uid_prefix": args.uid_prefix,
+    }
+    if args.format == "csv":
+        ids = IdSequence({table: args.id_start for table in SERIAL_TABLES})
+        counts = await generate(CsvSink(args.out_dir), ids=ids, **options)
+        print(f"[INFO] {args.out_dir / 'load.sql'} を psql で実行してください")
+    else:
+        # pylint: disable=import-outside-toplevel
+        from app.db import prisma_client
+        from app.logger import configure_logging
+
+        configure_logging()
+        await prisma_client.connect()
+        try:
+            await prisma_client.query_raw(
+                'SELECT "ensure_webhook_events_partitions"($1::timestamp, 3) AS created',
+                datetime.combine(
+                    date.today() - timedelta(days=max(int(args.years * 365), 1)),
+                    datetime.min.time(),
+                ).isoformat(),
+            )
+            ids = await next_ids_from_database(prisma_client)
+            sink = PrismaSink(prisma_client, args.chunk_size, args.concurrency)
+            counts = await generate(sink, ids=ids, **options)
+        finally:
+            await prisma_client.disconnect()
+
+    print("[INFO] " + " ".join(f"{table}={count}" for table, count in counts.items()))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
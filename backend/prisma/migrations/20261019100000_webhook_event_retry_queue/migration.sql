@@ -0,0 +1,8 @@
+-- AlterTable
+ALTER TABLE "webhook_events" ADD COLUMN     "attempts" INTEGER NOT NULL DEFAULT 0,
+ADD COLUMN     "locked_until" TIMESTAMP(3),
+ADD COLUMN     "next_attempt_at" TIMESTAMP(3);
+
+-- CreateIndex
+-- ワーカーが未処理行だけを received_at 順に取り出すための部分インデックス
+CREATE INDEX "webhook_events_unprocessed_received_at_idx" ON "webhook_events"("received_at") WHERE "processed" = false;
@@ -0,0 +1,13 @@
+-- AlterTable
+-- 受信したボディをそのまま保存するため JSONB から TEXT に変更する
+-- （既存行は json.dumps した文字列がJSON文字列値として入っているので #>> '{}' で元の文字列に戻す）
+ALTER TABLE "webhook_events" ALTER COLUMN "payload" SET DATA TYPE TEXT USING ("payload" #>> '{}');
+
+-- 未処理の checkout.session.completed は処理時に payload を読まなくなるため、
+-- 受信時に抽出していなかった金額・支払いステータスを payload から埋めておく
+UPDATE "webhook_events"
+SET "amount" = ("payload"::jsonb #>> '{data,object,amount_total}')::integer,
+    "payment_status" = "payload"::jsonb #>> '{data,object,payment_status}'
+WHERE "event_type" = 'checkout.session.completed'
+  AND "processed" = false
+  AND "payload" LIKE '{%';
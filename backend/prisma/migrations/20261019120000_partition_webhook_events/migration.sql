@@ -0,0 +1,87 @@
+-- webhook_events を received_at の月ごとのレンジパーティションに作り直す
+-- PostgreSQL ではパーティションキーを主キーに含める必要があるため、主キーを (id, received_at) にする。
+-- received_at は Stripe のイベント作成時刻（event.created）を入れるので、再送されても同じ値になり
+-- (id, received_at) の重複で引き続き冪等に受信できる。
+
+-- 既存テーブルを退避
+ALTER TABLE "webhook_events" RENAME TO "webhook_events_legacy";
+ALTER TABLE "webhook_events_legacy" RENAME CONSTRAINT "webhook_events_pkey" TO "webhook_events_legacy_pkey";
+DROP INDEX "webhook_events_unprocessed_received_at_idx";
+
+-- CreateTable
+CREATE TABLE "webhook_events" (
+    "id" TEXT NOT NULL,
+    "event_type" TEXT,
+    "stripe_session_id" TEXT,
+    "stripe_payment_intent_id" TEXT,
+    "customer_email" TEXT,
+    "amount" INTEGER,
+    "currency" TEXT,
+    "payment_status" TEXT,
+    "payload" TEXT,
+    "received_at" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "processed" BOOLEAN NOT NULL DEFAULT false,
+    "error_message" TEXT,
+    "firebase_uid" TEXT,
+    "attempts" INTEGER NOT NULL DEFAULT 0,
+    "next_attempt_at" TIMESTAMP(3),
+    "locked_until" TIMESTAMP(3),
+
+    CONSTRAINT "webhook_events_pkey" PRIMARY KEY ("id", "received_at")
+) PARTITION BY RANGE ("received_at");
+
+-- 月パーティションの範囲外（極端に古い・未来の日時）を受け止めるデフォルトパーティション
+CREATE TABLE "webhook_events_default" PARTITION OF "webhook_events" DEFAULT;
+
+-- CreateIndex
+-- ワーカーが未処理行だけを received_at 順に取り出すための部分インデックス（各パーティションに作られる）
+CREATE INDEX "webhook_events_unprocessed_received_at_idx" ON "webhook_events"("received_at") WHERE "processed" = false;
+
+-- start_at の月から「現在 + months_ahead ヶ月」までの月パーティション（webhook_events_pYYYYMM）を作成する
+-- アプリの定期タスクから呼ばれ、作成したパーティション数を返す
+CREATE OR REPLACE FUNCTION "ensure_webhook_events_partitions"(start_at TIMESTAMP(3), months_ahead INTEGER)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    month_start TIMESTAMP(3) := date_trunc('month', start_at);
+    last_month TIMESTAMP(3) := date_trunc('month', NOW() AT TIME ZONE 'UTC') + make_interval(months => months_ahead);
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        partition_name := 'webhook_events_p' || to_char(month_start, 'YYYYMM');
+        IF to_regclass(quote_ident(partition_name)) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF "webhook_events" FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                month_start,
+                month_start + INTERVAL '1 month'
+            );
+            created := created + 1;
+        END IF;
+        month_start := month_start + INTERVAL '1 month';
+    END LOOP;
+    RETURN created;
+END;
+$$;
+
+-- 既存データの期間をカバーするパーティションを先に作ってから移し替える
+SELECT "ensure_webhook_events_partitions"(
+    COALESCE((SELECT MIN("received_at") FROM "webhook_events_legacy"), NOW() AT TIME ZONE 'UTC'),
+    3
+);
+
+INSERT INTO "webhook_events" (
+    "id", "event_type", "stripe_session_id", "stripe_payment_intent_id", "customer_email",
+    "amount", "currency", "payment_status", "payload", "received_at", "processed",
+    "error_message", "firebase_uid", "attempts", "next_attempt_at", "locked_until"
+)
+SELECT
+    "id", "event_type", "stripe_session_id", "stripe_payment_intent_id", "customer_email",
+    "amount", "currency", "payment_status", "payload", COALESCE("received_at", CURRENT_TIMESTAMP), "processed",
+    "error_message", "firebase_uid", "attempts", "next_attempt_at", "locked_until"
+FROM "webhook_events_legacy";
+
+-- DropTable
+DROP TABLE "webhook_events_legacy";
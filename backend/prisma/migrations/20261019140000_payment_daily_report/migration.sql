@@ -0,0 +1,32 @@
+-- CreateMaterializedView
+-- 日別・通貨別の売上とプレミアム転換の集計（管理者向けレポート用）
+-- OLTPのテーブルを直接集計しないよう、定期タスクが REFRESH ... CONCURRENTLY で更新する
+-- （Prismaのスキーマでは管理せず、query_raw で読む）
+CREATE MATERIALIZED VIEW "payment_daily_report" AS
+WITH "paid" AS (
+    SELECT
+        p."user_id",
+        p."amount",
+        COALESCE(p."currency", 'unknown') AS "currency",
+        p."created_at",
+        ROW_NUMBER() OVER (PARTITION BY p."user_id" ORDER BY p."created_at", p."id") AS "nth"
+    FROM "payment" p
+    WHERE p."status" = 'paid' AND p."created_at" IS NOT NULL
+)
+SELECT
+    date_trunc('day', paid."created_at")::date AS "day",
+    paid."currency",
+    COUNT(*)::integer AS "payments",
+    -- そのユーザーの最初の支払いだけを転換として数える
+    (COUNT(*) FILTER (WHERE paid."nth" = 1))::integer AS "conversions",
+    COALESCE(SUM(paid."amount"), 0)::bigint AS "revenue",
+    (AVG(EXTRACT(EPOCH FROM (paid."created_at" - u."created_at")))
+        FILTER (WHERE paid."nth" = 1))::double precision AS "avg_seconds_to_purchase"
+FROM "paid"
+JOIN "users" u ON u."id" = paid."user_id"
+GROUP BY 1, 2
+WITH DATA;
+
+-- CreateIndex
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY にはユニークインデックスが必要
+CREATE UNIQUE INDEX "payment_daily_report_day_currency_key" ON "payment_daily_report"("day", "currency");
@@ -0,0 +1,78 @@
+-- webhook_events のパーティションキーを received_at から event_created_at に移す
+-- received_at にはこれまで Stripe のイベント作成時刻（event.created）を入れていたが、
+-- ワーカーの処理順・再処理の範囲・保持期間はどれも「受信した時刻」のつもりで読んでいた。
+-- received_at は受信時刻に戻し、パーティションキー兼主キーの一部には event_created_at を別に持つ。
+-- Stripe は再送でも同じイベント（同じ id と created）を送るので、(id, event_created_at) の重複で冪等に受信できる。
+-- パーティションキーは変更できないため、テーブルを作り直して移し替える。
+
+-- 既存テーブルと、そのパーティション・インデックスを退避（同じ名前で作り直すため）
+ALTER TABLE "webhook_events" RENAME TO "webhook_events_legacy";
+ALTER TABLE "webhook_events_legacy" RENAME CONSTRAINT "webhook_events_pkey" TO "webhook_events_legacy_pkey";
+DROP INDEX "webhook_events_unprocessed_received_at_idx";
+
+DO $$
+DECLARE
+    partition_name TEXT;
+BEGIN
+    FOR partition_name IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = '"webhook_events_legacy"'::regclass
+    LOOP
+        EXECUTE format('ALTER TABLE %I RENAME TO %I', partition_name, partition_name || '_legacy');
+    END LOOP;
+END;
+$$;
+
+-- CreateTable
+CREATE TABLE "webhook_events" (
+    "id" TEXT NOT NULL,
+    "event_type" TEXT,
+    "stripe_session_id" TEXT,
+    "stripe_payment_intent_id" TEXT,
+    "customer_email" TEXT,
+    "amount" INTEGER,
+    "currency" TEXT,
+    "payment_status" TEXT,
+    "payload" TEXT,
+    "event_created_at" TIMESTAMP(3) NOT NULL,
+    "received_at" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "processed" BOOLEAN NOT NULL DEFAULT false,
+    "error_message" TEXT,
+    "firebase_uid" TEXT,
+    "attempts" INTEGER NOT NULL DEFAULT 0,
+    "next_attempt_at" TIMESTAMP(3),
+    "locked_until" TIMESTAMP(3),
+
+    CONSTRAINT "webhook_events_pkey" PRIMARY KEY ("id", "event_created_at")
+) PARTITION BY RANGE ("event_created_at");
+
+-- 月パーティションの範囲外（極端に古い・未来の日時）を受け止めるデフォルトパーティション
+CREATE TABLE "webhook_events_default" PARTITION OF "webhook_events" DEFAULT;
+
+-- CreateIndex
+-- ワーカーが未処理行だけを受信順に取り出すための部分インデックス（各パーティションに作られる）
+CREATE INDEX "webhook_events_unprocessed_received_at_idx" ON "webhook_events"("received_at") WHERE "processed" = false;
+
+-- 既存データの期間をカバーするパーティションを先に作ってから移し替える
+SELECT "ensure_webhook_events_partitions"(
+    COALESCE((SELECT MIN("received_at") FROM "webhook_events_legacy"), NOW() AT TIME ZONE 'UTC'),
+    3
+);
+
+-- 既存行の received_at はイベント作成時刻なので、そのまま event_created_at にする
+-- （本当の受信時刻は残っていないため、received_at も同じ値のままにする）
+INSERT INTO "webhook_events" (
+    "id", "event_type", "stripe_session_id", "stripe_payment_intent_id", "customer_email",
+    "amount", "currency", "payment_status", "payload", "event_created_at", "received_at", "processed",
+    "error_message", "firebase_uid", "attempts", "next_attempt_at", "locked_until"
+)
+SELECT
+    "id", "event_type", "stripe_session_id", "stripe_payment_intent_id", "customer_email",
+    "amount", "currency", "payment_status", "payload", "received_at", "received_at", "processed",
+    "error_message", "firebase_uid", "attempts", "next_attempt_at", "locked_until"
+FROM "webhook_events_legacy";
+
+-- DropTable（退避したパーティションもまとめて削除される）
+DROP TABLE "webhook_events_legacy";
@@ -0,0 +1,3 @@
+-- CreateIndex
+-- リレーが配信から保持期間を過ぎた行を削除するための部分インデックス
+CREATE INDEX "outbox_events_published_at_idx" ON "outbox_events"("published_at") WHERE "published_at" IS NOT NULL;
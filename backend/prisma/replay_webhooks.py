@@ -0,0 +1,118 @@
+"""replay_webhooks.py: 過去のWebhookイベントを期間指定で再処理するスクリプト
+
+使い方（backendディレクトリで実行）:
+    PYTHONPATH=. python prisma/replay_webhooks.py --since 2025-07-01 --until 2025-08-01
+    PYTHONPATH=. python prisma/replay_webhooks.py --since 2025-07-01 --until 2025-08-01 \
+        --include-processed --resume
+    PYTHONPATH=. python prisma/replay_webhooks.py --since 2025-07-01 --until 2025-08-01 \
+        --dry-run
+"""
+
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from app.db import prisma_client
+from app.logger import configure_logging
+from app.services.webhook_replay import ReplayCheckpoint, replay_webhook_events
+from app.services.webhook_service import BatchResult
+
+
+def parse_datetime(value: str) -> datetime:
+    """ISO 8601 の日時をパースする（タイムゾーンなしはUTCとして扱う）"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """コマンドライン引数を読み込む"""
+    parser = argparse.ArgumentParser(
+        description="webhook_events を received_at の範囲で読み直して再処理する"
+    )
+    parser.add_argument(
+        "--since", type=parse_datetime, required=True, help="開始日時（含む）"
+    )
+    parser.add_argument(
+        "--until", type=parse_datetime, required=True, help="終了日時（含まない）"
+    )
+    parser.add_argument("--event-type", default="checkout.session.completed")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--include-processed",
+        action="store_true",
+        help="処理済みのイベントも再処理する",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="書き込まずに件数だけを数える"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        default=Path("replay_webhooks.checkpoint.json"),
+        help="チェックポイントファイルのパス",
+    )
+    parser.add_argument(
+        "--resume", action="store_true", help="チェックポイントから再開する"
+    )
+    parser.add_argument(
+        "--progress-every",
+        type=int,
+        default=10,
+        help="何バッチごとに進捗を表示するか",
+    )
+    return parser.parse_args(argv)
+
+
+def print_result(label: str, result: BatchResult) -> None:
+    """処理件数とスループットを表示する"""
+    print(
+        f"[{label}] 処理 {result.processed} 件 / スキップ {result.skipped} 件 / "
+        f"失敗 {result.failed} 件 / {result.elapsed_seconds:.1f} 秒 "
+        f"({result.events_per_second:.1f} events/sec)"
+    )
+
+
+async def main(argv=None) -> int:
+    """期間内のWebhookイベントを再処理する非同期関数
+
+    Returns:
+        int: 終了コード（失敗したイベントがあれば 1）
+    """
+    args = parse_args(argv)
+    configure_logging()
+    batches = 0
+
+    def on_progress(result: BatchResult, checkpoint: ReplayCheckpoint) -> None:
+        nonlocal batches
+        batches += 1
+        if batches % args.progress_every == 0:
+            print_result(f"進捗 〜{checkpoint.received_at}", result)
+
+    await prisma_client.connect()
+    try:
+        result = await replay_webhook_events(
+            args.since,
+            args.until,
+            event_type=args.event_type,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            include_processed=args.include_processed,
+            dry_run=args.dry_run,
+            checkpoint_path=args.checkpoint,
+            resume=args.resume,
+            on_progress=on_progress,
+        )
+    finally:
+        await prisma_client.disconnect()
+
+    print_result("dry-run" if args.dry_run else "完了", result)
+    return 1 if result.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
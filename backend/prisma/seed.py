@@ -10,6 +10,7 @@ from app.db import prisma_client
 async def main():
     """データベースにテスト用のダミーデータを挿入する非同期関数。
     各テーブルに1件ずつレコードを作成する。
+    ベンチマーク用の大量データは generate_data.py で作る。
     """  # C0116対策
     # Prisma クライアントの接続
     db = prisma_client
@@ -43,28 +44,19 @@ async def main():
         }
     )
 
-    # 3. お世話記録を作成（care_logs テーブル）
-    care_log = await db.care_logs.create(
+    # 3. お世話記録を作成（care_logs テーブル。散歩の結果もここに記録する）
+    await db.care_logs.create(
         data={
             "care_setting_id": care_setting.id,
-            "date": datetime.now(),
+            "date": datetime.now().date().isoformat(),
             "fed_morning": True,
             "fed_night": False,
+            "walk_result": True,
+            "walk_total_distance_m": 1500,
         }
     )
 
-    # 4. 散歩ミッションを作成（walk_missions テーブル）
-    await db.walk_missions.create(
-        data={
-            "care_log_id": care_log.id,
-            "started_at": datetime.now() - timedelta(minutes=30),
-            "ended_at": datetime.now(),
-            "total_distance_m": 1500,
-            "result": "success",
-        }
-    )
-
-    # 5. 反省ノートを作成（reflection_notes テーブル）
+    # 4. 反省ノートを作成（reflection_notes テーブル）
     await db.reflection_notes.create(
         data={
             "care_setting_id": care_setting.id,
@@ -73,7 +65,7 @@ async def main():
         }
     )
 
-    # 6. メッセージログを作成（message_logs テーブル）
+    # 5. メッセージログを作成（message_logs テーブル）
     await db.message_logs.create(
         data={
             "user_id": user.id,
@@ -82,7 +74,7 @@ async def main():
         }
     )
 
-    # 7. 支払い記録を作成（payment テーブル）
+    # 6. 支払い記録を作成（payment テーブル）
     await db.payment.create(
         data={
             "user_id": user.id,
@@ -96,7 +88,7 @@ async def main():
         }
     )
 
-    # 8. Webhookイベントを作成（webhook_events テーブル）
+    # 7. Webhookイベントを作成（webhook_events テーブル）
     await db.webhook_events.create(
         data={
             "id": str(uuid.uuid4()),
@@ -0,0 +1,118 @@
+"""bench_logging.py: ログの出し方による /api/care_logs/today のスループット比較
+
+DBはモックに置き換え、ASGIアプリを直接呼び出して1秒あたりの処理件数を測る。
+- sync: ハンドラーがリクエスト処理中にファイルへ書き込む（従来の print と同じ）
+- queue: キューに積むだけにして、書き込みはバックグラウンドのスレッドで行う
+- queue+sampling: さらに /api/care_logs/today の INFO 以下を 10% に間引く
+
+使い方（backendディレクトリで実行）:
+    PYTHONPATH=. python tests/benchmark/bench_logging.py --requests 5000
+"""
+
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import httpx
+from fastapi import FastAPI
+
+from app.dependencies import verify_firebase_token
+from app.logger import (
+    JsonFormatter,
+    RequestContextFilter,
+    RequestContextMiddleware,
+    configure_logging,
+    shutdown_logging,
+)
+from app.routers import care_logs
+
+TODAY_URL = "/api/care_logs/today?care_setting_id=1&date=2025-07-01"
+
+
+def build_app(sample_rates: dict) -> FastAPI:
+    """care_logs ルーターだけを載せたアプリ（DBと認証はモック）"""
+    mock_client = AsyncMock()
+    mock_client.care_settings.find_first.return_value = SimpleNamespace(id=1)
+    mock_client.care_logs.find_first.return_value = SimpleNamespace(
+        id=1, fed_morning=True, fed_night=False, walk_result=True
+    )
+    care_logs.prisma_client = mock_client
+
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware, sample_rates=sample_rates)
+    app.include_router(care_logs.care_logs_router)
+    app.dependency_overrides[verify_firebase_token] = lambda: "bench-uid"
+    return app
+
+
+def use_sync_handler(level: str, stream) -> None:
+    """キューを通さず、ログを出したその場で書き込むハンドラーにする"""
+    shutdown_logging()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter())
+    handler.addFilter(RequestContextFilter())
+    app_logger = logging.getLogger("app")
+    app_logger.handlers = [handler]
+    app_logger.setLevel(level)
+    app_logger.propagate = False
+
+
+async def run(app: FastAPI, requests: int, concurrency: int) -> float:
+    """requests 件を concurrency 並列で投げ、1秒あたりの処理件数を返す"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one() -> None:
+            async with semaphore:
+                response = await client.get(TODAY_URL)
+                response.raise_for_status()
+
+        await asyncio.gather(*(one() for _ in range(50)))  # ウォームアップ
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return requests / (time.perf_counter() - started)
+
+
+def main(argv=None) -> None:
+    """3つのモードで計測して結果を表示する"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument(
+        "--level",
+        default="DEBUG",
+        help="ログレベル（DEBUG なら従来の print と同じ量を出す）",
+    )
+    args = parser.parse_args(argv)
+
+    modes = [
+        ("sync", {}, True),
+        ("queue", {}, False),
+        ("queue+sampling", {"/api/care_logs/today": 0.1}, False),
+    ]
+    baseline = None
+    for name, sample_rates, sync in modes:
+        with tempfile.TemporaryFile("w+", encoding="utf-8") as stream:
+            if sync:
+                use_sync_handler(args.level, stream)
+            else:
+                configure_logging(args.level, stream=stream, force=True)
+            rps = asyncio.run(
+                run(build_app(sample_rates), args.requests, args.concurrency)
+            )
+            shutdown_logging()
+            stream.seek(0)
+            lines = sum(1 for _ in stream)
+        baseline = baseline or rps
+        print(f"{name:<16} {rps:8.0f} req/s  ({rps / baseline:4.2f}x, {lines}行出力)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""bench_workers.py: gunicorn のワーカー数・ワーカークラスごとのスループット比較
+
+gunicorn.conf.py でサーバーを起動し直しながら同じ負荷をかけ、RPS と p50/p99 を並べる。
+負荷をかける側は複数プロセスに分ける（1プロセスの httpx では数千RPSで頭打ちになるため）。
+同じマシンで動かすとサーバーと負荷側がCPUを取り合うので、負荷側のプロセス数の分のコアを残した
+範囲でワーカー数を比べること（コンテナなら docker run --cpus でサーバー側を制限するとよい）。
+
+サーバーの起動には本番と同じく DATABASE_URL（lifespan で接続する）が必要。
+
+使い方（backendディレクトリで実行）:
+    PYTHONPATH=. python tests/benchmark/bench_workers.py --workers 1 2 4 --duration 20
+    # uvloop/httptools と asyncio/h11 を比べる
+    PYTHONPATH=. python tests/benchmark/bench_workers.py --workers 2 --worker-class uvloop asyncio
+    # 認証付きのエンドポイント（loadtest.py seed で投入したDB）
+    LOAD_TEST_MODE=true PYTHONPATH=. python tests/benchmark/bench_workers.py \\
+        --path /api/care_settings/me --header "Authorization: Bearer loadtest-00000"
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+
+from loadtest import summarize
+
+BACKEND_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+# uvloop は gunicorn.conf.py の既定（UvloopWorker）、asyncio は標準のイベントループと h11
+WORKER_CLASSES = {"uvloop": None, "asyncio": "uvicorn_worker.UvicornH11Worker"}
+
+
+def start_server(workers: int, worker_class: str, bind: str, log_path: str):
+    """gunicorn を起動する（ワーカー数は WEB_CONCURRENCY で渡す）"""
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"]
+    if WORKER_CLASSES[worker_class]:
+        command += ["-k", WORKER_CLASSES[worker_class]]
+    command.append("app.main:app")
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "BIND": bind}
+    log = open(log_path, "ab")  # pylint: disable=consider-using-with
+    return subprocess.Popen(
+        command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+def stop_server(process) -> None:
+    """SIGTERM で止める（処理中のリクエストを終えてから終了する）"""
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def wait_until_ready(url: str, timeout: float = 60.0) -> None:
+    """サーバーが応答するまで待つ"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} が {timeout} 秒以内に起動しませんでした")
+
+
+async def _drive_async(
+    url: str, headers: dict, concurrency: int, duration: float, warmup: float
+):
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        headers=headers, limits=limits, timeout=30.0
+    ) as client:
+        started = time.perf_counter()
+        record_from = started + warmup
+        stop_at = record_from + duration
+
+        async def user():
+            nonlocal errors
+            while True:
+                begin = time.perf_counter()
+                if begin >= stop_at:
+                    return
+                try:
+                    response = await client.get(url)
+                    failed = response.status_code >= 500
+                except httpx.HTTPError:
+                    failed = True
+                end = time.perf_counter()
+                if begin < record_from:
+                    continue
+                if failed:
+                    errors += 1
+                else:
+                    latencies.append(end - begin)
+
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+    return latencies, errors
+
+
+def drive(url: str, headers: dict, concurrency: int, duration: float, warmup: float):
+    """1プロセス分の負荷（ウォームアップ中の結果は捨てる）"""
+    return asyncio.run(_drive_async(url, headers, concurrency, duration, warmup))
+
+
+def measure(args, workers: int, worker_class: str) -> dict:
+    """サーバーを起動して負荷をかけ、結果をまとめる"""
+    bind = f"127.0.0.1:{args.port}"
+    url = f"http://{bind}{args.path}"
+    headers = dict(header.split(":", 1) for header in args.header)
+    headers = {name.strip(): value.strip() for name, value in headers.items()}
+    per_process = max(1, args.concurrency // args.client_processes)
+
+    server = start_server(workers, worker_class, bind, args.server_log)
+    try:
+        wait_until_ready(f"http://{bind}/")
+        with ProcessPoolExecutor(args.client_processes) as pool:
+            futures = [
+                pool.submit(
+                    drive, url, headers, per_process, args.duration, args.warmup
+                )
+                for _ in range(args.client_processes)
+            ]
+            results = [future.result() for future in futures]
+    finally:
+        stop_server(server)
+
+    latencies = [latency for result, _ in results for latency in result]
+    errors = sum(errors for _, errors in results)
+    return {
+        "workers": workers,
+        "worker_class": worker_class,
+        **summarize(latencies, errors, args.duration),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="ワーカー数ごとのスループット比較")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument(
+        "--worker-class", nargs="+", choices=list(WORKER_CLASSES), default=["uvloop"]
+    )
+    parser.add_argument("--path", default="/")
+    parser.add_argument(
+        "--header", action="append", default=[], help='"Name: value" の形式'
+    )
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--client-processes", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--server-log", default=os.devnull)
+    parser.add_argument("--output", help="結果のJSONの出力先")
+    args = parser.parse_args(argv)
+
+    rows = []
+    print(
+        f"{'workers':>7} {'class':>8} {'rps':>10} {'p50_ms':>8} {'p99_ms':>8} {'errors':>7}"
+    )
+    for worker_class in args.worker_class:
+        for workers in args.workers:
+            row = measure(args, workers, worker_class)
+            rows.append(row)
+            print(
+                f"{workers:>7} {worker_class:>8} {row['rps']:>10.1f}"
+                f" {row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['errors']:>7}"
+            )
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"path": args.path, "results": rows}, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
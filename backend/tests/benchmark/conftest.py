@@ -0,0 +1,117 @@
+"""ホットパスのベンチマーク（test_hot_paths.py）用のフィクスチャ
+
+DBの代わりに、決まったレコードをすぐ返すだけの FakePrisma を使う。
+AsyncMock は呼び出しの記録に時間がかかり、測りたい処理より重くなるので使わない。
+"""
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+CARE_START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+# 1年分のお世話記録（/api/care_logs/list が返す最大に近い件数）
+CARE_LOG_DAYS = 365
+
+
+def make_care_setting(setting_id: int = 10, user_id: str = "user-1") -> SimpleNamespace:
+    """Prismaの care_settings レコードと同じ属性を持つオブジェクト"""
+    return SimpleNamespace(
+        id=setting_id,
+        user_id=user_id,
+        parent_name="パパ",
+        child_name="たろう",
+        dog_name="ポチ",
+        care_start_date=CARE_START,
+        care_end_date=CARE_START + timedelta(days=CARE_LOG_DAYS - 1),
+        morning_meal_time=CARE_START.replace(hour=7, minute=30),
+        night_meal_time=CARE_START.replace(hour=18, minute=0),
+        walk_time=CARE_START.replace(hour=16, minute=0),
+        care_password="1234",
+        care_clear_status="active",
+        created_at=CARE_START,
+        updated_at=CARE_START,
+    )
+
+
+def make_care_logs(setting_id: int = 10, days: int = CARE_LOG_DAYS) -> list:
+    """Prismaの care_logs レコードと同じ属性を持つオブジェクトを days 日分"""
+    logs = []
+    for day in range(days):
+        logged_at = CARE_START + timedelta(days=day, hours=20)
+        logs.append(
+            SimpleNamespace(
+                id=day + 1,
+                care_setting_id=setting_id,
+                date=logged_at.strftime("%Y-%m-%d"),
+                fed_morning=True,
+                fed_night=day % 3 != 0,
+                walk_result=day % 4 != 0,
+                walk_total_distance_m=1200 + day % 500,
+                created_at=logged_at,
+            )
+        )
+    return logs
+
+
+class FakeTable:
+    """find_* / create / update が決まった値を返すだけのテーブル"""
+
+    def __init__(self, *, one=None, many=()):
+        self.one = one
+        self.many = list(many)
+
+    async def find_unique(self, **_):
+        return self.one
+
+    async def find_first(self, **_):
+        return self.one
+
+    async def find_many(self, **_):
+        return self.many
+
+    async def create(self, **_):
+        return self.one
+
+    async def update(self, **_):
+        return self.one
+
+
+class FakePrisma:
+    """ルーターが使う prisma_client の代わり"""
+
+    def __init__(self):
+        self.users = FakeTable(
+            one=SimpleNamespace(id="user-1", firebase_uid="bench-uid")
+        )
+        self.care_settings = FakeTable(one=make_care_setting())
+        self.care_logs = FakeTable(one=make_care_logs(days=1)[0], many=make_care_logs())
+
+
+def _run_sync(coro):
+    """
+    途中で待ちが発生しないコルーチンを、イベントループを使わずに最後まで実行する
+
+    run_until_complete の数十マイクロ秒がハンドラー本体の計測に混ざらないようにする。
+    """
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coro.close()
+    raise RuntimeError("コルーチンが途中で待ちに入りました（FakePrisma以外のI/Oがあります）")
+
+
+@pytest.fixture
+def fake_prisma(monkeypatch):
+    """care_logs / care_settings ルーターの prisma_client を FakePrisma に差し替える"""
+    client = FakePrisma()
+    monkeypatch.setattr("app.routers.care_logs.prisma_client", client)
+    monkeypatch.setattr("app.routers.care_settings.prisma_client", client)
+    return client
+
+
+@pytest.fixture
+def run_sync():
+    """イベントループを使わずにハンドラーを実行する関数"""
+    return _run_sync
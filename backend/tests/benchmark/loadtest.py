@@ -0,0 +1,653 @@
+"""loadtest.py: 認証付きAPIを含む全ルーターの負荷試験
+
+サーバーを LOAD_TEST_MODE=true で起動すると、Firebase の IDトークンの代わりに
+"Bearer loadtest-<n>" をそのままUIDとして受け付ける（app/dependencies.py）。
+この UID のユーザーとお世話データを seed で投入し、run で実際の利用に近い割合の
+リクエストを指定した並列数で送り、エンドポイントごとの p50/p95/p99 と RPS を JSON に書き出す。
+compare で2つの結果（コミット間など）を比べる。
+
+使い方（backendディレクトリで実行）:
+    LOAD_TEST_MODE=true WEB_CONCURRENCY=2 gunicorn -c gunicorn.conf.py app.main:app
+    PYTHONPATH=. python tests/benchmark/loadtest.py seed --users 200
+    PYTHONPATH=. python tests/benchmark/loadtest.py run --concurrency 50 --duration 60 \\
+        --output loadtest-results/$(git rev-parse --short HEAD).json
+    PYTHONPATH=. python tests/benchmark/loadtest.py compare loadtest-results/<before>.json \\
+        loadtest-results/<after>.json --max-regression 0.2
+
+- 無料プランのユーザーだけを作るので、OpenAI は呼ばれない（/api/message_logs は固定メッセージ）
+- Stripe を呼ぶ /api/payments/create-checkout-session は --include-stripe のときだけ送る（テスト用のキーで）
+- /api/reports は --admin-uid を指定し、サーバーの ADMIN_FIREBASE_UIDS にも同じ UID を設定したときだけ送る
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+LOAD_TEST_UID_PREFIX = "loadtest-"
+PIN = "1234"
+
+
+def load_test_uid(index: int) -> str:
+    """index 番目の負荷試験用ユーザーのUID"""
+    return f"{LOAD_TEST_UID_PREFIX}{index:05d}"
+
+
+# ---------------------------------------------------------------------------
+# データ投入
+# ---------------------------------------------------------------------------
+
+
+def build_user_rows(index: int, rng: random.Random, today: date) -> dict:
+    """
+    1ユーザー分の行を作る（同じ seed なら同じデータになる）
+
+    お世話期間は 1〜12 週間、記録は期間の開始から昨日までで、ごはん・散歩は
+    ときどき忘れる（今日の記録は負荷試験中に POST で作る）。
+    """
+    uid = load_test_uid(index)
+    user_id = str(uuid.uuid5(uuid.NAMESPACE_URL, uid))
+    weeks = rng.randint(1, 12)
+    start = today - timedelta(days=rng.randint(1, weeks * 7))
+    end = start + timedelta(weeks=weeks)
+    base = datetime.combine(today, datetime.min.time(), tzinfo=timezone.utc)
+
+    care_logs = []
+    day = start
+    while day < today:
+        walked = rng.random() < 0.7
+        care_logs.append(
+            {
+                "date": day.isoformat(),
+                "fed_morning": rng.random() < 0.9,
+                "fed_night": rng.random() < 0.8,
+                "walk_result": walked,
+                "walk_total_distance_m": (
+                    max(int(rng.gauss(1500, 500)), 100) if walked else None
+                ),
+            }
+        )
+        day += timedelta(days=1)
+
+    return {
+        "user": {
+            "id": user_id,
+            "firebase_uid": uid,
+            "email": f"{uid}@example.com",
+            "current_plan": "free",
+            "is_verified": True,
+        },
+        "care_setting": {
+            "user_id": user_id,
+            "parent_name": "おかあさん",
+            "child_name": f"こども{index}",
+            "dog_name": rng.choice(["ポチ", "ハチ", "モモ", "ココ", "ソラ"]),
+            "care_start_date": datetime.combine(start, datetime.min.time()),
+            "care_end_date": datetime.combine(end, datetime.min.time()),
+            "morning_meal_time": base.replace(hour=rng.choice([6, 7, 8])),
+            "night_meal_time": base.replace(hour=rng.choice([18, 19, 20])),
+            "walk_time": base.replace(hour=rng.choice([7, 16, 17])),
+            "care_password": PIN,
+            "care_clear_status": "未達成",
+        },
+        "care_logs": care_logs,
+        "reflection_notes": [
+            {
+                "content": "きょうはおさんぽをわすれてしまいました",
+                "approved_by_parent": rng.random() < 0.5,
+            }
+            for _ in range(rng.randint(0, 3))
+        ],
+    }
+
+
+async def seed(users: int, seed_value: int, chunk_size: int = 5000) -> None:
+    """負荷試験用のユーザーとお世話データを投入する（投入済みのユーザーは飛ばす）"""
+    # pylint: disable=import-outside-toplevel
+    from app.db import prisma_client
+
+    rng = random.Random(seed_value)
+    today = date.today()
+    rows = [build_user_rows(index, rng, today) for index in range(users)]
+    user_ids = [row["user"]["id"] for row in rows]
+
+    await prisma_client.connect()
+    try:
+        await prisma_client.users.create_many(
+            data=[row["user"] for row in rows], skip_duplicates=True
+        )
+        seeded = {
+            setting.user_id
+            for setting in await prisma_client.care_settings.find_many(
+                where={"user_id": {"in": user_ids}}
+            )
+        }
+        pending = [row for row in rows if row["user"]["id"] not in seeded]
+        await prisma_client.care_settings.create_many(
+            data=[row["care_setting"] for row in pending]
+        )
+        setting_ids = {
+            setting.user_id: setting.id
+            for setting in await prisma_client.care_settings.find_many(
+                where={"user_id": {"in": [row["user"]["id"] for row in pending]}}
+            )
+        }
+
+        care_logs = []
+        notes = []
+        for row in pending:
+            setting_id = setting_ids[row["user"]["id"]]
+            care_logs += [
+                {**log, "care_setting_id": setting_id} for log in row["care_logs"]
+            ]
+            notes += [
+                {**note, "care_setting_id": setting_id}
+                for note in row["reflection_notes"]
+            ]
+        for start in range(0, len(care_logs), chunk_size):
+            await prisma_client.care_logs.create_many(
+                data=care_logs[start : start + chunk_size]
+            )
+        if notes:
+            await prisma_client.reflection_notes.create_many(data=notes)
+        print(
+            f"users={users} seeded={len(pending)} care_logs={len(care_logs)} "
+            f"reflection_notes={len(notes)}"
+        )
+    finally:
+        await prisma_client.disconnect()
+
+
+# ---------------------------------------------------------------------------
+# 負荷の生成
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class VirtualUser:
+    """1人分の利用者（seed で投入したユーザーのどれか）"""
+
+    uid: str
+    care_setting_id: Optional[int] = None
+    today_log_id: Optional[int] = None
+    note_ids: list = field(default_factory=list)
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.uid}"}
+
+
+@dataclass
+class Recorder:
+    """エンドポイントごとの所要時間とステータスコード"""
+
+    latencies: dict = field(default_factory=dict)
+    statuses: dict = field(default_factory=dict)
+    errors: dict = field(default_factory=dict)
+    # この時刻（perf_counter）以降に送ったリクエストだけを記録する（ウォームアップを除く）
+    record_from: float = float("inf")
+
+    def record(self, name: str, started: float, status: int, ok: bool) -> None:
+        if started < self.record_from:
+            return
+        seconds = time.perf_counter() - started
+        self.latencies.setdefault(name, []).append(seconds)
+        codes = self.statuses.setdefault(name, {})
+        codes[str(status)] = codes.get(str(status), 0) + 1
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+
+class Session:
+    """計測しながらリクエストを送る"""
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder):
+        self.client = client
+        self.recorder = recorder
+
+    async def request(
+        self,
+        name: str,
+        method: str,
+        url: str,
+        vu: VirtualUser,
+        expected=(200, 201),
+        **kwargs,
+    ) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(
+                method, url, headers=vu.headers, **kwargs
+            )
+        except httpx.HTTPError:
+            self.recorder.record(name, started, 0, False)
+            return None
+        self.recorder.record(
+            name, started, response.status_code, response.status_code in expected
+        )
+        return response
+
+
+async def get_user(session: Session, vu: VirtualUser, _: random.Random) -> None:
+    await session.request("GET /api/users/me", "GET", "/api/users/me", vu)
+
+
+async def create_existing_user(
+    session: Session, vu: VirtualUser, _: random.Random
+) -> None:
+    # 登録済みのUIDで送るので 409 が正常（docs/performance_requirements.md の ab と同じ）
+    await session.request(
+        "POST /api/users",
+        "POST",
+        "/api/users/",
+        vu,
+        expected=(409,),
+        json={
+            "firebase_uid": vu.uid,
+            "email": f"{vu.uid}@example.com",
+            "current_plan": "free",
+            "is_verified": True,
+        },
+    )
+
+
+async def get_care_setting(session: Session, vu: VirtualUser, _: random.Random) -> None:
+    await session.request(
+        "GET /api/care_settings/me", "GET", "/api/care_settings/me", vu
+    )
+
+
+async def verify_pin(session: Session, vu: VirtualUser, rng: random.Random) -> None:
+    await session.request(
+        "POST /api/care_settings/verify_pin",
+        "POST",
+        "/api/care_settings/verify_pin",
+        vu,
+        json={"input_password": PIN if rng.random() < 0.8 else "0000"},
+    )
+
+
+async def get_today(session: Session, vu: VirtualUser, _: random.Random) -> None:
+    response = await session.request(
+        "GET /api/care_logs/today",
+        "GET",
+        "/api/care_logs/today",
+        vu,
+        params={
+            "care_setting_id": vu.care_setting_id,
+            "date": date.today().isoformat(),
+        },
+    )
+    if response is not None and response.status_code == 200:
+        vu.today_log_id = response.json()["care_log_id"]
+
+
+async def get_by_date(session: Session, vu: VirtualUser, rng: random.Random) -> None:
+    day = date.today() - timedelta(days=rng.randint(1, 30))
+    await session.request(
+        "GET /api/care_logs/by_date",
+        "GET",
+        "/api/care_logs/by_date",
+        vu,
+        params={"care_setting_id": vu.care_setting_id, "date": day.isoformat()},
+    )
+
+
+async def get_care_log_list(
+    session: Session, vu: VirtualUser, _: random.Random
+) -> None:
+    await session.request(
+        "GET /api/care_logs/list",
+        "GET",
+        "/api/care_logs/list",
+        vu,
+        params={"care_setting_id": vu.care_setting_id},
+    )
+
+
+async def write_today(session: Session, vu: VirtualUser, rng: random.Random) -> None:
+    """今日の記録がなければ作り、あればごはん・散歩の結果を更新する"""
+    if vu.today_log_id is None:
+        response = await session.request(
+            "POST /api/care_logs",
+            "POST",
+            "/api/care_logs",
+            vu,
+            json={"date": date.today().isoformat(), "fed_morning": True},
+        )
+        if response is not None and response.status_code == 201:
+            vu.today_log_id = response.json()["id"]
+        return
+    await session.request(
+        "PATCH /api/care_logs/{care_log_id}",
+        "PATCH",
+        f"/api/care_logs/{vu.today_log_id}",
+        vu,
+        json={"fed_night": True, "walk_result": rng.random() < 0.7},
+    )
+
+
+async def get_notes(session: Session, vu: VirtualUser, _: random.Random) -> None:
+    response = await session.request(
+        "GET /api/reflection_notes", "GET", "/api/reflection_notes", vu
+    )
+    if response is not None and response.status_code == 200:
+        vu.note_ids = [note["id"] for note in response.json()]
+
+
+async def write_note(session: Session, vu: VirtualUser, rng: random.Random) -> None:
+    if vu.note_ids and rng.random() < 0.5:
+        await session.request(
+            "PATCH /api/reflection_notes/{note_id}",
+            "PATCH",
+            f"/api/reflection_notes/{rng.choice(vu.note_ids)}",
+            vu,
+            json={"approved_by_parent": True},
+        )
+        return
+    await session.request(
+        "POST /api/reflection_notes",
+        "POST",
+        "/api/reflection_notes",
+        vu,
+        json={"content": "きょうはごはんをわすれてしまいました"},
+    )
+
+
+async def generate_message(session: Session, vu: VirtualUser, _: random.Random) -> None:
+    await session.request(
+        "POST /api/message_logs/generate", "POST", "/api/message_logs/generate", vu
+    )
+
+
+async def stream_message(session: Session, vu: VirtualUser, _: random.Random) -> None:
+    # 無料プランは固定メッセージを1イベントで返して閉じる（本文を読み切るまでを計測する）
+    await session.request(
+        "GET /api/message_logs/stream", "GET", "/api/message_logs/stream", vu
+    )
+
+
+async def receive_webhook(session: Session, vu: VirtualUser, _: random.Random) -> None:
+    # 署名は検証していないので、処理対象外のイベント種別で保存までを通す
+    await session.request(
+        "POST /api/webhook_events",
+        "POST",
+        "/api/webhook_events/",
+        vu,
+        content=json.dumps(
+            {
+                "id": f"evt_loadtest_{uuid.uuid4().hex}",
+                "type": "loadtest.ping",
+                "data": {"object": {}},
+            }
+        ),
+    )
+
+
+async def create_checkout(session: Session, vu: VirtualUser, _: random.Random) -> None:
+    await session.request(
+        "POST /api/payments/create-checkout-session",
+        "POST",
+        "/api/payments/create-checkout-session",
+        vu,
+    )
+
+
+def admin_report(admin_uid: str) -> Callable:
+    """管理者のUIDでレポートを取得するシナリオ"""
+    admin = VirtualUser(uid=admin_uid)
+
+    async def get_report(session: Session, _vu: VirtualUser, __: random.Random):
+        await session.request(
+            "GET /api/reports/payments/daily",
+            "GET",
+            "/api/reports/payments/daily",
+            admin,
+        )
+
+    return get_report
+
+
+Scenario = Callable[[Session, VirtualUser, random.Random], Awaitable[None]]
+
+# (シナリオ, 重み)。アプリを開いたときの読み込みが多く、書き込みは少ない
+SCENARIOS: list = [
+    (get_user, 8),
+    (get_care_setting, 10),
+    (get_today, 20),
+    (get_by_date, 8),
+    (get_care_log_list, 10),
+    (write_today, 6),
+    (get_notes, 6),
+    (write_note, 2),
+    (verify_pin, 3),
+    (generate_message, 10),
+    (stream_message, 3),
+    (create_existing_user, 1),
+    (receive_webhook, 1),
+]
+
+
+def percentile(values: list, ratio: float) -> float:
+    """昇順に並べた values の ratio 分位（最近傍順位法）"""
+    if not values:
+        return 0.0
+    rank = max(int(round(ratio * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def summarize(latencies: list, errors: int, duration: float) -> dict:
+    """所要時間のリストを p50/p95/p99（ミリ秒）と RPS にまとめる"""
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "requests": count,
+        "errors": errors,
+        "rps": round(count / duration, 2) if duration else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "mean_ms": round(sum(ordered) / count * 1000, 2) if count else 0.0,
+        "max_ms": round(ordered[-1] * 1000, 2) if count else 0.0,
+    }
+
+
+def build_results(recorder: Recorder, duration: float, meta: dict) -> dict:
+    """計測結果をコミット間で比べられる JSON にする"""
+    endpoints = {}
+    for name in sorted(recorder.latencies):
+        endpoints[name] = {
+            **summarize(
+                recorder.latencies[name], recorder.errors.get(name, 0), duration
+            ),
+            "status_codes": recorder.statuses[name],
+        }
+    everything = [value for values in recorder.latencies.values() for value in values]
+    return {
+        "meta": meta,
+        "total": summarize(everything, sum(recorder.errors.values()), duration),
+        "endpoints": endpoints,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def prepare(session: Session, vu: VirtualUser) -> bool:
+    """お世話設定のIDを取得する（計測には含めない）"""
+    response = await session.request("setup", "GET", "/api/care_settings/me", vu)
+    if response is None or response.status_code != 200:
+        return False
+    vu.care_setting_id = response.json()["id"]
+    return True
+
+
+async def run(args) -> dict:
+    """並列数 concurrency でシナリオを duration 秒間送り続ける"""
+    scenarios = list(SCENARIOS)
+    if args.include_stripe:
+        scenarios.append((create_checkout, 1))
+    if args.admin_uid:
+        scenarios.append((admin_report(args.admin_uid), 1))
+    functions = [scenario for scenario, _ in scenarios]
+    weights = [weight for _, weight in scenarios]
+
+    recorder = Recorder()
+    limits = httpx.Limits(
+        max_connections=args.concurrency, max_keepalive_connections=args.concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=args.timeout
+    ) as client:
+        session = Session(client, recorder)
+        users = [VirtualUser(uid=load_test_uid(index)) for index in range(args.users)]
+        ready = await asyncio.gather(*(prepare(session, vu) for vu in users))
+        users = [vu for vu, ok in zip(users, ready) if ok]
+        if not users:
+            raise SystemExit(
+                "負荷試験用のユーザーが見つかりません" "（LOAD_TEST_MODE=true でサーバーを起動し、seed を実行してください）"
+            )
+
+        recorder.record_from = time.perf_counter() + args.warmup
+        deadline = recorder.record_from + args.duration
+
+        async def worker(worker_id: int) -> None:
+            rng = random.Random(args.seed + worker_id)
+            while time.perf_counter() < deadline:
+                scenario = rng.choices(functions, weights)[0]
+                await scenario(session, rng.choice(users), rng)
+
+        await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+
+    meta = {
+        "git_commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "duration_seconds": args.duration,
+        "warmup_seconds": args.warmup,
+        "users": len(users),
+        "seed": args.seed,
+    }
+    return build_results(recorder, args.duration, meta)
+
+
+# ---------------------------------------------------------------------------
+# 結果の比較
+# ---------------------------------------------------------------------------
+
+
+def compare(before: dict, after: dict, max_regression: float) -> list:
+    """
+    エンドポイントごとに p95 と RPS を比べて表示し、悪化したエンドポイントを返す
+
+    Args:
+        before (dict): 基準の結果
+        after (dict): 比べる結果
+        max_regression (float): 許容する p95 の悪化率（0.2 なら 20% まで）
+
+    Returns:
+        list: p95 が許容範囲を超えて悪化したエンドポイント名
+    """
+    regressions = []
+    print(
+        f"{'endpoint':<44} {'p95 before':>11} {'p95 after':>10} {'change':>8}"
+        f" {'rps before':>11} {'rps after':>10}"
+    )
+    for name in sorted(set(before["endpoints"]) | set(after["endpoints"])):
+        old = before["endpoints"].get(name)
+        new = after["endpoints"].get(name)
+        if old is None or new is None:
+            print(f"{name:<44} {'(片方のみ)':>11}")
+            continue
+        change = (
+            (new["p95_ms"] - old["p95_ms"]) / old["p95_ms"] if old["p95_ms"] else 0.0
+        )
+        mark = ""
+        if change > max_regression:
+            regressions.append(name)
+            mark = " !"
+        print(
+            f"{name:<44} {old['p95_ms']:>9.1f}ms {new['p95_ms']:>8.1f}ms"
+            f" {change:>+7.0%} {old['rps']:>11.1f} {new['rps']:>10.1f}{mark}"
+        )
+    return regressions
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="認証付きAPIの負荷試験")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="負荷試験用のデータを投入する")
+    seed_parser.add_argument("--users", type=int, default=200)
+    seed_parser.add_argument("--seed", type=int, default=42)
+
+    run_parser = commands.add_parser("run", help="負荷をかけて結果をJSONに書き出す")
+    run_parser.add_argument("--base-url", default="http://localhost:8000")
+    run_parser.add_argument("--users", type=int, default=200)
+    run_parser.add_argument("--concurrency", type=int, default=20)
+    run_parser.add_argument("--duration", type=float, default=60.0)
+    run_parser.add_argument("--warmup", type=float, default=5.0)
+    run_parser.add_argument("--timeout", type=float, default=30.0)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument(
+        "--admin-uid", help="ADMIN_FIREBASE_UIDS に登録した loadtest- のUID"
+    )
+    run_parser.add_argument("--include-stripe", action="store_true")
+    run_parser.add_argument("--output", help="結果のJSONの出力先（省略時は標準出力）")
+
+    compare_parser = commands.add_parser("compare", help="2つの結果を比べる")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.add_argument("--max-regression", type=float, default=0.2)
+
+    args = parser.parse_args(argv)
+    if args.command == "seed":
+        asyncio.run(seed(args.users, args.seed))
+    elif args.command == "run":
+        results = asyncio.run(run(args))
+        text = json.dumps(results, ensure_ascii=False, indent=2)
+        if args.output:
+            os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+            total = results["total"]
+            print(
+                f"requests={total['requests']} errors={total['errors']}"
+                f" rps={total['rps']} p50={total['p50_ms']}ms"
+                f" p95={total['p95_ms']}ms p99={total['p99_ms']}ms -> {args.output}"
+            )
+        else:
+            print(text)
+    else:
+        with open(args.before, encoding="utf-8") as f:
+            before = json.load(f)
+        with open(args.after, encoding="utf-8") as f:
+            after = json.load(f)
+        regressions = compare(before, after, args.max_regression)
+        if regressions:
+            raise SystemExit(
+                f"p95 が {args.max_regression:.0%} を超えて悪化: {', '.join(regressions)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
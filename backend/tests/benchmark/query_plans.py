@@ -0,0 +1,697 @@
+"""query_plans.py: Prismaの呼び出し箇所ごとに、生成されたSQLと実行計画を記録する
+
+ルーター・サービスの関数を大量データ（prisma/generate_data.py で投入）のDBに対して実際に呼び出し、
+Prismaのクエリエンジンが出力したSQL（log_queries）を拾って、1文ずつ
+EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) を取る。結果は呼び出し箇所ごとのJSON（スナップショット）にする。
+
+- 呼び出し箇所ごとに1つのトランザクションで実行し、最後にロールバックする（書き込みも残らない）。
+  関数の中の prisma_client.tx() は同じトランザクションにまとめる
+- EXPLAIN ANALYZE は SAVEPOINT の中で実行して戻すので、INSERT / UPDATE も計測できる
+- パラメーターはリテラルに置き換えて EXPLAIN する（最初の数回の実行で使われるカスタムプランに相当）
+- check は、Seq Scan（一定行数以上を読んだもの）と、スナップショットからのコストの悪化・SQLの変化を報告する
+
+使い方（backendディレクトリで実行）:
+    PYTHONPATH=. python prisma/generate_data.py --users 10000 --years 3 --seed 42
+    PYTHONPATH=. python tests/benchmark/query_plans.py capture --out tests/benchmark/plan_snapshots
+    PYTHONPATH=. python tests/benchmark/query_plans.py check --baseline tests/benchmark/plan_snapshots
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import re
+import sys
+import tempfile
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Optional
+
+SNAPSHOT_DIR = Path(__file__).resolve().parent / "plan_snapshots"
+# これより少ない行しか読んでいない Seq Scan は問題にしない（小さなテーブル・パーティション）
+MIN_SEQ_SCAN_ROWS = 1000
+# スナップショットからのコスト（Total Cost）の増加をどこまで許すか
+MAX_COST_INCREASE = 0.2
+CAPTURE_UID = "plan-capture-new"
+
+_STATEMENT_RE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+_PLACEHOLDER_RE = re.compile(r"\$(\d+)\b")
+
+
+# ---------------------------------------------------------------------------
+# クエリエンジンのログとSQL
+# ---------------------------------------------------------------------------
+
+
+def parse_engine_log(lines: list) -> list:
+    """
+    クエリエンジンのJSONログ（LOG_QUERIES）から、実行されたSQLとパラメーターを取り出す
+
+    Returns:
+        list: {"sql": str, "params": list | None} のリスト（パラメーターを読めなければ None）
+    """
+    statements = []
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        fields = record.get("fields") or {}
+        sql = fields.get("query")
+        if sql is None and str(record.get("target", "")).startswith("quaint"):
+            sql = fields.get("message")
+        if not isinstance(sql, str) or not _STATEMENT_RE.match(sql):
+            continue
+        try:
+            params = json.loads(fields.get("params") or "[]")
+        except ValueError:
+            params = None
+        statements.append({"sql": sql, "params": params})
+    return statements
+
+
+def sql_literal(value) -> str:
+    """パラメーターをSQLのリテラルにする（文字列は型を決めずに渡し、列の型に合わせさせる）"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return "ARRAY[" + ", ".join(sql_literal(item) for item in value) + "]"
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False)
+    return "'" + value.replace("'", "''") + "'"
+
+
+def inline_params(sql: str, params: list) -> str:
+    """$1, $2, … をパラメーターのリテラルに置き換える"""
+
+    def replace(match):
+        index = int(match.group(1)) - 1
+        if index >= len(params):
+            raise ValueError(f"パラメーター ${index + 1} がありません")
+        return sql_literal(params[index])
+
+    return _PLACEHOLDER_RE.sub(replace, sql)
+
+
+# ---------------------------------------------------------------------------
+# 実行計画
+# ---------------------------------------------------------------------------
+
+
+def _walk(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def find_seq_scans(plan: dict) -> list:
+    """
+    実行計画の中の Seq Scan を、読んだ行数（返した行 + フィルターで捨てた行、ループ分を含む）と一緒に返す
+
+    Args:
+        plan (dict): EXPLAIN (FORMAT JSON) の1要素（"Plan" を持つdict）
+    """
+    scans = []
+    for node in _walk(plan["Plan"]):
+        if node.get("Node Type") != "Seq Scan":
+            continue
+        rows = node.get("Actual Rows", node.get("Plan Rows", 0)) + node.get(
+            "Rows Removed by Filter", 0
+        )
+        scans.append(
+            {
+                "relation": node.get("Relation Name"),
+                "rows": int(rows * node.get("Actual Loops", 1)),
+            }
+        )
+    return scans
+
+
+def summarize_plan(plan: dict) -> dict:
+    """スナップショットに残す実行計画の要約（コスト・時間・バッファ・Seq Scan）"""
+    root = plan["Plan"]
+    return {
+        "total_cost": root.get("Total Cost"),
+        "execution_ms": plan.get("Execution Time"),
+        "planning_ms": plan.get("Planning Time"),
+        "shared_hit_blocks": root.get("Shared Hit Blocks"),
+        "shared_read_blocks": root.get("Shared Read Blocks"),
+        "seq_scans": find_seq_scans(plan),
+    }
+
+
+def check_plans(
+    baseline: dict,
+    current: dict,
+    *,
+    max_cost_increase: float = MAX_COST_INCREASE,
+    min_seq_scan_rows: int = MIN_SEQ_SCAN_ROWS,
+) -> list:
+    """
+    取得した実行計画を確認し、問題を文字列のリストで返す（空なら問題なし）
+
+    - min_seq_scan_rows 行以上を読んだ Seq Scan
+    - 取得できなかったSQL・実行計画
+    - スナップショットからSQLが変わったもの（意図した変更なら capture で更新する）
+    - スナップショットより Total Cost が max_cost_increase を超えて増えたもの
+
+    Args:
+        baseline (dict): 呼び出し箇所の名前 → スナップショット（無ければ比較しない）
+        current (dict): 呼び出し箇所の名前 → 今回の結果
+    """
+    problems = []
+    for name, snapshot in sorted(current.items()):
+        if snapshot.get("error"):
+            problems.append(f"{name}: 実行に失敗しました: {snapshot['error']}")
+        statements = snapshot.get("statements", [])
+        for index, statement in enumerate(statements):
+            label = f"{name}[{index}]"
+            if statement.get("error"):
+                problems.append(f"{label}: 実行計画を取得できません: {statement['error']}")
+                continue
+            for scan in statement["seq_scans"]:
+                if scan["rows"] >= min_seq_scan_rows:
+                    problems.append(
+                        f"{label}: Seq Scan on {scan['relation']} ({scan['rows']} 行)"
+                    )
+
+        before = baseline.get(name)
+        if before is None:
+            continue
+        before_statements = before.get("statements", [])
+        if [s["sql"] for s in before_statements] != [s["sql"] for s in statements]:
+            problems.append(f"{name}: 生成されたSQLがスナップショットと違います")
+            continue
+        for index, (old, new) in enumerate(zip(before_statements, statements)):
+            old_cost, new_cost = old.get("total_cost"), new.get("total_cost")
+            if old_cost is None or new_cost is None:
+                continue
+            if new_cost > old_cost * (1 + max_cost_increase):
+                problems.append(
+                    f"{name}[{index}]: コストが {old_cost:.2f} → {new_cost:.2f} に増えました"
+                )
+    return problems
+
+
+def load_snapshots(directory: Path) -> dict:
+    """ディレクトリの *.json を読み込む（無ければ空）"""
+    if not directory.is_dir():
+        return {}
+    return {
+        path.stem: json.loads(path.read_text(encoding="utf-8"))
+        for path in sorted(directory.glob("*.json"))
+    }
+
+
+def write_snapshots(directory: Path, snapshots: dict) -> None:
+    """呼び出し箇所ごとに1ファイルで書き出す（差分を見やすくするためキーを並べる）"""
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, snapshot in snapshots.items():
+        (directory / f"{name}.json").write_text(
+            json.dumps(snapshot, ensure_ascii=False, indent=2, sort_keys=True) + "\n",
+            encoding="utf-8",
+        )
+
+
+# ---------------------------------------------------------------------------
+# 呼び出し箇所
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class CaptureContext:
+    """呼び出しに使う既存データ（投入済みのDBから選ぶ）"""
+
+    user_id: str
+    firebase_uid: str
+    care_setting_id: int
+    care_password: str
+    care_log_id: int
+    care_log_date: str
+    reflection_note_id: Optional[int]
+
+
+@dataclass
+class CallSite:
+    """計測する呼び出し箇所"""
+
+    name: str
+    location: str
+    run: Callable[[CaptureContext], Awaitable[object]]
+
+
+def _checkout_body(ctx: CaptureContext, event_id: str) -> bytes:
+    now = datetime.now(timezone.utc)
+    return json.dumps(
+        {
+            "id": event_id,
+            "type": "checkout.session.completed",
+            "created": int(now.timestamp()),
+            "data": {
+                "object": {
+                    "id": f"cs_{event_id}",
+                    "amount_total": 500,
+                    "currency": "jpy",
+                    "payment_status": "paid",
+                    "payment_intent": f"pi_{event_id}",
+                    "metadata": {"firebase_uid": ctx.firebase_uid},
+                }
+            },
+        }
+    ).encode()
+
+
+def build_call_sites() -> list:
+    """ルーター・サービスの Prisma 呼び出しを、実際の関数経由で1つずつ実行する"""
+    # pylint: disable=import-outside-toplevel
+    from starlette.requests import Request
+
+    from app.routers import care_logs, care_settings, reflection_notes, user
+    from app.routers import webhook_events
+    from app.schemas.care_logs import CareLogCreateRequest, CareLogUpdateRequest
+    from app.schemas.care_settings import CareSettingCreateRequest, VerifyPinRequest
+    from app.schemas.reflection_notes import (
+        ReflectionNoteCreate,
+        ReflectionNoteUpdateRequest,
+    )
+    from app.schemas.user import UserCreateRequest
+    from app.services import webhook_replay, webhook_service
+    from app.services.entitlements import EntitlementService
+
+    async def update_reflection_note(ctx):
+        note_id = ctx.reflection_note_id
+        if note_id is None:
+            note = await reflection_notes.create_reflection_note(
+                ReflectionNoteCreate(content="計測用"), firebase_uid=ctx.firebase_uid
+            )
+            note_id = note.id
+        return await reflection_notes.update_reflection_note(
+            note_id,
+            ReflectionNoteUpdateRequest(approved_by_parent=True),
+            firebase_uid=ctx.firebase_uid,
+        )
+
+    async def stripe_webhook(ctx):
+        body = _checkout_body(ctx, "evt_plan_capture_receive")
+
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        request = Request({"type": "http", "method": "POST", "headers": []}, receive)
+        return await webhook_events.stripe_webhook(request)
+
+    async def process_webhook_event(ctx):
+        row = webhook_service.build_webhook_event_row(
+            _checkout_body(ctx, "evt_plan_capture_process")
+        )
+        return await webhook_service.process_webhook_event(SimpleNamespace(**row))
+
+    def handler(func):
+        # @cache を外した本体（キャッシュミス時のクエリ）
+        return getattr(func, "__wrapped__", func)
+
+    return [
+        CallSite(
+            "users_create",
+            "app/routers/user.py:create_users",
+            lambda ctx: user.create_users(
+                UserCreateRequest(
+                    firebase_uid=CAPTURE_UID,
+                    email=f"{CAPTURE_UID}@example.com",
+                    current_plan="free",
+                    is_verified=True,
+                )
+            ),
+        ),
+        CallSite(
+            "users_me",
+            "app/routers/user.py:get_my_user",
+            lambda ctx: user.get_my_user(firebase_uid=ctx.firebase_uid),
+        ),
+        CallSite(
+            "care_settings_create",
+            "app/routers/care_settings.py:create_care_setting",
+            lambda ctx: care_settings.create_care_setting(
+                CareSettingCreateRequest(
+                    parent_name="計測",
+                    child_name="計測",
+                    dog_name="計測",
+                    care_start_date=date.today(),
+                    care_end_date=date.today() + timedelta(days=30),
+                    morning_meal_time=time(7, 0),
+                    night_meal_time=time(18, 0),
+                    walk_time=time(16, 0),
+                    care_password="0000",
+                ),
+                firebase_uid=ctx.firebase_uid,
+            ),
+        ),
+        CallSite(
+            "care_settings_me",
+            "app/routers/care_settings.py:get_my_care_setting",
+            lambda ctx: handler(care_settings.get_my_care_setting)(
+                firebase_uid=ctx.firebase_uid
+            ),
+        ),
+        CallSite(
+            "care_settings_verify_pin",
+            "app/routers/care_settings.py:verify_care_setting_pin",
+            lambda ctx: care_settings.verify_care_setting_pin(
+                VerifyPinRequest(input_password=ctx.care_password),
+                firebase_uid=ctx.firebase_uid,
+            ),
+        ),
+        CallSite(
+            "care_logs_update",
+            "app/routers/care_logs.py:update_care_log",
+            lambda ctx: care_logs.update_care_log(
+                ctx.care_log_id,
+                CareLogUpdateRequest(walk_result=True),
+                firebase_uid=ctx.firebase_uid,
+            ),
+        ),
+        CallSite(
+            "care_logs_create",
+            "app/routers/care_logs.py:create_care_log",
+            lambda ctx: care_logs.create_care_log(
+                CareLogCreateRequest(date="2099-12-31", fed_morning=True),
+                firebase_uid=ctx.firebase_uid,
+            ),
+        ),
+        CallSite(
+            "care_logs_today",
+            "app/routers/care_logs.py:get_today_care_log",
+            lambda ctx: care_logs.get_today_care_log(
+                care_setting_id=ctx.care_setting_id,
+                date=ctx.care_log_date,
+                firebase_uid=ctx.firebase_uid,
+            ),
+        ),
+        CallSite(
+            "care_logs_by_date",
+            "app/routers/care_logs.py:get_care_log_by_date",
+            lambda ctx: handler(care_logs.get_care_log_by_date)(
+                care_setting_id=ctx.care_setting_id,
+                date=ctx.care_log_date,
+                firebase_uid=ctx.firebase_uid,
+            ),
+        ),
+        CallSite(
+            "care_logs_list",
+            "app/routers/care_logs.py:get_care_logs_list",
+            lambda ctx: handler(care_logs.get_care_logs_list)(
+                care_setting_id=ctx.care_setting_id, firebase_uid=ctx.firebase_uid
+            ),
+        ),
+        CallSite(
+            "reflection_notes_create",
+            "app/routers/reflection_notes.py:create_reflection_note",
+            lambda ctx: reflection_notes.create_reflection_note(
+                ReflectionNoteCreate(content="計測用"), firebase_uid=ctx.firebase_uid
+            ),
+        ),
+        CallSite(
+            "reflection_notes_list",
+            "app/routers/reflection_notes.py:get_reflection_notes",
+            lambda ctx: reflection_notes.get_reflection_notes(
+                firebase_uid=ctx.firebase_uid
+            ),
+        ),
+        CallSite(
+            "reflection_notes_update",
+            "app/routers/reflection_notes.py:update_reflection_note",
+            update_reflection_note,
+        ),
+        CallSite(
+            "entitlements_get",
+            "app/services/entitlements.py:EntitlementService.get",
+            lambda ctx: EntitlementService(redis_client=None).get(ctx.firebase_uid),
+        ),
+        CallSite(
+            "webhook_events_receive",
+            "app/routers/webhook_events.py:stripe_webhook",
+            stripe_webhook,
+        ),
+        CallSite(
+            "webhook_event_process",
+            "app/services/webhook_service.py:process_webhook_event",
+            process_webhook_event,
+        ),
+        CallSite(
+            "webhook_events_process_pending",
+            "app/services/webhook_service.py:process_pending_webhook_events",
+            lambda ctx: webhook_service.process_pending_webhook_events(
+                chunk_size=100, concurrency=1
+            ),
+        ),
+        CallSite(
+            "webhook_events_replay",
+            "app/services/webhook_replay.py:replay_webhook_events",
+            lambda ctx: webhook_replay.replay_webhook_events(
+                datetime.now(timezone.utc) - timedelta(days=30),
+                datetime.now(timezone.utc),
+                batch_size=100,
+                concurrency=1,
+                dry_run=True,
+            ),
+        ),
+    ]
+
+
+# ---------------------------------------------------------------------------
+# 取得
+# ---------------------------------------------------------------------------
+
+
+class EngineLog:
+    """クエリエンジンの標準出力（ファイル）を、前回読んだ位置から読む"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.offset = 0
+
+    def read_new(self) -> list:
+        """前回から増えた行"""
+        with open(self.path, "rb") as log_file:
+            log_file.seek(self.offset)
+            data = log_file.read()
+        # 書きかけの行は次に読む
+        complete = data[: data.rfind(b"\n") + 1]
+        self.offset += len(complete)
+        return complete.decode("utf-8", errors="replace").splitlines()
+
+    def skip(self) -> None:
+        """ここまでの行（自分で実行した EXPLAIN など）を読み飛ばす"""
+        self.offset = self.path.stat().st_size
+
+
+class _SingleTransaction:
+    """呼び出し箇所の中の prisma_client.tx() を、外側のトランザクションにまとめる"""
+
+    def __init__(self, transaction):
+        self._transaction = transaction
+
+    def tx(self, *args, **kwargs):  # pylint: disable=unused-argument
+        return contextlib.nullcontext(self._transaction)
+
+    def __getattr__(self, name):
+        return getattr(self._transaction, name)
+
+
+@contextlib.contextmanager
+def _use_client(client):
+    """app 以下のモジュールが import した prisma_client を差し替える"""
+    from app import db  # pylint: disable=import-outside-toplevel
+
+    original = db.prisma_client
+    patched = []
+    for module in list(sys.modules.values()):
+        if getattr(module, "__name__", "").startswith("app.") and (
+            getattr(module, "prisma_client", None) is original
+        ):
+            patched.append(module)
+            module.prisma_client = client
+    try:
+        yield
+    finally:
+        for module in patched:
+            module.prisma_client = original
+
+
+class _Rollback(Exception):
+    """呼び出し箇所のトランザクションを戻すための例外"""
+
+
+async def _explain(transaction, statement: dict) -> dict:
+    result = {"sql": statement["sql"], "params": statement["params"]}
+    if statement["params"] is None:
+        result["error"] = "パラメーターを読み取れませんでした"
+        return result
+    await transaction.execute_raw("SAVEPOINT plan_capture_explain")
+    try:
+        rows = await transaction.query_raw(
+            "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "
+            + inline_params(statement["sql"], statement["params"])
+        )
+        plan = rows[0]["QUERY PLAN"]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        plan = plan[0]
+        result.update(summarize_plan(plan))
+        result["plan"] = plan
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        # ANALYZE で実行した書き込みも戻す
+        await transaction.execute_raw("ROLLBACK TO SAVEPOINT plan_capture_explain")
+    return result
+
+
+async def select_context(client) -> CaptureContext:
+    """記録が最も新しいお世話設定のユーザーを、呼び出しに使う"""
+    rows = await client.query_raw(
+        """
+        SELECT u.id AS user_id, u.firebase_uid, cs.id AS care_setting_id,
+               cs.care_password, cl.id AS care_log_id, cl.date AS care_log_date,
+               (SELECT rn.id FROM reflection_notes rn
+                 WHERE rn.care_setting_id = cs.id
+                 ORDER BY rn.id DESC LIMIT 1) AS reflection_note_id
+          FROM care_logs cl
+          JOIN care_settings cs ON cs.id = cl.care_setting_id
+          JOIN users u ON u.id = cs.user_id
+         ORDER BY cl.id DESC
+         LIMIT 1
+        """
+    )
+    if not rows:
+        raise RuntimeError("お世話記録がありません。prisma/generate_data.py でデータを投入してください")
+    return CaptureContext(**rows[0])
+
+
+async def capture(database_url: Optional[str] = None, names=None) -> dict:
+    """
+    呼び出し箇所ごとにSQLと実行計画を取得する
+
+    Args:
+        database_url (str | None): 接続先（省略時は DATABASE_URL）
+        names (Iterable[str] | None): 取得する呼び出し箇所の名前（省略時はすべて）
+
+    Returns:
+        dict: 呼び出し箇所の名前 → スナップショット
+    """
+    from app.db import TracedPrisma  # pylint: disable=import-outside-toplevel
+
+    kwargs = {"datasource": {"url": database_url}} if database_url else {}
+    client = TracedPrisma(log_queries=True, **kwargs)
+    with tempfile.TemporaryDirectory() as tmp:
+        log = EngineLog(Path(tmp) / "engine.log")
+        # クエリエンジンは起動時の sys.stdout にログを書くので、接続の間だけファイルにする
+        with open(log.path, "wb") as engine_stdout:
+            stdout, sys.stdout = sys.stdout, engine_stdout
+            try:
+                await client.connect()
+            finally:
+                sys.stdout = stdout
+        try:
+            ctx = await select_context(client)
+            snapshots = {}
+            for site in build_call_sites():
+                if names and site.name not in names:
+                    continue
+                snapshots[site.name] = await _capture_site(client, log, site, ctx)
+            return snapshots
+        finally:
+            await client.disconnect()
+
+
+async def _capture_site(client, log: EngineLog, site: CallSite, ctx) -> dict:
+    snapshot = {"call_site": site.name, "location": site.location, "error": None}
+    try:
+        async with client.tx(timeout=timedelta(minutes=5)) as transaction:
+            log.skip()
+            await transaction.execute_raw("SAVEPOINT plan_capture_site")
+            try:
+                with _use_client(_SingleTransaction(transaction)):
+                    await site.run(ctx)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                snapshot["error"] = f"{type(e).__name__}: {getattr(e, 'detail', e)}"
+                await transaction.execute_raw("ROLLBACK TO SAVEPOINT plan_capture_site")
+            statements = parse_engine_log(log.read_new())
+            snapshot["statements"] = [
+                await _explain(transaction, statement) for statement in statements
+            ]
+            raise _Rollback
+    except _Rollback:
+        pass
+    return snapshot
+
+
+def _strip_plans(snapshots: dict) -> dict:
+    """表示用に、実行計画の全体を除いた要約だけにする"""
+    return {
+        name: {
+            **snapshot,
+            "statements": [
+                {key: value for key, value in statement.items() if key != "plan"}
+                for statement in snapshot.get("statements", [])
+            ],
+        }
+        for name, snapshot in snapshots.items()
+    }
+
+
+async def _run(args) -> int:
+    snapshots = await capture(args.database_url, args.only)
+    if args.command == "capture":
+        write_snapshots(args.out, snapshots)
+        print(f"{len(snapshots)} 件のスナップショットを {args.out} に書き出しました")
+        return 0
+
+    if args.output:
+        write_snapshots(args.output, snapshots)
+    problems = check_plans(
+        load_snapshots(args.baseline),
+        snapshots,
+        max_cost_increase=args.max_cost_increase,
+        min_seq_scan_rows=args.min_seq_scan_rows,
+    )
+    if args.verbose:
+        print(json.dumps(_strip_plans(snapshots), ensure_ascii=False, indent=2))
+    for problem in problems:
+        print(problem)
+    print(f"{len(snapshots)} 件の呼び出し箇所を確認しました（問題 {len(problems)} 件）")
+    return 1 if problems else 0
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Prismaの呼び出し箇所ごとの実行計画")
+    parser.add_argument("--database-url", help="接続先（省略時は DATABASE_URL）")
+    parser.add_argument("--only", nargs="*", help="対象の呼び出し箇所の名前")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    capture_parser = commands.add_parser("capture", help="スナップショットを書き出す")
+    capture_parser.add_argument("--out", type=Path, default=SNAPSHOT_DIR)
+
+    check_parser = commands.add_parser("check", help="スナップショットと比べる")
+    check_parser.add_argument("--baseline", type=Path, default=SNAPSHOT_DIR)
+    check_parser.add_argument("--output", type=Path, help="今回の結果の書き出し先")
+    check_parser.add_argument(
+        "--max-cost-increase", type=float, default=MAX_COST_INCREASE
+    )
+    check_parser.add_argument(
+        "--min-seq-scan-rows", type=int, default=MIN_SEQ_SCAN_ROWS
+    )
+    check_parser.add_argument("--verbose", action="store_true")
+
+    args = parser.parse_args(argv)
+    sys.exit(asyncio.run(_run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""リクエストごとに必ず通るCPU処理（ホットパス）のベンチマーク
+
+DBは FakePrisma に置き換え、ハンドラー本体とFastAPIのレスポンス変換（serialize_response）、
+JSONへのエンコードを測る。TrustedJSONResponse を返すルートはレスポンスの本文までを測る。ふだんのテスト実行では --benchmark-disable により1回ずつ実行して
+結果だけを確認する。計測・ベースラインとの比較は README の「ホットパスのベンチマーク」を参照。
+
+    python -m pytest tests/benchmark/test_hot_paths.py --no-cov --benchmark-enable --benchmark-only
+"""
+
+import json
+from datetime import date, time
+
+import pytest
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+from app.responses import TrustedJSONCoder, TrustedJSONResponse
+from app.routers.care_logs import care_logs_router, get_care_logs_list
+from app.routers.care_settings import create_care_setting, get_my_care_setting
+from app.schemas.care_settings import CareSettingCreateRequest
+
+
+def response_field(router, path: str, method: str):
+    """ルートの response_model（FastAPIがレスポンスの検証に使うフィールド）"""
+    for route in router.routes:
+        if route.path == path and method in route.methods:
+            return route.response_field
+    raise LookupError(f"{method} {path} がありません")
+
+
+# ======================
+#  TC-BENCH-001
+# ======================
+# GET /api/care_settings/me: datetime → date/time の変換と CareSettingMeResponse の作成、JSON化
+@pytest.mark.benchmark(group="care_settings")
+def test_bench_get_my_care_setting(benchmark, fake_prisma, run_sync):
+    # @cache を外したハンドラー本体（キャッシュミス時の処理）
+    handler = get_my_care_setting.__wrapped__
+
+    response = benchmark(lambda: run_sync(handler(firebase_uid="bench-uid")))
+
+    body = json.loads(response.body)
+
+    assert body["care_start_date"] == "2025-01-01"
+    assert body["morning_meal_time"] == "07:30:00"
+
+
+# ======================
+#  TC-BENCH-002
+# ======================
+# POST /api/care_settings: datetime.combine で保存用に変換し、CareSettingCreateResponse を返す
+@pytest.mark.benchmark(group="care_settings")
+def test_bench_create_care_setting(benchmark, fake_prisma, run_sync):
+    request = CareSettingCreateRequest(
+        parent_name="パパ",
+        child_name="たろう",
+        dog_name="ポチ",
+        care_start_date=date(2025, 1, 1),
+        care_end_date=date(2025, 12, 31),
+        morning_meal_time=time(7, 30),
+        night_meal_time=time(18, 0),
+        walk_time=time(16, 0),
+        care_password="1234",
+    )
+
+    response = benchmark(
+        lambda: run_sync(create_care_setting(request, firebase_uid="bench-uid"))
+    )
+
+    assert response.status_code == 201
+    body = json.loads(response.body)
+    assert body["user_id"] == "user-1"
+    assert body["walk_time"] == "16:00:00"
+
+
+# ======================
+#  TC-BENCH-003
+# ======================
+# POST/PATCH /api/care_logs: Prismaのレコードから CareLogResponse を作る（from_attributes）
+@pytest.mark.benchmark(group="care_logs")
+def test_bench_care_log_response(benchmark, fake_prisma, run_sync):
+    field = response_field(care_logs_router, "/api/care_logs", "POST")
+    record = fake_prisma.care_logs.one
+
+    body = benchmark(
+        lambda: run_sync(serialize_response(field=field, response_content=record))
+    )
+
+    assert body["id"] == record.id
+    assert body["date"] == "2025-01-01"
+
+
+# ======================
+#  TC-BENCH-004
+# ======================
+# GET /api/care_logs/list: 1年分のレコードから返却用のdictを組み立て、JSONにする
+@pytest.mark.benchmark(group="care_logs")
+def test_bench_get_care_logs_list(benchmark, fake_prisma, run_sync):
+    handler = get_care_logs_list.__wrapped__
+
+    response = benchmark(
+        lambda: run_sync(handler(care_setting_id=10, firebase_uid="bench-uid"))
+    )
+
+    body = json.loads(response.body)
+
+    assert len(body["care_logs"]) == len(fake_prisma.care_logs.many)
+    assert body["care_logs"][0] == {
+        "id": 1,
+        "date": "2025-01-01",
+        "walk_result": False,
+        "care_setting_id": 10,
+    }
+
+
+# ======================
+#  TC-BENCH-005
+# ======================
+# /api/care_logs/list の1リクエスト分のCPU: jsonable_encoder → JSONResponse（変更前）と TrustedJSONResponse
+@pytest.mark.benchmark(group="care_logs_list_json")
+@pytest.mark.parametrize("path", ["jsonable_encoder", "trusted"])
+def test_bench_care_logs_list_response_json(benchmark, fake_prisma, run_sync, path):
+    handler = get_care_logs_list.__wrapped__
+    rows = json.loads(
+        run_sync(handler(care_setting_id=10, firebase_uid="bench-uid")).body
+    )["care_logs"]
+
+    def build():
+        return {
+            "care_logs": [
+                {
+                    "id": row["id"],
+                    "date": row["date"],
+                    "walk_result": row["walk_result"],
+                    "care_setting_id": row["care_setting_id"],
+                }
+                for row in rows
+            ]
+        }
+
+    def encoded():
+        content = run_sync(serialize_response(response_content=build()))
+        return JSONResponse(content).body
+
+    def trusted():
+        return TrustedJSONResponse(build()).body
+
+    body = benchmark(encoded if path == "jsonable_encoder" else trusted)
+
+    assert body.startswith(b'{"care_logs":[{"id":1,')
+    assert json.loads(body)["care_logs"] == rows
+
+
+# ======================
+#  TC-BENCH-006
+# ======================
+# /api/care_logs/list のキャッシュヒット: 保存した本文をそのままレスポンスにする（TrustedJSONCoder）
+@pytest.mark.benchmark(group="json")
+def test_bench_care_logs_list_cache_hit(benchmark, fake_prisma, run_sync):
+    response = run_sync(
+        get_care_logs_list.__wrapped__(care_setting_id=10, firebase_uid="bench-uid")
+    )
+    # RedisBackend は decode_responses=True なので str で返ってくる
+    stored = TrustedJSONCoder.encode(response).decode()
+
+    cached = benchmark(TrustedJSONCoder.decode, stored)
+
+    assert cached.body == response.body
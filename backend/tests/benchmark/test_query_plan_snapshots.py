@@ -0,0 +1,27 @@
+"""Prismaの呼び出し箇所ごとの実行計画を、投入済みの大量データのDBで確認する
+
+QUERY_PLAN_DATABASE_URL を設定したときだけ実行する（CIのテスト用DBは空で、どの計画も Seq Scan になるため）。
+plan_snapshots/ にスナップショットがあれば、コストの悪化とSQLの変化も確認する。
+
+    QUERY_PLAN_DATABASE_URL=$DATABASE_URL python -m pytest tests/benchmark/test_query_plan_snapshots.py --no-cov
+"""
+
+import os
+
+import pytest
+
+import query_plans
+
+DATABASE_URL = os.getenv("QUERY_PLAN_DATABASE_URL")
+
+
+# ======================
+#  TC-PLAN-101
+# ======================
+# 大きな Seq Scan がなく、スナップショットよりコストが増えていない
+@pytest.mark.skipif(not DATABASE_URL, reason="QUERY_PLAN_DATABASE_URL が未設定")
+async def test_query_plans_have_no_regressions():
+    current = await query_plans.capture(DATABASE_URL)
+    baseline = query_plans.load_snapshots(query_plans.SNAPSHOT_DIR)
+
+    assert query_plans.check_plans(baseline, current) == []
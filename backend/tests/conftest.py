@@ -3,6 +3,8 @@ from fastapi_cache import FastAPICache
 from fastapi_cache.backends.redis import RedisBackend
 from unittest.mock import AsyncMock, MagicMock
 
+from app.services.entitlements import entitlement_service
+
 @pytest.fixture(scope="session", autouse=True)
 def setup_cache():
     """テスト用にFastAPICacheを初期化"""
@@ -20,4 +22,12 @@ def setup_cache():
     # テスト終了後にクリーンアップ
     FastAPICache._coder = None
     FastAPICache._backend = None
-    FastAPICache._prefix = ""
\ No newline at end of file
+    FastAPICache._prefix = ""
+
+
+@pytest.fixture(autouse=True)
+def clear_entitlements():
+    """テストごとにプランのキャッシュを空にする（前のテストのプランを引き継がない）"""
+    entitlement_service.clear()
+    yield
+    entitlement_service.clear()
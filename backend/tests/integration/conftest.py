@@ -52,6 +52,7 @@ async def test_db():
         await prisma_client.care_settings.delete_many()
         await prisma_client.payment.delete_many()
         await prisma_client.webhook_events.delete_many()
+        await prisma_client.message_logs.delete_many()
         await prisma_client.users.delete_many()
     except Exception as e:
         print(f"初期化時のエラー: {e}")
@@ -65,6 +66,7 @@ async def test_db():
         await prisma_client.care_settings.delete_many()
         await prisma_client.payment.delete_many()
         await prisma_client.webhook_events.delete_many()
+        await prisma_client.message_logs.delete_many()
         await prisma_client.users.delete_many()
     except Exception:
         pass  # クリーンアップエラーは無視
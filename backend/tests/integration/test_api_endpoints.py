@@ -3,6 +3,7 @@ from httpx import AsyncClient
 from app.main import app
 from app.dependencies import verify_firebase_token
 from app.db import prisma_client
+from app.services.webhook_worker import webhook_worker
 from datetime import datetime
 import uuid
 from fastapi import HTTPException
@@ -1053,7 +1054,7 @@ class TestWebhookAPI:
             assert webhook_result["message"] == "Webhook eventを保存しました"
 
             # 3. データベース内でのWebhookイベント確認
-            saved_webhook = await test_db.webhook_events.find_unique(
+            saved_webhook = await test_db.webhook_events.find_first(
                 where={"id": "evt_test_webhook"}
             )
             assert saved_webhook is not None
@@ -1836,8 +1837,11 @@ class TestWebhookEventsDeepCoverage:
             response = await ac.post("/api/webhook_events/", json=complete_webhook_data)
             assert response.status_code == 200
 
+            # 受信時は保存のみ。反映はバックグラウンドワーカーが行うので1周分を実行する
+            await webhook_worker.run_once()
+
             # 2. データベース確認：webhook_eventsテーブル
-            saved_webhook = await test_db.webhook_events.find_unique(
+            saved_webhook = await test_db.webhook_events.find_first(
                 where={"id": complete_webhook_data["id"]}
             )
             assert saved_webhook is not None
@@ -1954,7 +1958,7 @@ class TestWebhookEventsDeepCoverage:
             assert response.status_code == 200
 
             # processされないことを確認
-            saved_webhook = await test_db.webhook_events.find_unique(
+            saved_webhook = await test_db.webhook_events.find_first(
                 where={"id": other_event_data["id"]}
             )
             assert saved_webhook is not None
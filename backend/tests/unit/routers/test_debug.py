@@ -0,0 +1,115 @@
+# pylint: disable=redefined-outer-name
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.dependencies import verify_firebase_token
+from app.profiler import Profile, recent_profiles
+
+# FastAPIアプリをTestClientに渡す
+client = TestClient(app)
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    """Firebase認証をモックし、そのUIDを管理者にする"""
+    app.dependency_overrides[verify_firebase_token] = lambda: "admin-uid"
+    monkeypatch.setattr("app.dependencies.ADMIN_FIREBASE_UIDS", {"admin-uid"})
+    recent_profiles.clear()
+
+    yield
+
+    recent_profiles.clear()
+    app.dependency_overrides.pop(verify_firebase_token, None)
+
+
+# ======================
+#  TC-DEBUG-001
+# ======================
+# GET /api/debug/profileのテストコード
+# 正常系（ワーカーをサンプリングして collapsed stacks を返す）
+def test_profile_worker_collapsed(admin):
+    response = client.get(
+        "/api/debug/profile",
+        params={"seconds": 0.1, "interval_ms": 1},
+        headers={"Authorization": "Bearer test-token"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    line = response.text.splitlines()[0]
+    stack, count = line.rsplit(" ", 1)
+    assert stack
+    assert int(count) > 0
+
+
+# ======================
+#  TC-DEBUG-002
+# ======================
+# 正常系（speedscope のファイルとしてダウンロードさせる）
+def test_profile_worker_speedscope(admin):
+    response = client.get(
+        "/api/debug/profile",
+        params={"seconds": 0.05, "interval_ms": 1, "format": "speedscope"},
+        headers={"Authorization": "Bearer test-token"},
+    )
+
+    assert response.status_code == 200
+    assert "profile.speedscope.json" in response.headers["content-disposition"]
+    assert response.json()["profiles"][0]["type"] == "sampled"
+
+
+# ======================
+#  TC-DEBUG-003
+# ======================
+# 異常系（管理者以外は403、秒数の上限を超えると422）
+def test_profile_worker_rejected(admin):
+    over_limit = client.get(
+        "/api/debug/profile",
+        params={"seconds": 120},
+        headers={"Authorization": "Bearer test-token"},
+    )
+    assert over_limit.status_code == 422
+
+    app.dependency_overrides[verify_firebase_token] = lambda: "test-uid"
+    response = client.get(
+        "/api/debug/profile",
+        params={"seconds": 0.05},
+        headers={"Authorization": "Bearer test-token"},
+    )
+    assert response.status_code == 403
+
+
+# ======================
+#  TC-DEBUG-004
+# ======================
+# GET /api/debug/profiles, /api/debug/profiles/{profile_id}のテストコード
+# 個別計測したプロファイルの一覧と取得、存在しないIDは404
+def test_get_recorded_profiles(admin):
+    profile = Profile(name="GET /api/care_logs", interval=0.001, started_at=0.0)
+    profile.stacks[(("app/main.py", "handler", 10),)] = 3
+    recent_profiles["abc"] = profile
+
+    listed = client.get(
+        "/api/debug/profiles", headers={"Authorization": "Bearer test-token"}
+    )
+    assert listed.status_code == 200
+    assert listed.json()["profiles"] == [
+        {
+            "profile_id": "abc",
+            "name": "GET /api/care_logs",
+            "samples": 3,
+            "duration": 0.0,
+        }
+    ]
+
+    found = client.get(
+        "/api/debug/profiles/abc", headers={"Authorization": "Bearer test-token"}
+    )
+    assert found.status_code == 200
+    assert found.text == "handler (main.py:10) 3\n"
+
+    missing = client.get(
+        "/api/debug/profiles/unknown", headers={"Authorization": "Bearer test-token"}
+    )
+    assert missing.status_code == 404
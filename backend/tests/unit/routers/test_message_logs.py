@@ -1,12 +1,22 @@
 # pylint: disable=redefined-outer-name
 
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, MagicMock
 from app.main import app
 from app.dependencies import verify_firebase_token
 from types import SimpleNamespace
-from app.routers.message_logs import get_openai_message
+from app.routers.message_logs import (
+    get_openai_message,
+    message_event_stream,
+    stream_openai_message,
+)
+from app.services.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
 
 # FastAPIアプリをTestClientに渡す
 client = TestClient(app)
@@ -22,8 +32,8 @@ def mock_prisma(monkeypatch):
     # user.find_unique デフォルトのモック動作（テスト内で上書き）
     mock_client.users.find_unique.return_value = None
 
-    # prisma_clientを実際のappに差し替える
-    monkeypatch.setattr("app.routers.message_logs.prisma_client", mock_client)
+    # プランはエンタイトルメントサービス経由で読むので、そちらのprisma_clientを差し替える
+    monkeypatch.setattr("app.services.entitlements.prisma_client", mock_client)
 
     # Firebase認証をモック
     app.dependency_overrides[verify_firebase_token] = lambda: "test-uid"
@@ -245,3 +255,276 @@ def test_get_openai_message_empty_response(monkeypatch):
 
     # 期待通りfallbackメッセージになることを確認
     assert result == "わん！"
+
+
+# ======================
+#  ストリーミング用のローカルスタブモデルサーバー
+# ======================
+STUB_TOKENS = ["はみがき", "たいせつ", "だわん"]
+
+
+class StubModelHandler(BaseHTTPRequestHandler):
+    """OpenAIのchat.completions（stream=True）と同じ形式でSSEを返すスタブ"""
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for token in STUB_TOKENS:
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": "gpt-4o-mini",
+                "choices": [
+                    {"index": 0, "delta": {"content": token}, "finish_reason": None}
+                ],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_model_server(monkeypatch):
+    """ローカルにスタブモデルサーバーを立ててOPENAI_BASE_URLを向ける"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubModelHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setenv("OPENAI_API_KEY", "dummy")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def parse_sse(body: str) -> list:
+    """SSEのレスポンスボディを (event, data) のリストに変換する"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        event = "message"
+        data = None
+        for line in block.split("\n"):
+            if line.startswith("event: "):
+                event = line[len("event: ") :]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: ") :])
+        events.append((event, data))
+    return events
+
+
+# ======================
+#  TC-MSG-007
+# ======================
+# GET /api/message_logs/streamのテストコード
+# 正常系（プレミアムプラン→スタブモデルのトークンを順に配信）
+def test_stream_message_premium_plan_streams_tokens(mock_prisma, stub_model_server):
+    """
+    正常系：プレミアムプランの場合、モデルのトークンを1つずつSSEで返し、最後にdoneを返す
+    """
+    mock_prisma.users.find_unique.return_value = SimpleNamespace(
+        id=1, current_plan="premium"
+    )
+
+    response = client.get(
+        "/api/message_logs/stream",
+        headers={"Authorization": "Bearer test-token"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_sse(response.text)
+    assert events[:-1] == [("message", {"token": token}) for token in STUB_TOKENS]
+    assert events[-1] == ("done", {"message": "".join(STUB_TOKENS)})
+
+
+# ======================
+#  TC-MSG-008
+# ======================
+# 正常系（無料プラン→固定メッセージを1イベントで配信）
+def test_stream_message_free_plan_sends_fixed_message(mock_prisma, monkeypatch):
+    """
+    正常系：無料プランの場合、固定メッセージを1トークンとして返す
+    """
+    mock_prisma.users.find_unique.return_value = SimpleNamespace(
+        id=1, current_plan="free"
+    )
+    monkeypatch.setattr("app.routers.message_logs.random.choice", lambda x: "わん！")
+
+    response = client.get(
+        "/api/message_logs/stream",
+        headers={"Authorization": "Bearer test-token"},
+    )
+
+    assert response.status_code == 200
+    assert parse_sse(response.text) == [
+        ("message", {"token": "わん！"}),
+        ("done", {"message": "わん！"}),
+    ]
+
+
+# ======================
+#  TC-MSG-009
+# ======================
+# 正常系（クライアント切断→生成を打ち切り、上流のジェネレーターを閉じる）
+@pytest.mark.asyncio
+async def test_message_event_stream_stops_on_disconnect():
+    """
+    正常系：クライアントが切断したら以降のトークンを送らず、トークン列を閉じる
+    """
+    closed = []
+
+    async def tokens():
+        try:
+            for token in STUB_TOKENS:
+                yield token
+        finally:
+            closed.append(True)
+
+    class DisconnectAfterFirst:
+        def __init__(self):
+            self.calls = 0
+
+        async def is_disconnected(self):
+            self.calls += 1
+            return self.calls > 1
+
+    events = [
+        event async for event in message_event_stream(DisconnectAfterFirst(), tokens())
+    ]
+
+    assert len(events) == 1
+    assert "はみがき" in events[0]
+    assert closed == [True]
+
+
+# ======================
+#  TC-MSG-010
+# ======================
+# サーキットブレーカーが開いている場合はOpenAIを呼ばずに固定メッセージを返す
+def test_get_openai_message_breaker_open_returns_fixed_message(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "dummy")
+
+    breaker = CircuitBreaker("openai-test", min_calls=1)
+    breaker.record_failure(0.1)
+    monkeypatch.setattr("app.routers.message_logs.llm_breaker", breaker)
+
+    def fail_if_called(**_kwargs):
+        raise AssertionError("ブレーカーが開いているのにOpenAIが呼ばれた")
+
+    monkeypatch.setattr("app.routers.message_logs.OpenAI", fail_if_called)
+    monkeypatch.setattr("app.routers.message_logs.random.choice", lambda x: "わん！")
+
+    assert get_openai_message() == "わん！"
+
+
+# ======================
+#  TC-MSG-011
+# ======================
+# 生成したメッセージは書き込みキューに積まれる（レスポンスはDB保存を待たない）
+def test_generate_message_enqueues_message_log(mock_prisma, monkeypatch):
+    mock_prisma.users.find_unique.return_value = SimpleNamespace(
+        id="user-1", current_plan="premium"
+    )
+    monkeypatch.setattr(
+        "app.routers.message_logs.get_openai_message", lambda: "おべんきょうするわん！"
+    )
+    enqueue_mock = MagicMock(return_value=True)
+    monkeypatch.setattr(
+        "app.routers.message_logs.message_log_queue.enqueue", enqueue_mock
+    )
+
+    response = client.post(
+        "/api/message_logs/generate",
+        headers={"Authorization": "Bearer test-token"},
+    )
+
+    assert response.status_code == 200
+    enqueue_mock.assert_called_once_with("user-1", "おべんきょうするわん！", True)
+
+
+def half_open_breaker(monkeypatch) -> CircuitBreaker:
+    """プローブを1件だけ通す half_open のブレーカーに差し替える"""
+    breaker = CircuitBreaker("openai-test", min_calls=1, open_seconds=0)
+    breaker.record_failure(0.1)
+    monkeypatch.setattr("app.routers.message_logs.llm_breaker", breaker)
+    monkeypatch.setenv("OPENAI_API_KEY", "dummy")
+    return breaker
+
+
+def fake_async_openai(monkeypatch, create):
+    """AsyncOpenAI を chat.completions.create だけのクライアントに差し替える"""
+    client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+    monkeypatch.setattr("app.routers.message_logs.AsyncOpenAI", lambda api_key: client)
+
+
+# ======================
+#  TC-MSG-012
+# ======================
+# half_open のプローブでトークンが1つも来なかった場合は失敗として記録し、再び open にする
+@pytest.mark.asyncio
+async def test_stream_without_tokens_records_probe_failure(monkeypatch):
+    breaker = half_open_breaker(monkeypatch)
+    monkeypatch.setattr("app.routers.message_logs.random.choice", lambda x: "わん！")
+
+    class EmptyStream:
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            raise StopAsyncIteration
+
+        async def close(self):
+            pass
+
+    async def create(**_kwargs):
+        return EmptyStream()
+
+    fake_async_openai(monkeypatch, create)
+    assert breaker.state == HALF_OPEN
+
+    tokens = [token async for token in stream_openai_message()]
+
+    assert tokens == ["わん！"]
+    breaker.open_seconds = 30
+    assert breaker.state == OPEN
+
+
+# ======================
+#  TC-MSG-013
+# ======================
+# 最初のトークンの前にクライアントが切断した場合は、失敗にせずプローブ枠だけを返す
+@pytest.mark.asyncio
+async def test_stream_cancelled_before_first_token_releases_probe(monkeypatch):
+    breaker = half_open_breaker(monkeypatch)
+    started = asyncio.Event()
+
+    async def create(**_kwargs):
+        started.set()
+        await asyncio.Event().wait()
+
+    fake_async_openai(monkeypatch, create)
+    task = asyncio.create_task(stream_openai_message().__anext__())
+    await started.wait()
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request() is True  # 枠が空いている
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED
@@ -22,14 +22,14 @@ def mock_prisma_and_stripe(monkeypatch):
     # デフォルトNone（テストで上書き）
     mock_prisma.users.find_unique.return_value = None
 
-    # 実際のapp内のprisma_clientをモックに差し替え
-    monkeypatch.setattr("app.routers.payment.prisma_client", mock_prisma)
+    # プランはエンタイトルメントサービス経由で読むので、そちらのprisma_clientを差し替える
+    monkeypatch.setattr("app.services.entitlements.prisma_client", mock_prisma)
 
-    # stripe_serviceのcreate_checkout_sessionもモック
+    # stripe_serviceのcreate_checkout_sessionもモック（非同期関数）
     # デフォルトは固定のダミーURLを返す
     monkeypatch.setattr(
         "app.routers.payment.stripe_service.create_checkout_session",
-        lambda uid: "https://dummy-stripe-session-url.com",
+        AsyncMock(return_value="https://dummy-stripe-session-url.com"),
     )
 
     # Firebase認証をモック
@@ -112,7 +112,7 @@ def test_create_checkout_session_stripe_service_error(
     )
 
     # Stripeサービスを例外を投げるモックに差し替える
-    def fake_create_checkout_session(_):
+    async def fake_create_checkout_session(_):
         raise RuntimeError("Stripe Service Failure!")
 
     monkeypatch.setattr(
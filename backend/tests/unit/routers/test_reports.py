@@ -0,0 +1,119 @@
+# pylint: disable=redefined-outer-name
+
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock
+from app.main import app
+from app.dependencies import verify_firebase_token
+
+# FastAPIアプリをTestClientに渡す
+client = TestClient(app)
+
+
+@pytest.fixture
+def mock_prisma(monkeypatch):
+    """
+    prisma_clientをモックする
+    - レポートはマテリアライズドビューを query_raw で読むだけ
+    """
+    mock_client = AsyncMock()
+    mock_client.query_raw.return_value = []
+    monkeypatch.setattr("app.routers.reports.prisma_client", mock_client)
+
+    # Firebase認証をモックし、そのUIDを管理者にする
+    app.dependency_overrides[verify_firebase_token] = lambda: "admin-uid"
+    monkeypatch.setattr("app.dependencies.ADMIN_FIREBASE_UIDS", {"admin-uid"})
+
+    yield mock_client
+
+    app.dependency_overrides.pop(verify_firebase_token, None)
+
+
+# ======================
+#  TC-REPORT-001
+# ======================
+# GET /api/reports/payments/dailyのテストコード
+# 正常系（ビューの行と通貨別の合計を返す）
+def test_get_payment_daily_report_success(mock_prisma):
+    mock_prisma.query_raw.return_value = [
+        {
+            "day": "2025-07-01",
+            "currency": "jpy",
+            "payments": 3,
+            "conversions": 2,
+            "revenue": 900,
+            "avg_seconds_to_purchase": 3600.0,
+        },
+        {
+            "day": "2025-07-02",
+            "currency": "jpy",
+            "payments": 1,
+            "conversions": 1,
+            "revenue": 300,
+            "avg_seconds_to_purchase": None,
+        },
+    ]
+
+    response = client.get(
+        "/api/reports/payments/daily",
+        params={"since": "2025-07-01", "until": "2025-08-01"},
+        headers={"Authorization": "Bearer test-token"},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [row["day"] for row in data["rows"]] == ["2025-07-01", "2025-07-02"]
+    assert data["total_conversions"] == 3
+    assert data["revenue_by_currency"] == {"jpy": 1200}
+
+    sql, *args = mock_prisma.query_raw.await_args.args
+    assert '"payment_daily_report"' in sql
+    assert args == ["2025-07-01", "2025-08-01", None]
+
+
+# ======================
+#  TC-REPORT-002
+# ======================
+# 異常系（管理者以外は403）
+def test_get_payment_daily_report_forbidden_for_non_admin(mock_prisma):
+    app.dependency_overrides[verify_firebase_token] = lambda: "test-uid"
+
+    response = client.get(
+        "/api/reports/payments/daily",
+        headers={"Authorization": "Bearer test-token"},
+    )
+
+    assert response.status_code == 403
+    mock_prisma.query_raw.assert_not_awaited()
+
+
+# ======================
+#  TC-REPORT-003
+# ======================
+# 異常系（期間の指定が逆）
+def test_get_payment_daily_report_invalid_range(mock_prisma):
+    response = client.get(
+        "/api/reports/payments/daily",
+        params={"since": "2025-08-01", "until": "2025-07-01"},
+        headers={"Authorization": "Bearer test-token"},
+    )
+
+    assert response.status_code == 400
+    mock_prisma.query_raw.assert_not_awaited()
+
+
+# ======================
+#  TC-REPORT-004
+# ======================
+# 異常系（DB例外 → 500）
+def test_get_payment_daily_report_db_error(mock_prisma):
+    mock_prisma.query_raw.side_effect = Exception("DB error")
+
+    response = client.get(
+        "/api/reports/payments/daily",
+        params={"currency": "jpy"},
+        headers={"Authorization": "Bearer test-token"},
+    )
+
+    assert response.status_code == 500
+    assert "レポートの取得中にエラーが発生しました" in response.text
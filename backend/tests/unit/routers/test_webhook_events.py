@@ -3,15 +3,39 @@
 
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, MagicMock
 from app.main import app
 import json
-from app.routers.webhook_events import process_webhook_event
+from datetime import datetime, timezone
+from app.services.webhook_service import (
+    EVENT_CREATED_AT_UNKNOWN,
+    build_webhook_event_row,
+    process_pending_webhook_events,
+    process_webhook_event,
+    webhook_event_key,
+)
 
 # テストクライアント
 client = TestClient(app)
 
 
+def make_webhook_event(**fields):
+    """
+    webhook_eventsのレコードをモックする
+    - 処理側はpayloadを読まず、受信時に抽出したカラムだけを使う
+    """
+    columns = {
+        "stripe_session_id": None,
+        "stripe_payment_intent_id": None,
+        "amount": None,
+        "currency": None,
+        "payment_status": None,
+        "payload": None,
+    }
+    columns.update(fields)
+    return MagicMock(**columns)
+
+
 @pytest.fixture
 def mock_prisma(monkeypatch):
     """
@@ -26,21 +50,22 @@ def mock_prisma(monkeypatch):
     mock_client.users.update.return_value = None
 
     # webhook_eventsテーブル
-    mock_client.webhook_events.create.return_value = AsyncMock(
-        id="evt_test_123",
-        payload="{}",
-        firebase_uid="test-uid",
-        processed=False,
-        error_message=None,
-    )
+    # create_many(skip_duplicates=True)は挿入件数を返す（0なら受信済み）
+    mock_client.webhook_events.create_many.return_value = 1
     mock_client.webhook_events.find_many.return_value = []
-    mock_client.webhook_events.update.return_value = None
+    mock_client.webhook_events.update_many.return_value = 1
 
     # paymentテーブル
-    mock_client.payment.create.return_value = None
+    mock_client.payment.create_many.return_value = 1
+
+    # /process のチャンク書き込みで使うトランザクション（同じモックに書き込ませる）
+    mock_client.tx = MagicMock()
+    mock_client.tx.return_value.__aenter__.return_value = mock_client
+    mock_client.tx.return_value.__aexit__.return_value = False
 
     # 実際のprisma_clientを差し替える
     monkeypatch.setattr("app.routers.webhook_events.prisma_client", mock_client)
+    monkeypatch.setattr("app.services.webhook_service.prisma_client", mock_client)
 
     return mock_client
 
@@ -57,17 +82,17 @@ def test_webhook_event_checkout_session_completed_triggers_processing(
     """
     正常系：
     - event_typeがcheckout.session.completedなら
-      webhook_events.createもprocess_webhook_eventも呼ばれる
+      webhook_events.createが呼ばれ、バックグラウンドワーカーに通知される
+    - 受信リクエスト内ではpayment作成などの処理は行わない
     """
-    # process_webhook_eventをモック
-    process_mock = AsyncMock()
-    monkeypatch.setattr(
-        "app.routers.webhook_events.process_webhook_event", process_mock
-    )
+    # バックグラウンドワーカーをモック
+    worker_mock = MagicMock()
+    monkeypatch.setattr("app.routers.webhook_events.webhook_worker", worker_mock)
 
     payload = {
         "id": "evt_test_123",
         "type": "checkout.session.completed",
+        "created": int(datetime(2025, 7, 1, tzinfo=timezone.utc).timestamp()),
         "data": {
             "object": {
                 "id": "cs_test_abc",
@@ -86,10 +111,20 @@ def test_webhook_event_checkout_session_completed_triggers_processing(
     assert response.status_code == 200
     assert "Webhook eventを保存しました" in response.text
 
-    # DB保存
-    mock_prisma.webhook_events.create.assert_awaited_once()
-    # 自動処理
-    process_mock.assert_awaited_once()
+    # DB保存（受信したボディをそのまま保存し、処理に使うフィールドを抽出する）
+    mock_prisma.webhook_events.create_many.assert_awaited_once()
+    row = mock_prisma.webhook_events.create_many.await_args.kwargs["data"][0]
+    assert row["payload"] == json.dumps(payload)
+    assert row["stripe_session_id"] == "cs_test_abc"
+    assert row["firebase_uid"] == "test-uid"
+    assert row["stripe_payment_intent_id"] == "pi_test_123"
+    # パーティションキーはStripeのイベント作成時刻（再送でも同じ値）、received_at は受信時刻
+    assert row["event_created_at"] == datetime(2025, 7, 1, tzinfo=timezone.utc)
+    assert row["received_at"] > datetime(2025, 7, 1, tzinfo=timezone.utc)
+    # ワーカーへの通知のみ（処理自体はリクエスト内で行わない）
+    worker_mock.notify.assert_called_once()
+    mock_prisma.payment.create_many.assert_not_awaited()
+    mock_prisma.users.update.assert_not_awaited()
 
 
 # ======================
@@ -100,12 +135,10 @@ def test_webhook_event_other_type_does_not_trigger_processing(mock_prisma, monke
     """
     正常系：
     - 他のevent_typeなら
-      webhook_events.createは呼ばれるが、process_webhook_eventは呼ばれない
+      webhook_events.createは呼ばれるが、ワーカーには通知しない
     """
-    process_mock = AsyncMock()
-    monkeypatch.setattr(
-        "app.routers.webhook_events.process_webhook_event", process_mock
-    )
+    worker_mock = MagicMock()
+    monkeypatch.setattr("app.routers.webhook_events.webhook_worker", worker_mock)
 
     payload = {
         "id": "evt_test_456",
@@ -127,23 +160,23 @@ def test_webhook_event_other_type_does_not_trigger_processing(mock_prisma, monke
     assert "Webhook eventを保存しました" in response.text
 
     # DB保存はされる
-    mock_prisma.webhook_events.create.assert_awaited_once()
+    mock_prisma.webhook_events.create_many.assert_awaited_once()
     # 自動処理は呼ばれない
-    process_mock.assert_not_awaited()
+    worker_mock.notify.assert_not_called()
 
 
 # ======================
 #  TC-WEBHOOK-003
 # ======================
-# 異常系（prisma_client.webhook_events.create が例外を投げる）
+# 異常系（prisma_client.webhook_events.create_many が例外を投げる）
 def test_webhook_event_db_create_error_returns_500(mock_prisma, monkeypatch):
     """
     異常系：
-    - prisma_client.webhook_events.create が例外を投げたら
+    - prisma_client.webhook_events.create_many が例外を投げたら
       HTTP 500 が返る
     """
     # DB createが例外を投げるようにする
-    mock_prisma.webhook_events.create.side_effect = RuntimeError("DB failure")
+    mock_prisma.webhook_events.create_many.side_effect = RuntimeError("DB failure")
 
     payload = {
         "id": "evt_test_500",
@@ -197,45 +230,54 @@ def test_process_webhook_events_with_unprocessed_events(mock_prisma):
     """
     正常系：
     - 未処理のcheckout.session.completedイベントがある場合
-    - payment.create、users.update、webhook_events.updateが呼ばれる
-    - 200 + 件数メッセージを返す
+    - ユーザーはfind_many 1回で解決し、
+      payment.create_many、users.update_many、webhook_events.update_manyが
+      トランザクション内で1回ずつ呼ばれる
+    - 200 + 件数メッセージとスループットを返す
     """
 
-    # イベントのpayloadをモック
-    sample_payload = {
-        "data": {
-            "object": {
-                "id": "cs_test",
-                "payment_intent": "pi_test",
-                "amount_total": 300,
-                "currency": "jpy",
-                "payment_status": "paid",
-            }
-        }
-    }
-
-    # 未処理イベントをモック
-    mock_event = AsyncMock(
-        id="evt_123", payload=json.dumps(sample_payload), firebase_uid="user-uid"
+    mock_event = make_webhook_event(
+        id="evt_123",
+        firebase_uid="user-uid",
+        stripe_session_id="cs_test",
+        stripe_payment_intent_id="pi_test",
+        amount=300,
+        currency="jpy",
+        payment_status="paid",
     )
 
     mock_prisma.webhook_events.find_many.return_value = [mock_event]
-    mock_prisma.users.find_unique.return_value = AsyncMock(id=1)
-    mock_prisma.payment.create.return_value = AsyncMock()
-    mock_prisma.users.update.return_value = AsyncMock()
-    mock_prisma.webhook_events.update.return_value = AsyncMock()
+    mock_prisma.users.find_many.return_value = [
+        MagicMock(id="user-1", firebase_uid="user-uid")
+    ]
 
     response = client.post("/api/webhook_events/process")
 
     assert response.status_code == 200
     data = response.json()
     assert "1 件のイベントを処理してpaymentテーブルに保存しました" in data["message"]
+    assert data["processed"] == 1
+    assert "events_per_second" in data
 
     # 各呼び出しが行われたことを確認
     mock_prisma.webhook_events.find_many.assert_awaited_once()
-    mock_prisma.payment.create.assert_awaited_once()
-    mock_prisma.users.update.assert_awaited_once()
-    mock_prisma.webhook_events.update.assert_awaited()
+    mock_prisma.users.find_many.assert_awaited_once_with(
+        where={"firebase_uid": {"in": ["user-uid"]}}
+    )
+    mock_prisma.tx.assert_called_once()
+    mock_prisma.payment.create_many.assert_awaited_once()
+    mock_prisma.users.update_many.assert_awaited_once_with(
+        where={"id": {"in": ["user-1"]}}, data={"current_plan": "premium"}
+    )
+    # 主キー (id, event_created_at) で絞り込み、対象のパーティションだけを更新する
+    key = {"id": "evt_123", "event_created_at": mock_event.event_created_at}
+    mock_prisma.webhook_events.update_many.assert_awaited_once_with(
+        where={"OR": [key]},
+        data={"processed": True},
+    )
+    # 1件ずつの更新は行わない
+    mock_prisma.users.find_unique.assert_not_awaited()
+    mock_prisma.users.update.assert_not_awaited()
 
 
 # ======================
@@ -246,7 +288,7 @@ def test_process_webhook_events_no_unprocessed_events(mock_prisma):
     """
     正常系：
     - 未処理のイベントがない場合
-    - payment.createなどは呼ばれない
+    - payment.create_manyなどは呼ばれない
     - 200 + メッセージを返す
     """
     # 未処理イベント0件
@@ -259,9 +301,9 @@ def test_process_webhook_events_no_unprocessed_events(mock_prisma):
     assert "未処理のWebhookイベントはありません" in data["message"]
 
     # 他のDB操作は呼ばれない
-    mock_prisma.payment.create.assert_not_awaited()
+    mock_prisma.payment.create_many.assert_not_awaited()
     mock_prisma.users.update.assert_not_awaited()
-    mock_prisma.webhook_events.update.assert_not_awaited()
+    mock_prisma.webhook_events.update_many.assert_not_awaited()
 
 
 # ======================
@@ -288,32 +330,28 @@ def test_process_webhook_events_find_many_raises_500(mock_prisma):
 # ======================
 #  TC-WEBHOOK-008
 # ======================
-# 異常系（process中のpayment.createやusers.updateが例外→エラーをwebhook_events.updateに保存）
+# 異常系（process中のpayment.create_manyやusers.updateが例外→エラーをwebhook_events.updateに保存）
 def test_process_webhook_events_partial_processing_error_returns_500(mock_prisma):
     """
     異常系：
-    - payment.createなど途中のDB処理で例外発生
+    - payment.create_manyなど途中のDB処理で例外発生
     - 500エラーを返す
     """
-    sample_payload = {
-        "data": {
-            "object": {
-                "id": "cs_test",
-                "payment_intent": "pi_test",
-                "amount_total": 300,
-                "currency": "jpy",
-                "payment_status": "paid",
-            }
-        }
-    }
-
-    mock_event = AsyncMock(
-        id="evt_123", payload=json.dumps(sample_payload), firebase_uid="user-uid"
+    mock_event = make_webhook_event(
+        id="evt_123",
+        firebase_uid="user-uid",
+        stripe_session_id="cs_test",
+        stripe_payment_intent_id="pi_test",
+        amount=300,
+        currency="jpy",
+        payment_status="paid",
     )
     mock_prisma.webhook_events.find_many.return_value = [mock_event]
 
-    mock_prisma.users.find_unique.return_value = AsyncMock(id=1)
-    mock_prisma.payment.create.side_effect = RuntimeError("Simulated Insert Failure")
+    mock_prisma.users.find_many.return_value = [
+        MagicMock(id="user-1", firebase_uid="user-uid")
+    ]
+    mock_prisma.payment.create_many.side_effect = RuntimeError("Simulated Insert Failure")
 
     response = client.post("/api/webhook_events/process")
 
@@ -323,75 +361,82 @@ def test_process_webhook_events_partial_processing_error_returns_500(mock_prisma
     assert data["detail"] == "Webhook event processing failed"
 
     mock_prisma.webhook_events.find_many.assert_awaited_once()
-    mock_prisma.payment.create.assert_awaited_once()
+    mock_prisma.payment.create_many.assert_awaited_once()
+    # チャンクのイベントにエラー内容を記録する
+    key = {"id": "evt_123", "event_created_at": mock_event.event_created_at}
+    mock_prisma.webhook_events.update_many.assert_awaited_once_with(
+        where={"OR": [key]},
+        data={"error_message": "Simulated Insert Failure"},
+    )
 
 
 # process_webhook_event関数の単体テスト
 # ======================
 #  TC-WEBHOOK-009
 # ======================
-# 正常系（payloadが文字列）
+# 正常系（抽出済みカラムからpaymentを登録する）
 @pytest.mark.asyncio
-async def test_process_event_with_string_payload(mock_prisma):
-    payload_dict = {
-        "data": {
-            "object": {
-                "id": "cs_test",
-                "payment_intent": "pi_test",
-                "amount_total": 500,
-                "currency": "jpy",
-                "payment_status": "paid",
-            }
-        }
-    }
-    event = AsyncMock(
+async def test_process_event_from_extracted_columns(mock_prisma):
+    event = make_webhook_event(
         id="evt_123",
-        payload=json.dumps(payload_dict),
         firebase_uid="user-uid",
+        stripe_session_id="cs_test",
+        stripe_payment_intent_id="pi_test",
+        amount=500,
+        currency="jpy",
+        payment_status="paid",
     )
 
     mock_prisma.users.find_unique.return_value = AsyncMock(id=1)
 
     await process_webhook_event(event)
 
-    mock_prisma.payment.create.assert_awaited_once()
+    mock_prisma.payment.create_many.assert_awaited_once()
     mock_prisma.users.update.assert_awaited_once()
-    mock_prisma.webhook_events.update.assert_awaited_with(
-        where={"id": event.id}, data={"processed": True}
+    mock_prisma.webhook_events.update_many.assert_awaited_with(
+        where=webhook_event_key(event), data={"processed": True}
     )
 
 
 # ======================
 #  TC-WEBHOOK-010
 # ======================
-# 正常系（payloadがdict）
+# 正常系（payloadは読まない）
 @pytest.mark.asyncio
-async def test_process_event_with_dict_payload(mock_prisma):
-    payload_dict = {
-        "data": {
-            "object": {
-                "id": "cs_test",
-                "payment_intent": "pi_test",
-                "amount_total": 800,
-                "currency": "usd",
-                "payment_status": "paid",
-            }
-        }
-    }
-    event = AsyncMock(
+async def test_process_event_does_not_parse_payload(mock_prisma):
+    event = make_webhook_event(
         id="evt_456",
-        payload=payload_dict,
         firebase_uid="user-uid",
+        stripe_session_id="cs_test",
+        stripe_payment_intent_id="pi_test",
+        amount=800,
+        currency="usd",
+        payment_status="paid",
+        # 壊れたpayloadでも、抽出済みカラムがあれば処理できる
+        payload="not json",
     )
 
-    mock_prisma.users.find_unique.return_value = AsyncMock(id=1)
+    mock_prisma.users.find_unique.return_value = AsyncMock(id="user-1")
 
     await process_webhook_event(event)
 
-    mock_prisma.payment.create.assert_awaited_once()
+    mock_prisma.payment.create_many.assert_awaited_once_with(
+        data=[
+            {
+                "user_id": "user-1",
+                "firebase_uid": "user-uid",
+                "stripe_session_id": "cs_test",
+                "stripe_payment_intent_id": "pi_test",
+                "amount": 800,
+                "currency": "usd",
+                "status": "paid",
+            }
+        ],
+        skip_duplicates=True,
+    )
     mock_prisma.users.update.assert_awaited_once()
-    mock_prisma.webhook_events.update.assert_awaited_with(
-        where={"id": event.id}, data={"processed": True}
+    mock_prisma.webhook_events.update_many.assert_awaited_with(
+        where=webhook_event_key(event), data={"processed": True}
     )
 
 
@@ -401,30 +446,23 @@ async def test_process_event_with_dict_payload(mock_prisma):
 # 例外系
 @pytest.mark.asyncio
 async def test_process_event_db_error_logs_error_message(mock_prisma):
-    payload_dict = {
-        "data": {
-            "object": {
-                "id": "cs_test",
-                "payment_intent": "pi_test",
-                "amount_total": 1000,
-                "currency": "usd",
-                "payment_status": "paid",
-            }
-        }
-    }
-    event = AsyncMock(
+    event = make_webhook_event(
         id="evt_error",
-        payload=json.dumps(payload_dict),
         firebase_uid="user-uid",
+        stripe_session_id="cs_test",
+        stripe_payment_intent_id="pi_test",
+        amount=1000,
+        currency="usd",
+        payment_status="paid",
     )
 
     mock_prisma.users.find_unique.return_value = AsyncMock(id=1)
-    mock_prisma.payment.create.side_effect = RuntimeError("DB Insert Failure")
+    mock_prisma.payment.create_many.side_effect = RuntimeError("DB Insert Failure")
 
     await process_webhook_event(event)
 
-    mock_prisma.webhook_events.update.assert_any_await(
-        where={"id": event.id}, data={"error_message": "DB Insert Failure"}
+    mock_prisma.webhook_events.update_many.assert_any_await(
+        where=webhook_event_key(event), data={"error_message": "DB Insert Failure"}
     )
 
 
@@ -435,16 +473,15 @@ async def test_process_event_db_error_logs_error_message(mock_prisma):
 # ①stripe_session_idがない
 @pytest.mark.asyncio
 async def test_process_event_missing_stripe_session_id_skips(mock_prisma):
-    payload_dict = {"data": {"object": {}}}
-    event = AsyncMock(
+    event = make_webhook_event(
         id="evt_no_session",
-        payload=json.dumps(payload_dict),
         firebase_uid="user-uid",
+        stripe_session_id=None,
     )
 
     await process_webhook_event(event)
 
-    mock_prisma.payment.create.assert_not_awaited()
+    mock_prisma.payment.create_many.assert_not_awaited()
     mock_prisma.users.update.assert_not_awaited()
 
 
@@ -454,16 +491,15 @@ async def test_process_event_missing_stripe_session_id_skips(mock_prisma):
 # ②firebase_uidがNone
 @pytest.mark.asyncio
 async def test_process_event_missing_firebase_uid_skips(mock_prisma):
-    payload_dict = {"data": {"object": {"id": "cs_test"}}}
-    event = AsyncMock(
+    event = make_webhook_event(
         id="evt_no_uid",
-        payload=json.dumps(payload_dict),
         firebase_uid=None,
+        stripe_session_id="cs_test",
     )
 
     await process_webhook_event(event)
 
-    mock_prisma.payment.create.assert_not_awaited()
+    mock_prisma.payment.create_many.assert_not_awaited()
     mock_prisma.users.update.assert_not_awaited()
 
 
@@ -473,16 +509,184 @@ async def test_process_event_missing_firebase_uid_skips(mock_prisma):
 # ③users.find_uniqueがNone
 @pytest.mark.asyncio
 async def test_process_event_user_not_found_skips(mock_prisma):
-    payload_dict = {"data": {"object": {"id": "cs_test"}}}
-    event = AsyncMock(
+    event = make_webhook_event(
         id="evt_user_not_found",
-        payload=json.dumps(payload_dict),
         firebase_uid="user-uid",
+        stripe_session_id="cs_test",
     )
 
     mock_prisma.users.find_unique.return_value = None
 
     await process_webhook_event(event)
 
-    mock_prisma.payment.create.assert_not_awaited()
+    mock_prisma.payment.create_many.assert_not_awaited()
     mock_prisma.users.update.assert_not_awaited()
+
+
+# ======================
+#  TC-WEBHOOK-015
+# ======================
+# 正常系（Stripeからの再送で同じイベントIDが届いた）
+def test_webhook_event_duplicate_returns_200_without_processing(
+    mock_prisma, monkeypatch
+):
+    """
+    正常系：
+    - 同じイベントIDが既に保存済み（create_manyの挿入件数が0）なら
+      500にせず200を返し、ワーカーにも通知しない
+    """
+    worker_mock = MagicMock()
+    monkeypatch.setattr("app.routers.webhook_events.webhook_worker", worker_mock)
+    mock_prisma.webhook_events.create_many.return_value = 0
+
+    payload = {
+        "id": "evt_test_123",
+        "type": "checkout.session.completed",
+        "data": {
+            "object": {
+                "id": "cs_test_abc",
+                "metadata": {"firebase_uid": "test-uid"},
+            }
+        },
+    }
+
+    response = client.post(
+        "/api/webhook_events/",
+        data=json.dumps(payload),
+        headers={"Content-Type": "application/json"},
+    )
+
+    assert response.status_code == 200
+    assert "Webhook eventは受信済みです" in response.text
+
+    # 主キー重複は例外ではなく無視される
+    assert (
+        mock_prisma.webhook_events.create_many.await_args.kwargs["skip_duplicates"]
+        is True
+    )
+    worker_mock.notify.assert_not_called()
+
+
+# ======================
+#  TC-WEBHOOK-016
+# ======================
+# 正常系（paymentが登録済みの再処理でもプラン更新・処理済みまで進む）
+@pytest.mark.asyncio
+async def test_process_event_with_existing_payment_is_idempotent(mock_prisma):
+    event = make_webhook_event(
+        id="evt_replay",
+        firebase_uid="user-uid",
+        stripe_session_id="cs_test",
+        stripe_payment_intent_id="pi_test",
+        amount=500,
+        currency="jpy",
+        payment_status="paid",
+    )
+
+    mock_prisma.users.find_unique.return_value = AsyncMock(id=1)
+    # stripe_session_idが既に存在するので挿入されない
+    mock_prisma.payment.create_many.return_value = 0
+
+    assert await process_webhook_event(event) is True
+
+    assert mock_prisma.payment.create_many.await_args.kwargs["skip_duplicates"] is True
+    mock_prisma.users.update.assert_awaited_once()
+    mock_prisma.webhook_events.update_many.assert_awaited_with(
+        where=webhook_event_key(event), data={"processed": True}
+    )
+
+
+# ======================
+#  TC-WEBHOOK-017
+# ======================
+# 正常系（未処理イベントをチャンクに分けて処理する）
+@pytest.mark.asyncio
+async def test_process_pending_events_in_chunks(mock_prisma):
+    """
+    正常系：
+    - chunk_sizeごとにカーソル（id > 直前の最後のID）で読み進める
+    - チャンクごとに1トランザクションで書き込む
+    - ユーザーが見つからないイベントはスキップして件数に含める
+    """
+
+    mock_prisma.webhook_events.find_many.side_effect = [
+        [make_webhook_event(
+            id="evt_1", firebase_uid="uid-a", stripe_session_id="cs_evt_1"
+        ), make_webhook_event(
+            id="evt_2", firebase_uid="uid-b", stripe_session_id="cs_evt_2"
+        )],
+        [make_webhook_event(
+            id="evt_3", firebase_uid="uid-unknown", stripe_session_id="cs_evt_3"
+        )],
+    ]
+    mock_prisma.users.find_many.side_effect = [
+        [
+            MagicMock(id="user-a", firebase_uid="uid-a"),
+            MagicMock(id="user-b", firebase_uid="uid-b"),
+        ],
+        [],
+    ]
+
+    result = await process_pending_webhook_events(chunk_size=2, concurrency=2)
+
+    assert result.processed == 2
+    assert result.skipped == 1
+    assert result.failed == 0
+
+    second_page = mock_prisma.webhook_events.find_many.await_args_list[1].kwargs
+    assert second_page["where"]["id"] == {"gt": "evt_2"}
+    assert second_page["take"] == 2
+
+    mock_prisma.tx.assert_called_once()
+    rows = mock_prisma.payment.create_many.await_args.kwargs["data"]
+    assert [row["stripe_session_id"] for row in rows] == ["cs_evt_1", "cs_evt_2"]
+    # アップグレードの通知は同じトランザクションでアウトボックスに積む
+    outbox_rows = mock_prisma.outbox_events.create_many.await_args.kwargs["data"]
+    assert [json.loads(row["payload"])["firebase_uid"] for row in outbox_rows] == [
+        "uid-a",
+        "uid-b",
+    ]
+
+
+# ======================
+#  TC-WEBHOOK-018
+# ======================
+# 正常系（3つの書き込みとアウトボックスを1トランザクションで行い、コミット後にリレーを起こす）
+@pytest.mark.asyncio
+async def test_process_event_writes_in_one_transaction_with_outbox(
+    mock_prisma, monkeypatch
+):
+    event = make_webhook_event(
+        id="evt_tx", firebase_uid="user-uid", stripe_session_id="cs_tx"
+    )
+    mock_prisma.users.find_unique.return_value = MagicMock(id="user-1")
+    notify_mock = MagicMock()
+    monkeypatch.setattr(
+        "app.services.webhook_service.outbox_relay.notify", notify_mock
+    )
+
+    assert await process_webhook_event(event) is True
+
+    mock_prisma.tx.assert_called_once()
+    outbox_row = mock_prisma.outbox_events.create.await_args.kwargs["data"]
+    assert outbox_row["topic"] == "plan.upgraded"
+    assert json.loads(outbox_row["payload"]) == {
+        "firebase_uid": "user-uid",
+        "user_id": "user-1",
+        "plan": "premium",
+    }
+    notify_mock.assert_called_once()
+
+
+# ======================
+#  TC-WEBHOOK-019
+# ======================
+# created のないイベントは固定の event_created_at にして、再送でも同じ主キーにする
+def test_build_webhook_event_row_without_created_is_deterministic():
+    body = json.dumps({"id": "evt_no_created", "type": "payment_intent.succeeded"})
+
+    first = build_webhook_event_row(body.encode())
+    retried = build_webhook_event_row(body.encode())
+
+    assert first["event_created_at"] == retried["event_created_at"]
+    assert first["event_created_at"] == EVENT_CREATED_AT_UNKNOWN
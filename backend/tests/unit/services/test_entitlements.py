@@ -0,0 +1,112 @@
+# pylint: disable=redefined-outer-name
+
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+import redis.asyncio as redis
+
+from app.services.entitlements import REDIS_HASH_KEY, EntitlementService
+
+
+@pytest.fixture
+def mock_prisma(monkeypatch):
+    """users.find_unique だけを使うのでAsyncMockで置き換える"""
+    mock_client = AsyncMock()
+    mock_client.users.find_unique.return_value = SimpleNamespace(
+        id="user-1", current_plan="free"
+    )
+    monkeypatch.setattr("app.services.entitlements.prisma_client", mock_client)
+    return mock_client
+
+
+# ======================
+#  TC-ENT-001
+# ======================
+# 初回だけDBを読み、2回目以降はキャッシュから返す
+@pytest.mark.asyncio
+async def test_get_reads_database_once(mock_prisma):
+    service = EntitlementService()
+
+    first = await service.get("uid-a")
+    second = await service.get("uid-a")
+
+    assert first.user_id == "user-1"
+    assert first.is_premium is False
+    assert second == first
+    mock_prisma.users.find_unique.assert_awaited_once_with(
+        where={"firebase_uid": "uid-a"}
+    )
+
+
+# ======================
+#  TC-ENT-002
+# ======================
+# 存在しないユーザーはキャッシュしない
+@pytest.mark.asyncio
+async def test_missing_user_is_not_cached(mock_prisma):
+    mock_prisma.users.find_unique.return_value = None
+    service = EntitlementService()
+
+    assert await service.get("uid-a") is None
+    assert await service.get("uid-a") is None
+    assert mock_prisma.users.find_unique.await_count == 2
+
+
+# ======================
+#  TC-ENT-003
+# ======================
+# アップグレード処理の set_plan がDBを読まずに反映され、TTLを過ぎると読み直す
+@pytest.mark.asyncio
+async def test_set_plan_and_ttl(mock_prisma):
+    service = EntitlementService(ttl_seconds=0.05)
+
+    await service.set_plan("uid-a", "user-1", "premium")
+    assert (await service.get("uid-a")).is_premium is True
+    mock_prisma.users.find_unique.assert_not_awaited()
+
+    time.sleep(0.06)
+    assert (await service.get("uid-a")).is_premium is False
+    mock_prisma.users.find_unique.assert_awaited_once()
+
+
+# ======================
+#  TC-ENT-004
+# ======================
+# Redisハッシュがあればそこから読み、Redisが落ちていればDBから読む
+@pytest.mark.asyncio
+async def test_redis_hash_and_fallback(mock_prisma):
+    redis_client = AsyncMock()
+    redis_client.hget.return_value = "premium:user-9"
+    service = EntitlementService(redis_client=redis_client)
+
+    entitlement = await service.get("uid-a")
+    assert entitlement.user_id == "user-9"
+    assert entitlement.is_premium is True
+    redis_client.hget.assert_awaited_once_with(REDIS_HASH_KEY, "uid-a")
+    mock_prisma.users.find_unique.assert_not_awaited()
+
+    redis_client.hget.side_effect = redis.ConnectionError("down")
+    redis_client.hset.side_effect = redis.ConnectionError("down")
+    assert (await service.get("uid-b")).user_id == "user-1"
+    mock_prisma.users.find_unique.assert_awaited_once()
+
+
+# ======================
+#  TC-ENT-005
+# ======================
+# キャッシュ済みのプラン判定は1ミリ秒未満で返る
+@pytest.mark.asyncio
+async def test_warm_lookup_is_sub_millisecond(mock_prisma):
+    service = EntitlementService()
+    await service.get("uid-a")
+
+    iterations = 1000
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await service.get("uid-a")
+    per_call = (time.perf_counter() - started) / iterations
+
+    assert per_call < 0.001
+    mock_prisma.users.find_unique.assert_awaited_once()
@@ -0,0 +1,96 @@
+# pylint: disable=redefined-outer-name
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.services.message_log_queue import MessageLogWriteQueue
+
+
+@pytest.fixture
+def mock_prisma():
+    """create_manyだけを使うのでAsyncMockで置き換える"""
+    mock_client = AsyncMock()
+    mock_client.message_logs.create_many.return_value = 0
+    return mock_client
+
+
+# ======================
+#  TC-MLQ-001
+# ======================
+# 件数がbatch_sizeに達したらまとめて保存する
+@pytest.mark.asyncio
+async def test_flushes_when_batch_size_reached(mock_prisma):
+    queue = MessageLogWriteQueue(mock_prisma, batch_size=3, flush_interval=60)
+    await queue.start()
+
+    for i in range(3):
+        assert queue.enqueue("user-1", f"わん{i}", False) is True
+
+    await asyncio.sleep(0.05)
+
+    mock_prisma.message_logs.create_many.assert_awaited_once()
+    data = mock_prisma.message_logs.create_many.await_args.kwargs["data"]
+    assert [row["content"] for row in data] == ["わん0", "わん1", "わん2"]
+
+    await queue.stop()
+
+
+# ======================
+#  TC-MLQ-002
+# ======================
+# batch_sizeに達しなくてもflush_interval経過で保存する
+@pytest.mark.asyncio
+async def test_flushes_after_interval(mock_prisma):
+    queue = MessageLogWriteQueue(mock_prisma, batch_size=100, flush_interval=0.05)
+    await queue.start()
+
+    queue.enqueue("user-1", "わん！", False)
+    await asyncio.sleep(0.02)
+    mock_prisma.message_logs.create_many.assert_not_awaited()
+
+    await asyncio.sleep(0.1)
+    mock_prisma.message_logs.create_many.assert_awaited_once()
+
+    await queue.stop()
+
+
+# ======================
+#  TC-MLQ-003
+# ======================
+# stop()で残りを書き出し、停止後は受け付けない
+@pytest.mark.asyncio
+async def test_stop_drains_queue(mock_prisma):
+    queue = MessageLogWriteQueue(mock_prisma, batch_size=100, flush_interval=60)
+    await queue.start()
+
+    queue.enqueue("user-1", "わん！", False)
+    queue.enqueue("user-2", "はみがきだわん", True)
+
+    await asyncio.wait_for(queue.stop(), timeout=1)
+
+    data = mock_prisma.message_logs.create_many.await_args.kwargs["data"]
+    assert len(data) == 2
+    assert queue.enqueue("user-3", "わん！", False) is False
+
+
+# ======================
+#  TC-MLQ-004
+# ======================
+# 保存に失敗しても書き込みタスクは止まらない
+@pytest.mark.asyncio
+async def test_flush_error_does_not_stop_worker(mock_prisma):
+    mock_prisma.message_logs.create_many.side_effect = [RuntimeError("DB down"), 1]
+    queue = MessageLogWriteQueue(mock_prisma, batch_size=1, flush_interval=60)
+    await queue.start()
+
+    queue.enqueue("user-1", "わん！", False)
+    await asyncio.sleep(0.02)
+    queue.enqueue("user-1", "わん！", False)
+    await asyncio.sleep(0.02)
+
+    assert mock_prisma.message_logs.create_many.await_count == 2
+    assert queue.running
+
+    await queue.stop()
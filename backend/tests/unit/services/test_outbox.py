@@ -0,0 +1,280 @@
+# pylint: disable=redefined-outer-name
+
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import orjson
+import pytest
+
+from app.services.entitlements import entitlement_service
+from app.services.outbox import (
+    CLAIM_OUTBOX_SQL,
+    PLAN_UPGRADED,
+    PURGE_OUTBOX_SQL,
+    OutboxRelay,
+    OutboxSubscriber,
+    build_outbox_row,
+)
+
+
+def make_row(
+    event_id: str,
+    firebase_uid: str = "uid-a",
+    user_id: str = "user-a",
+    attempts: int = 1,
+):
+    row = build_outbox_row(
+        PLAN_UPGRADED,
+        {"firebase_uid": firebase_uid, "user_id": user_id, "plan": "premium"},
+    )
+    return {
+        "id": event_id,
+        "created_at": "2025-07-01T00:00:00Z",
+        "attempts": attempts,
+        **row,
+    }
+
+
+@pytest.fixture
+def mock_prisma(monkeypatch):
+    """
+    query_raw / outbox_events をAsyncMockで置き換える
+    - キャッシュを無効化したあとのプラン判定は、DB上ではpremiumになっている想定
+    """
+    mock_client = AsyncMock()
+    mock_client.query_raw.return_value = []
+    mock_client.execute_raw.return_value = 0
+    mock_client.outbox_events.update_many.return_value = 1
+    mock_client.users.find_unique.return_value = SimpleNamespace(
+        id="user-a", current_plan="premium"
+    )
+    monkeypatch.setattr("app.services.entitlements.prisma_client", mock_client)
+    return mock_client
+
+
+def make_redis():
+    """publishをpipelineにまとめるRedisクライアントのモック"""
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(return_value=[1])
+    redis_client = MagicMock()
+    redis_client.pipeline.return_value.__aenter__ = AsyncMock(return_value=pipe)
+    redis_client.pipeline.return_value.__aexit__ = AsyncMock(return_value=False)
+    redis_client.hset = AsyncMock()
+    return redis_client, pipe
+
+
+# ======================
+#  TC-OUTBOX-001
+# ======================
+# Redisがなければ同じプロセスのキャッシュに反映して配信済みにする
+@pytest.mark.asyncio
+async def test_relay_applies_locally_without_redis(mock_prisma):
+    mock_prisma.query_raw.return_value = [make_row("ob_1")]
+    relay = OutboxRelay(mock_prisma, batch_size=10)
+
+    assert await relay.run_once() == 1
+
+    sql, *args = mock_prisma.query_raw.await_args.args
+    assert sql == CLAIM_OUTBOX_SQL
+    assert args == [10, relay.lease_seconds, relay.max_attempts]
+    entitlement = await entitlement_service.get("uid-a")
+    assert entitlement.is_premium is True
+    kwargs = mock_prisma.outbox_events.update_many.await_args.kwargs
+    assert kwargs["where"] == {"id": {"in": ["ob_1"]}}
+    assert kwargs["data"]["published_at"] is not None
+
+
+# ======================
+#  TC-OUTBOX-002
+# ======================
+# Redisがあればバッチをまとめてpub/subに配信する
+@pytest.mark.asyncio
+async def test_relay_publishes_batch_to_redis(mock_prisma):
+    mock_prisma.query_raw.return_value = [
+        make_row("ob_1", "uid-a", "user-a"),
+        make_row("ob_2", "uid-b", "user-b"),
+    ]
+    redis_client, pipe = make_redis()
+    relay = OutboxRelay(mock_prisma, redis_client=redis_client, channel="test")
+
+    assert await relay.run_once() == 2
+
+    published = [json.loads(call.args[1]) for call in pipe.publish.call_args_list]
+    assert [message["id"] for message in published] == ["ob_1", "ob_2"]
+    assert all(call.args[0] == "test" for call in pipe.publish.call_args_list)
+    pipe.execute.assert_awaited_once()
+    assert (
+        "published_at"
+        in mock_prisma.outbox_events.update_many.await_args.kwargs["data"]
+    )
+
+
+# ======================
+#  TC-OUTBOX-003
+# ======================
+# 配信に失敗したらリースを外して次の周期で再配信する
+@pytest.mark.asyncio
+async def test_relay_releases_batch_on_publish_failure(mock_prisma):
+    mock_prisma.query_raw.return_value = [make_row("ob_1")]
+    redis_client, pipe = make_redis()
+    pipe.execute.side_effect = ConnectionError("redis down")
+    relay = OutboxRelay(mock_prisma, redis_client=redis_client)
+
+    await relay.run_once()
+
+    data = mock_prisma.outbox_events.update_many.await_args.kwargs["data"]
+    assert data == {"locked_until": None, "last_error": "redis down"}
+
+
+# ======================
+#  TC-OUTBOX-004
+# ======================
+# 購読側はメッセージを受け取ったらこのプロセスのキャッシュを無効化する
+@pytest.mark.asyncio
+async def test_subscriber_invalidates_cached_plan(mock_prisma):
+    await entitlement_service.set_plan("uid-a", "user-a", "free")
+    subscriber = OutboxSubscriber(MagicMock())
+
+    await subscriber.handle_message({"type": "subscribe", "data": 1})
+    assert (await entitlement_service.get("uid-a")).is_premium is False
+
+    message = orjson.dumps(
+        {
+            "id": "ob_1",
+            "topic": PLAN_UPGRADED,
+            "payload": {"firebase_uid": "uid-a", "user_id": "user-a"},
+        }
+    )
+    await subscriber.handle_message({"type": "message", "data": message})
+    # 無効化されたのでDBから読み直す
+    assert (await entitlement_service.get("uid-a")).is_premium is True
+    mock_prisma.users.find_unique.assert_awaited_once()
+
+    # 壊れたメッセージで購読が止まらない
+    await subscriber.handle_message({"type": "message", "data": "not json"})
+
+
+# ======================
+#  TC-OUTBOX-005
+# ======================
+# notify()で待機中のリレーが起き、stop()で停止する
+@pytest.mark.asyncio
+async def test_relay_notify_and_stop(mock_prisma):
+    relay = OutboxRelay(mock_prisma, poll_interval=60)
+    await relay.start()
+    await asyncio.sleep(0.01)
+    assert mock_prisma.query_raw.await_count == 1
+
+    relay.notify()
+    await asyncio.sleep(0.01)
+    assert mock_prisma.query_raw.await_count == 2
+
+    await relay.stop()
+    assert relay.running is False
+    # 起動直後に配信済みの古い行も削除している
+    mock_prisma.execute_raw.assert_awaited_once()
+
+
+# ======================
+#  TC-OUTBOX-006
+# ======================
+# 上限回数まで配信できなかった行はログに出し、それ以降は確保されない（試行回数は確保時のSQLで判定）
+@pytest.mark.asyncio
+async def test_relay_gives_up_after_max_attempts(mock_prisma, monkeypatch):
+    logger = MagicMock()
+    monkeypatch.setattr("app.services.outbox.logger", logger)
+    mock_prisma.query_raw.return_value = [
+        make_row("ob_1", attempts=3),
+        make_row("ob_2", "uid-b", "user-b", attempts=1),
+    ]
+    redis_client, pipe = make_redis()
+    pipe.execute.side_effect = ConnectionError("redis down")
+    relay = OutboxRelay(mock_prisma, redis_client=redis_client, max_attempts=3)
+
+    await relay.run_once()
+
+    assert '"attempts" < $3' in CLAIM_OUTBOX_SQL
+    assert mock_prisma.query_raw.await_args.args[3] == 3
+    message, max_attempts, dead = logger.error.call_args.args
+    assert "再配信をやめます" in message
+    assert (max_attempts, dead) == (3, ["ob_1"])
+
+
+# ======================
+#  TC-OUTBOX-007
+# ======================
+# 配信から保持期間を過ぎた行を、バッチが埋まらなくなるまで削除する
+@pytest.mark.asyncio
+async def test_relay_purges_published_rows(mock_prisma):
+    mock_prisma.execute_raw.side_effect = [2, 2, 1]
+    relay = OutboxRelay(mock_prisma, retention_days=7, purge_batch_size=2)
+
+    assert await relay.purge_published() == 5
+
+    assert mock_prisma.execute_raw.await_count == 3
+    assert mock_prisma.execute_raw.await_args.args == (PURGE_OUTBOX_SQL, 7, 2)
+
+
+class FakePubSub:
+    """messages を流したあと error を投げる（なければ待ち続ける）pub/sub のモック"""
+
+    def __init__(self, messages, error=None):
+        self.messages = messages
+        self.error = error
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        return False
+
+    async def subscribe(self, _channel):
+        pass
+
+    async def listen(self):
+        for message in self.messages:
+            yield message
+        if self.error is not None:
+            raise self.error
+        await asyncio.Event().wait()
+
+
+# ======================
+#  TC-OUTBOX-008
+# ======================
+# 反映や購読でRedis以外の例外が起きても、ログに出して購読を続ける
+@pytest.mark.asyncio
+async def test_subscriber_keeps_running_after_unexpected_errors(monkeypatch):
+    applied = []
+
+    async def apply(topic, payload):
+        if topic == "broken":
+            raise RuntimeError("handler failed")
+        applied.append(payload["n"])
+
+    def message(topic, n):
+        data = orjson.dumps({"id": f"ob_{n}", "topic": topic, "payload": {"n": n}})
+        return {"type": "message", "data": data}
+
+    monkeypatch.setattr("app.services.outbox.apply_outbox_event", apply)
+    logger = MagicMock()
+    monkeypatch.setattr("app.services.outbox.logger", logger)
+    redis_client = MagicMock()
+    redis_client.pubsub.side_effect = [
+        FakePubSub(
+            [message("broken", 1), message(PLAN_UPGRADED, 2)], ValueError("boom")
+        ),
+        FakePubSub([message(PLAN_UPGRADED, 3)]),
+    ]
+    subscriber = OutboxSubscriber(redis_client, reconnect_seconds=0)
+
+    await subscriber.start()
+    await asyncio.sleep(0.05)
+
+    assert subscriber.running is True
+    assert applied == [2, 3]
+    assert redis_client.pubsub.call_count == 2
+    assert logger.error.call_count == 2
+    await subscriber.stop()
@@ -0,0 +1,66 @@
+# pylint: disable=redefined-outer-name
+
+import asyncio
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.services import reports
+from app.services.reports import (
+    REFRESH_PAYMENT_REPORT_SQL,
+    ReportRefreshTask,
+    refresh_payment_report,
+)
+
+
+def make_client(locked: bool = True):
+    """アドバイザリーロックの結果を locked にしたPrismaクライアントのモック"""
+    mock_client = AsyncMock()
+    mock_client.query_raw.return_value = [{"locked": locked}]
+
+    @asynccontextmanager
+    async def tx(**_):
+        yield mock_client
+
+    mock_client.tx = tx
+    return mock_client
+
+
+# ======================
+#  TC-REPORT-005
+# ======================
+# 定期タスクはビューを CONCURRENTLY で更新し、無効化もできる
+@pytest.mark.asyncio
+async def test_report_refresh_task_refreshes_concurrently():
+    mock_client = make_client()
+
+    disabled = ReportRefreshTask(mock_client, enabled=False)
+    await disabled.start()
+    assert disabled.running is False
+
+    task = ReportRefreshTask(mock_client, interval_seconds=60)
+    await task.start()
+    await asyncio.sleep(0.01)
+    assert task.running is True
+    mock_client.execute_raw.assert_awaited_once_with(REFRESH_PAYMENT_REPORT_SQL)
+    assert "CONCURRENTLY" in REFRESH_PAYMENT_REPORT_SQL
+
+    await task.stop()
+    assert task.running is False
+
+
+# ======================
+#  TC-REPORT-006
+# ======================
+# 他のプロセスが更新中（ロックを取れない）なら更新しない。定期タスクは既定で無効
+@pytest.mark.asyncio
+async def test_report_refresh_skips_when_locked_elsewhere(monkeypatch):
+    monkeypatch.delenv("REPORT_REFRESH_ENABLED", raising=False)
+    assert reports.report_refresh_task.enabled is False
+
+    mock_client = make_client(locked=False)
+
+    assert await refresh_payment_report(mock_client) is False
+    mock_client.execute_raw.assert_not_awaited()
+    assert await refresh_payment_report(make_client()) is True
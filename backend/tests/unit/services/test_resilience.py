@@ -0,0 +1,144 @@
+# pylint: disable=redefined-outer-name
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    hedged_call,
+)
+
+
+class FakeClock:
+    """テスト用に時間を手動で進められる時計"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(
+        "test",
+        window_size=10,
+        min_calls=4,
+        failure_rate_threshold=0.5,
+        slow_call_seconds=1.0,
+        slow_call_rate_threshold=0.5,
+        open_seconds=30,
+        clock=clock,
+    )
+
+
+# ======================
+#  TC-RES-001
+# ======================
+# エラー率が閾値を超えたら open になり、呼び出しを拒否する
+def test_breaker_opens_on_error_rate(breaker):
+    breaker.record_success(0.1)
+    breaker.record_success(0.1)
+    breaker.record_failure(0.1)
+    assert breaker.state == CLOSED
+
+    breaker.record_failure(0.1)
+
+    assert breaker.state == OPEN
+    assert breaker.allow_request() is False
+
+
+# ======================
+#  TC-RES-002
+# ======================
+# 遅延（slow call）の割合が閾値を超えたら open になる
+def test_breaker_opens_on_slow_calls(breaker):
+    for latency in (0.1, 0.1, 2.0, 2.0):
+        breaker.record_success(latency)
+
+    assert breaker.state == OPEN
+
+
+# ======================
+#  TC-RES-003
+# ======================
+# open_seconds 経過後は half_open になり、プローブ1件だけ通す。成功で closed に戻る
+def test_breaker_half_open_probe_success_closes(breaker, clock):
+    for _ in range(4):
+        breaker.record_failure(0.1)
+    clock.now += 30
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request() is True
+    assert breaker.allow_request() is False  # プローブ枠は1件
+
+    breaker.record_success(0.1)
+
+    assert breaker.state == CLOSED
+    assert breaker.allow_request() is True
+
+
+# ======================
+#  TC-RES-004
+# ======================
+# half_open のプローブが失敗したら再び open になる
+def test_breaker_half_open_probe_failure_reopens(breaker, clock):
+    for _ in range(4):
+        breaker.record_failure(0.1)
+    clock.now += 30
+    assert breaker.allow_request() is True
+
+    breaker.record_failure(0.1)
+
+    assert breaker.state == OPEN
+
+
+# ======================
+#  TC-RES-005
+# ======================
+# 1本目が遅い場合はヘッジの2本目が先に返る
+def test_hedged_call_returns_faster_second_request():
+    release_first = threading.Event()
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) == 1:
+            release_first.wait(timeout=5)
+            return "slow"
+        return "fast"
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        result = hedged_call(func, 0.05, executor)
+        release_first.set()
+
+    assert result == "fast"
+    assert len(calls) == 2
+
+
+# ======================
+#  TC-RES-006
+# ======================
+# 結果を記録せずに打ち切ったプローブは、枠だけを返して half_open のままにする
+def test_breaker_release_probe_frees_half_open_slot(breaker, clock):
+    for _ in range(4):
+        breaker.record_failure(0.1)
+    clock.now += 30
+    assert breaker.allow_request() is True
+    assert breaker.allow_request() is False
+
+    breaker.release_probe()
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request() is True
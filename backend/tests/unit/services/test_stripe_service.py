@@ -0,0 +1,167 @@
+# pylint: disable=redefined-outer-name
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+import stripe
+
+from app.services.stripe_service import CheckoutSessionService
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    """POST /v1/checkout/sessions だけを受け付けるフェイクのStripe API"""
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        length = int(self.headers.get("Content-Length", 0))
+        params = parse_qs(self.rfile.read(length).decode())
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, params))
+            count = len(server.requests)
+
+        # 連打されたときに同時リクエストが重なるよう少し待つ
+        time.sleep(server.delay)
+
+        if server.fail:
+            status = 400
+            body = {"error": {"type": "invalid_request_error", "message": "bad"}}
+        else:
+            status = 200
+            body = {
+                "id": f"cs_test_{count}",
+                "object": "checkout.session",
+                "url": f"https://checkout.stripe.test/c/pay/cs_test_{count}",
+                "status": "open",
+                "expires_at": int(params["expires_at"][0]),
+                "metadata": {"firebase_uid": params["metadata[firebase_uid]"][0]},
+            }
+
+        encoded = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, *_args):
+        pass
+
+
+@pytest.fixture
+def fake_stripe_server():
+    """ローカルで動くフェイクのStripeサーバーを立てる"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeStripeHandler)
+    server.requests = []
+    server.lock = threading.Lock()
+    server.delay = 0.0
+    server.fail = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+async def checkout_service(fake_stripe_server):
+    service = CheckoutSessionService(
+        "sk_test_dummy",
+        "price_test",
+        "http://localhost:3000",
+        api_base=f"http://127.0.0.1:{fake_stripe_server.server_port}",
+        max_network_retries=0,
+    )
+    yield service
+    await service.close()
+
+
+# ======================
+#  TC-STRIPE-001
+# ======================
+# 非同期クライアントでCheckoutセッションを作成する
+@pytest.mark.asyncio
+async def test_create_checkout_session_calls_stripe(
+    checkout_service, fake_stripe_server
+):
+    url = await checkout_service.create_checkout_session("uid-a")
+
+    assert url == "https://checkout.stripe.test/c/pay/cs_test_1"
+    path, params = fake_stripe_server.requests[0]
+    assert path == "/v1/checkout/sessions"
+    assert params["line_items[0][price]"] == ["price_test"]
+    assert params["metadata[firebase_uid]"] == ["uid-a"]
+    assert params["success_url"] == ["http://localhost:3000/admin/payment/success"]
+    assert int(params["expires_at"][0]) > time.time()
+
+
+# ======================
+#  TC-STRIPE-002
+# ======================
+# 同じユーザーには期限内のセッションを再利用し、別のユーザーには新しく作る
+@pytest.mark.asyncio
+async def test_open_session_is_reused_per_user(checkout_service, fake_stripe_server):
+    first = await checkout_service.create_checkout_session("uid-a")
+    second = await checkout_service.create_checkout_session("uid-a")
+    other = await checkout_service.create_checkout_session("uid-b")
+
+    assert first == second
+    assert other != first
+    assert len(fake_stripe_server.requests) == 2
+
+
+# ======================
+#  TC-STRIPE-003
+# ======================
+# 同時に押されても作成リクエストは1回にまとめる
+@pytest.mark.asyncio
+async def test_concurrent_clicks_create_one_session(
+    checkout_service, fake_stripe_server
+):
+    fake_stripe_server.delay = 0.05
+
+    urls = await asyncio.gather(
+        *(checkout_service.create_checkout_session("uid-a") for _ in range(3))
+    )
+
+    assert len(set(urls)) == 1
+    assert len(fake_stripe_server.requests) == 1
+
+
+# ======================
+#  TC-STRIPE-004
+# ======================
+# 期限が近いセッションや決済済み（forget）のセッションは作り直す
+@pytest.mark.asyncio
+async def test_expiring_or_forgotten_session_is_recreated(
+    checkout_service, fake_stripe_server
+):
+    first = await checkout_service.create_checkout_session("uid-a")
+    checkout_service.get_open_session("uid-a").expires_at = time.time() + 60
+    second = await checkout_service.create_checkout_session("uid-a")
+
+    checkout_service.forget("uid-a")
+    third = await checkout_service.create_checkout_session("uid-a")
+
+    assert len({first, second, third}) == 3
+    assert len(fake_stripe_server.requests) == 3
+
+
+# ======================
+#  TC-STRIPE-005
+# ======================
+# Stripeがエラーを返したら例外を投げ、キャッシュには残さない
+@pytest.mark.asyncio
+async def test_stripe_error_is_not_cached(checkout_service, fake_stripe_server):
+    fake_stripe_server.fail = True
+
+    with pytest.raises(stripe.StripeError):
+        await checkout_service.create_checkout_session("uid-a")
+
+    assert checkout_service.get_open_session("uid-a") is None
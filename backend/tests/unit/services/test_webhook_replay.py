@@ -0,0 +1,149 @@
+# pylint: disable=redefined-outer-name
+
+import json
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.services.webhook_replay import ReplayCheckpoint, replay_webhook_events
+
+SINCE = datetime(2025, 7, 1, tzinfo=timezone.utc)
+UNTIL = datetime(2025, 8, 1, tzinfo=timezone.utc)
+
+
+def make_event(index: int):
+    return MagicMock(
+        id=f"evt_{index}",
+        received_at=SINCE + timedelta(minutes=index),
+        stripe_session_id=f"cs_{index}",
+        firebase_uid="uid-a",
+        stripe_payment_intent_id=None,
+        amount=300,
+        currency="jpy",
+        payment_status="paid",
+    )
+
+
+@pytest.fixture
+def mock_prisma(monkeypatch):
+    """リプレイとチャンク処理の両方が使うprisma_clientを同じモックに差し替える"""
+    mock_client = AsyncMock()
+    mock_client.users.find_many.return_value = [
+        MagicMock(id="user-a", firebase_uid="uid-a")
+    ]
+    mock_client.tx = MagicMock()
+    mock_client.tx.return_value.__aenter__.return_value = mock_client
+    mock_client.tx.return_value.__aexit__.return_value = False
+    monkeypatch.setattr("app.services.webhook_replay.prisma_client", mock_client)
+    monkeypatch.setattr("app.services.webhook_service.prisma_client", mock_client)
+    return mock_client
+
+
+# ======================
+#  TC-REPLAY-001
+# ======================
+# received_at順にバッチで読み進め、完了したところまでチェックポイントを保存する
+@pytest.mark.asyncio
+async def test_replay_streams_batches_and_saves_checkpoint(mock_prisma, tmp_path):
+    mock_prisma.webhook_events.find_many.side_effect = [
+        [make_event(0), make_event(1)],
+        [make_event(2)],
+    ]
+    checkpoint_path = tmp_path / "checkpoint.json"
+
+    result = await replay_webhook_events(
+        SINCE, UNTIL, batch_size=2, concurrency=2, checkpoint_path=checkpoint_path
+    )
+
+    assert result.processed == 3
+    assert result.failed == 0
+    assert mock_prisma.tx.call_count == 2
+
+    first_page = mock_prisma.webhook_events.find_many.await_args_list[0].kwargs
+    assert first_page["where"]["received_at"] == {"gte": SINCE, "lt": UNTIL}
+    assert first_page["where"]["processed"] is False
+    assert "OR" not in first_page["where"]
+    second_page = mock_prisma.webhook_events.find_many.await_args_list[1].kwargs
+    assert second_page["where"]["OR"][1]["id"] == {"gt": "evt_1"}
+
+    saved = json.loads(checkpoint_path.read_text())
+    assert saved["event_id"] == "evt_2"
+    assert saved["processed"] == 3
+
+
+# ======================
+#  TC-REPLAY-002
+# ======================
+# チェックポイントから再開すると、その位置より後ろだけを読む
+@pytest.mark.asyncio
+async def test_replay_resumes_from_checkpoint(mock_prisma, tmp_path):
+    checkpoint_path = tmp_path / "checkpoint.json"
+    ReplayCheckpoint(
+        since=SINCE.isoformat(),
+        until=UNTIL.isoformat(),
+        event_type="checkout.session.completed",
+        received_at=make_event(4).received_at.isoformat(),
+        event_id="evt_4",
+        processed=5,
+    ).save(checkpoint_path)
+    mock_prisma.webhook_events.find_many.return_value = [make_event(5)]
+
+    result = await replay_webhook_events(
+        SINCE,
+        UNTIL,
+        batch_size=10,
+        include_processed=True,
+        checkpoint_path=checkpoint_path,
+        resume=True,
+    )
+
+    where = mock_prisma.webhook_events.find_many.await_args.kwargs["where"]
+    assert where["OR"] == [
+        {"received_at": {"gt": make_event(4).received_at}},
+        {"received_at": make_event(4).received_at, "id": {"gt": "evt_4"}},
+    ]
+    assert "processed" not in where
+    # 戻り値は今回の分、チェックポイントは累計
+    assert result.processed == 1
+    assert json.loads(checkpoint_path.read_text())["processed"] == 6
+
+
+# ======================
+#  TC-REPLAY-003
+# ======================
+# 期間の違うチェックポイントからは再開しない
+@pytest.mark.asyncio
+async def test_replay_rejects_mismatched_checkpoint(mock_prisma, tmp_path):
+    checkpoint_path = tmp_path / "checkpoint.json"
+    ReplayCheckpoint(
+        since="2024-01-01T00:00:00+00:00",
+        until=UNTIL.isoformat(),
+        event_type="checkout.session.completed",
+    ).save(checkpoint_path)
+
+    with pytest.raises(ValueError):
+        await replay_webhook_events(
+            SINCE, UNTIL, checkpoint_path=checkpoint_path, resume=True
+        )
+
+    mock_prisma.webhook_events.find_many.assert_not_awaited()
+
+
+# ======================
+#  TC-REPLAY-004
+# ======================
+# dry-runでは書き込まず、チェックポイントも保存しない
+@pytest.mark.asyncio
+async def test_replay_dry_run_does_not_write(mock_prisma, tmp_path):
+    mock_prisma.webhook_events.find_many.return_value = [make_event(0)]
+    checkpoint_path = tmp_path / "checkpoint.json"
+
+    result = await replay_webhook_events(
+        SINCE, UNTIL, batch_size=10, dry_run=True, checkpoint_path=checkpoint_path
+    )
+
+    assert result.processed == 1
+    mock_prisma.tx.assert_not_called()
+    mock_prisma.payment.create_many.assert_not_awaited()
+    assert not checkpoint_path.exists()
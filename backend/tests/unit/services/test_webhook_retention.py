@@ -0,0 +1,207 @@
+# pylint: disable=redefined-outer-name
+
+import asyncio
+import gzip
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.services import webhook_retention
+from app.services.advisory_lock import TRY_LOCK_SQL
+from app.services.webhook_retention import (
+    WebhookRetentionTask,
+    compact_old_partitions,
+    compact_partition,
+    ensure_partitions,
+    partition_end,
+)
+
+
+@pytest.fixture
+def mock_prisma():
+    """
+    query_raw / execute_raw / tx だけを使うのでAsyncMockで置き換える
+
+    アドバイザリーロックの問い合わせには locked を返し、それ以外の query_raw は results を順に返す。
+    """
+    mock_client = AsyncMock()
+    mock_client.execute_raw.return_value = 0
+    mock_client.locked = True
+    mock_client.results = []
+
+    @asynccontextmanager
+    async def tx(**_):
+        yield mock_client
+
+    async def query_raw(sql, *_args):
+        if sql == TRY_LOCK_SQL:
+            return [{"locked": mock_client.locked}]
+        return mock_client.results.pop(0) if mock_client.results else []
+
+    mock_client.tx = tx
+    mock_client.query_raw.side_effect = query_raw
+    return mock_client
+
+
+# ======================
+#  TC-RET-001
+# ======================
+# 月パーティション名から範囲の終端（翌月1日）を求める
+def test_partition_end():
+    assert partition_end("webhook_events_p202501") == datetime(
+        2025, 2, 1, tzinfo=timezone.utc
+    )
+    assert partition_end("webhook_events_p202512") == datetime(
+        2026, 1, 1, tzinfo=timezone.utc
+    )
+    assert partition_end("webhook_events_default") is None
+
+
+# ======================
+#  TC-RET-002
+# ======================
+# 先の月のパーティション作成はDB関数に任せる
+@pytest.mark.asyncio
+async def test_ensure_partitions_calls_db_function(mock_prisma):
+    mock_prisma.results = [[{"created": 2}]]
+
+    assert await ensure_partitions(mock_prisma, months_ahead=3) == 2
+
+    sql, months_ahead = mock_prisma.query_raw.await_args.args
+    assert "ensure_webhook_events_partitions" in sql
+    assert months_ahead == 3
+
+
+# ======================
+#  TC-RET-003
+# ======================
+# payloadを1ページずつgzipのJSON Linesに書き出し、書き出したページだけをNULLにする
+@pytest.mark.asyncio
+async def test_compact_partition_archives_then_clears(mock_prisma, tmp_path):
+    mock_prisma.results = [
+        [
+            {"id": "evt_1", "event_created_at": "2025-01-02", "payload": '{"a": 1}'},
+            {"id": "evt_2", "event_created_at": "2025-01-03", "payload": '{"b": 2}'},
+        ],
+        [{"id": "evt_3", "event_created_at": "2025-01-04", "payload": '{"c": 3}'}],
+        [],
+    ]
+    archived_before_clear = []
+
+    async def execute_raw(_sql, ids):
+        # NULLにする時点で、そのページまではファイルに書かれている
+        with gzip.open(next(tmp_path.iterdir()), "rt", encoding="utf-8") as archived:
+            archived_before_clear.append(([json.loads(l)["id"] for l in archived], ids))
+        return len(ids)
+
+    mock_prisma.execute_raw.side_effect = execute_raw
+
+    result = await compact_partition(
+        mock_prisma, "webhook_events_p202501", tmp_path, page_size=2
+    )
+
+    assert result.rows == 3
+    assert archived_before_clear == [
+        (["evt_1", "evt_2"], ["evt_1", "evt_2"]),
+        (["evt_1", "evt_2", "evt_3"], ["evt_3"]),
+    ]
+    with gzip.open(result.archive_path, "rt", encoding="utf-8") as archived:
+        lines = [json.loads(line) for line in archived]
+    assert lines[0]["payload"] == '{"a": 1}'
+
+    sql, _ = mock_prisma.execute_raw.await_args.args
+    assert 'UPDATE "webhook_events_p202501" SET "payload" = NULL' in sql
+
+
+# ======================
+#  TC-RET-004
+# ======================
+# 月パーティション以外（デフォルトパーティションなど）は扱わない
+@pytest.mark.asyncio
+async def test_compact_partition_rejects_unknown_table(mock_prisma, tmp_path):
+    with pytest.raises(ValueError):
+        await compact_partition(mock_prisma, 'users"; DROP TABLE users; --', tmp_path)
+
+    mock_prisma.query_raw.assert_not_awaited()
+
+
+# ======================
+#  TC-RET-005
+# ======================
+# 保持期間を過ぎた月のパーティションだけを退避する
+@pytest.mark.asyncio
+async def test_compact_old_partitions_only_targets_expired(mock_prisma, tmp_path):
+    mock_prisma.results = [
+        [
+            {"name": "webhook_events_default"},
+            {"name": "webhook_events_p202501"},
+            {"name": "webhook_events_p202505"},
+        ],
+        [{"id": "evt_1", "event_created_at": "2025-01-02", "payload": "{}"}],
+        [],
+    ]
+
+    results = await compact_old_partitions(
+        mock_prisma,
+        retention_days=90,
+        archive_dir=tmp_path,
+        now=datetime(2025, 5, 15, tzinfo=timezone.utc),
+    )
+
+    assert [result.partition for result in results] == ["webhook_events_p202501"]
+    assert results[0].archive_path.parent == tmp_path
+    mock_prisma.execute_raw.assert_awaited_once()
+
+
+# ======================
+#  TC-RET-006
+# ======================
+# 定期実行タスクは無効化できる（既定では無効）
+@pytest.mark.asyncio
+async def test_retention_task_start_and_stop(mock_prisma, monkeypatch):
+    monkeypatch.delenv("WEBHOOK_RETENTION_ENABLED", raising=False)
+    assert webhook_retention.webhook_retention_task.enabled is False
+
+    disabled = WebhookRetentionTask(mock_prisma, enabled=False)
+    await disabled.start()
+    assert disabled.running is False
+
+    task = WebhookRetentionTask(mock_prisma, interval_seconds=60)
+    await task.start()
+    await asyncio.sleep(0.01)
+    assert task.running is True
+    # 起動直後に1回実行される（ロック + パーティション作成。退避先が未設定なので退避はしない）
+    assert mock_prisma.query_raw.await_count == 2
+    mock_prisma.execute_raw.assert_not_awaited()
+
+    await task.stop()
+    assert task.running is False
+
+
+# ======================
+#  TC-RET-007
+# ======================
+# 他のプロセスがロックを持っている間は、パーティション作成も退避もしない
+@pytest.mark.asyncio
+async def test_retention_skips_when_another_process_holds_lock(mock_prisma, tmp_path):
+    mock_prisma.locked = False
+    mock_prisma.results = [[{"name": "webhook_events_p202501"}]]
+
+    assert await ensure_partitions(mock_prisma) == 0
+    results = await compact_old_partitions(
+        mock_prisma,
+        retention_days=90,
+        archive_dir=tmp_path,
+        now=datetime(2025, 5, 15, tzinfo=timezone.utc),
+    )
+
+    assert [(result.partition, result.skipped) for result in results] == [
+        ("webhook_events_p202501", True)
+    ]
+    executed = [call.args[0] for call in mock_prisma.query_raw.await_args_list]
+    assert not any("ensure_webhook_events_partitions" in sql for sql in executed)
+    mock_prisma.execute_raw.assert_not_awaited()
+    assert list(tmp_path.iterdir()) == []
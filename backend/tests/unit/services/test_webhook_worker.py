@@ -0,0 +1,147 @@
+# pylint: disable=redefined-outer-name
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.services.webhook_worker import CLAIM_EVENTS_SQL, WebhookWorker
+
+
+def make_event(event_id: str, attempts: int = 1):
+    return MagicMock(id=event_id, attempts=attempts)
+
+
+@pytest.fixture
+def mock_prisma():
+    """query_raw / webhook_events だけを使うのでAsyncMockで置き換える"""
+    mock_client = AsyncMock()
+    mock_client.query_raw.return_value = []
+    mock_client.webhook_events.find_many.return_value = []
+    mock_client.webhook_events.update_many.return_value = 1
+    return mock_client
+
+
+# ======================
+#  TC-WHW-001
+# ======================
+# SKIP LOCKEDで確保したイベントを処理する
+@pytest.mark.asyncio
+async def test_run_once_claims_and_processes_events(mock_prisma):
+    events = [make_event("evt_1"), make_event("evt_2")]
+    mock_prisma.query_raw.return_value = [{"id": "evt_1"}, {"id": "evt_2"}]
+    mock_prisma.webhook_events.find_many.return_value = events
+    processor = AsyncMock(return_value=True)
+
+    worker = WebhookWorker(mock_prisma, processor=processor, batch_size=10)
+    claimed = await worker.run_once()
+
+    assert claimed == 2
+    sql, *args = mock_prisma.query_raw.await_args.args
+    assert sql == CLAIM_EVENTS_SQL
+    assert "FOR UPDATE SKIP LOCKED" in sql
+    assert args == [10, worker.lease_seconds, worker.max_attempts]
+    mock_prisma.webhook_events.find_many.assert_awaited_once_with(
+        where={"id": {"in": ["evt_1", "evt_2"]}}
+    )
+    assert processor.await_count == 2
+    # 成功時は再試行時刻を更新しない
+    mock_prisma.webhook_events.update_many.assert_not_awaited()
+
+
+# ======================
+#  TC-WHW-002
+# ======================
+# 確保できるイベントがなければ何もしない
+@pytest.mark.asyncio
+async def test_run_once_without_events(mock_prisma):
+    processor = AsyncMock(return_value=True)
+
+    worker = WebhookWorker(mock_prisma, processor=processor)
+
+    assert await worker.run_once() == 0
+    mock_prisma.webhook_events.find_many.assert_not_awaited()
+    processor.assert_not_awaited()
+
+
+# ======================
+#  TC-WHW-003
+# ======================
+# 失敗したイベントはバックオフして再試行時刻を先送りし、ロックを外す
+@pytest.mark.asyncio
+async def test_failed_event_is_rescheduled_with_backoff(mock_prisma):
+    mock_prisma.query_raw.return_value = [{"id": "evt_fail"}]
+    event = make_event("evt_fail", attempts=3)
+    mock_prisma.webhook_events.find_many.return_value = [event]
+    processor = AsyncMock(side_effect=RuntimeError("boom"))
+
+    worker = WebhookWorker(mock_prisma, processor=processor, base_backoff=2.0)
+    await worker.run_once()
+
+    kwargs = mock_prisma.webhook_events.update_many.await_args.kwargs
+    assert kwargs["where"] == {
+        "id": "evt_fail",
+        "event_created_at": event.event_created_at,
+    }
+    assert kwargs["data"]["locked_until"] is None
+    assert kwargs["data"]["next_attempt_at"] is not None
+
+
+# ======================
+#  TC-WHW-004
+# ======================
+# バックオフは指数的に伸び、max_backoffで頭打ちになる
+def test_backoff_seconds_grows_and_is_capped():
+    worker = WebhookWorker(MagicMock(), base_backoff=2.0, max_backoff=30.0)
+
+    assert 1.0 <= worker.backoff_seconds(1) <= 2.0
+    assert 4.0 <= worker.backoff_seconds(3) <= 8.0
+    assert 15.0 <= worker.backoff_seconds(10) <= 30.0
+
+
+# ======================
+#  TC-WHW-005
+# ======================
+# 同時に処理するイベント数はconcurrencyまで
+@pytest.mark.asyncio
+async def test_processing_is_bounded_by_concurrency(mock_prisma):
+    events = [make_event(f"evt_{i}") for i in range(6)]
+    mock_prisma.query_raw.return_value = [{"id": e.id} for e in events]
+    mock_prisma.webhook_events.find_many.return_value = events
+
+    in_flight = 0
+    peak = 0
+
+    async def processor(_event):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return True
+
+    worker = WebhookWorker(mock_prisma, processor=processor, concurrency=2)
+    await worker.run_once()
+
+    assert peak == 2
+
+
+# ======================
+#  TC-WHW-006
+# ======================
+# notify()で待機中のワーカーが起き、stop()で停止する
+@pytest.mark.asyncio
+async def test_notify_wakes_worker_and_stop(mock_prisma):
+    worker = WebhookWorker(
+        mock_prisma, processor=AsyncMock(return_value=True), poll_interval=60
+    )
+    await worker.start()
+    await asyncio.sleep(0.01)
+    assert mock_prisma.query_raw.await_count == 1
+
+    worker.notify()
+    await asyncio.sleep(0.01)
+    assert mock_prisma.query_raw.await_count == 2
+
+    await worker.stop()
+    assert worker.running is False
@@ -0,0 +1,117 @@
+import csv
+import importlib.util
+from datetime import date
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+_spec = importlib.util.spec_from_file_location(
+    "generate_data", BACKEND_DIR / "prisma" / "generate_data.py"
+)
+generate_data = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(generate_data)
+
+TODAY = date(2026, 10, 19)
+
+
+def fresh_ids():
+    return generate_data.IdSequence({table: 1 for table in generate_data.SERIAL_TABLES})
+
+
+def collect(batch_size: int) -> dict:
+    tables = {table: [] for table in generate_data.TABLE_COLUMNS}
+    for batch in generate_data.generate_batches(
+        50, seed=7, years=2, today=TODAY, ids=fresh_ids(), batch_size=batch_size
+    ):
+        for table, rows in batch.items():
+            tables[table].extend(rows)
+    return tables
+
+
+# ======================
+#  TC-GEN-001
+# ======================
+# 同じ seed ならバッチの区切り方によらず同じデータになり、外部キーも揃っている
+def test_generation_is_deterministic_and_consistent():
+    first = collect(batch_size=7)
+    assert first == collect(batch_size=50)
+
+    user_ids = {row["id"] for row in first["users"]}
+    setting_ids = {row["id"] for row in first["care_settings"]}
+    assert len(first["users"]) == 50
+    assert {row["user_id"] for row in first["care_settings"]} <= user_ids
+    assert {row["care_setting_id"] for row in first["care_logs"]} <= setting_ids
+    assert {row["user_id"] for row in first["payment"]} <= user_ids
+    # 毎日の記録は今日より前で、1つのお世話設定で同じ日付は1件だけ
+    keys = [(row["care_setting_id"], row["date"]) for row in first["care_logs"]]
+    assert len(keys) == len(set(keys))
+    assert max(row["date"] for row in first["care_logs"]) < TODAY.isoformat()
+    ids = [row["id"] for row in first["care_logs"]]
+    assert ids == list(range(1, len(ids) + 1))
+
+
+# ======================
+#  TC-GEN-002
+# ======================
+# CSV は COPY で読める形式（NULL は空欄、真偽値は t/f）で、load.sql が外部キーの順に読み込む
+@pytest.mark.asyncio
+async def test_csv_sink_writes_copy_files(tmp_path):
+    counts = await generate_data.generate(
+        generate_data.CsvSink(tmp_path),
+        users=20,
+        seed=1,
+        years=1,
+        ids=fresh_ids(),
+        batch_size=8,
+        today=TODAY,
+    )
+
+    with open(tmp_path / "care_logs.csv", encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == counts["care_logs"]
+    assert {row["fed_morning"] for row in rows} <= {"t", "f"}
+    assert any(row["walk_total_distance_m"] == "" for row in rows)
+
+    load_sql = (tmp_path / "load.sql").read_text(encoding="utf-8")
+    copies = [line for line in load_sql.splitlines() if line.startswith("\\copy")]
+    assert [line.split('"')[1] for line in copies] == list(generate_data.TABLE_COLUMNS)
+    assert "setval(pg_get_serial_sequence('\"care_logs\"', 'id')" in load_sql
+
+
+# ======================
+#  TC-GEN-003
+# ======================
+# create_many では親テーブルを入れ終わってから子テーブルを入れ、最後にシーケンスを進める
+@pytest.mark.asyncio
+async def test_prisma_sink_inserts_parents_first():
+    client = MagicMock()
+    calls = []
+    for table in generate_data.TABLE_COLUMNS:
+
+        async def create_many(data, table=table):
+            calls.append((table, len(data)))
+
+        getattr(client, table).create_many = create_many
+    client.execute_raw = AsyncMock()
+
+    counts = await generate_data.generate(
+        generate_data.PrismaSink(client, chunk_size=100, concurrency=2),
+        users=30,
+        seed=3,
+        years=1,
+        ids=fresh_ids(),
+        batch_size=30,
+        today=TODAY,
+    )
+
+    tables = [table for table, _ in calls]
+    assert tables[0] == "users"
+    assert tables.index("care_settings") < tables.index("care_logs")
+    assert all(size <= 100 for _, size in calls)
+    assert (
+        sum(size for table, size in calls if table == "care_logs")
+        == counts["care_logs"]
+    )
+    assert client.execute_raw.await_count == len(generate_data.SERIAL_TABLES)
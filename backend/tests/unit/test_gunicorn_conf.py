@@ -0,0 +1,97 @@
+import os
+import runpy
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+def load_config(monkeypatch, tmp_path, **env) -> dict:
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path / "metrics"))
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return runpy.run_path(str(BACKEND_DIR / "gunicorn.conf.py"))
+
+
+# ======================
+#  TC-SERVER-001
+# ======================
+# cgroup v2 / v1 のCPUクォータからワーカー数を決める（無制限ならコア数）
+def test_workers_follow_cgroup_cpu_quota(tmp_path, monkeypatch):
+    config = load_config(monkeypatch, tmp_path)
+    monkeypatch.setattr("os.sched_getaffinity", lambda pid: set(range(8)))
+
+    v2 = tmp_path / "v2"
+    v2.mkdir()
+    (v2 / "cpu.max").write_text("150000 100000\n")
+    assert config["cgroup_cpu_quota"](str(v2)) == 1.5
+    assert config["default_workers"](str(v2)) == 2
+
+    (v2 / "cpu.max").write_text("max 100000\n")
+    assert config["cgroup_cpu_quota"](str(v2)) is None
+    assert config["default_workers"](str(v2)) == 8
+
+    v1 = tmp_path / "v1"
+    (v1 / "cpu").mkdir(parents=True)
+    (v1 / "cpu" / "cpu.cfs_quota_us").write_text("50000\n")
+    (v1 / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+    assert config["available_cpus"](str(v1)) == 0.5
+    assert config["default_workers"](str(v1)) == 1
+
+    (v1 / "cpu" / "cpu.cfs_quota_us").write_text("-1\n")
+    assert config["default_workers"](str(v1)) == 8
+
+
+# ======================
+#  TC-SERVER-002
+# ======================
+# 本番の設定: uvloop + httptools のワーカー、preload、keep-alive、ワーカーの定期入れ替え
+def test_production_server_settings(tmp_path, monkeypatch):
+    config = load_config(
+        monkeypatch, tmp_path, WEB_CONCURRENCY="3", GUNICORN_KEEPALIVE="90"
+    )
+
+    assert config["workers"] == 3
+    assert config["worker_class"].CONFIG_KWARGS == {
+        "loop": "uvloop",
+        "http": "httptools",
+    }
+    assert config["preload_app"] is True
+    assert config["keepalive"] == 90
+    assert config["graceful_timeout"] == 30
+    assert config["max_requests"] > 0 and config["max_requests_jitter"] > 0
+    # preload_app では on_starting より先にアプリを読み込むので、読み込み時にディレクトリを作る
+    assert (tmp_path / "metrics").is_dir()
+
+
+# ======================
+#  TC-SERVER-003
+# ======================
+# PROMETHEUS_MULTIPROC_DIR が未設定でも、設定ファイルを読み込んだあとの prometheus_client は
+# マルチプロセス用の値（ディレクトリに書き出す）を使う
+def test_config_enables_prometheus_multiprocess_mode(tmp_path):
+    env = {
+        name: value
+        for name, value in os.environ.items()
+        if name.lower() != "prometheus_multiproc_dir"
+    }
+    env["TMPDIR"] = str(tmp_path)
+    script = (
+        "import runpy, sys\n"
+        f"runpy.run_path({str(BACKEND_DIR / 'gunicorn.conf.py')!r})\n"
+        "assert 'prometheus_client' not in sys.modules\n"
+        "from prometheus_client import values\n"
+        "print(values.ValueClass.__name__)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.strip() == "MmapedValue"
+    assert (tmp_path / "wan-mission-metrics").is_dir()
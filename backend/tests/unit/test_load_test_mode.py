@@ -0,0 +1,101 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.dependencies import check_load_test_mode, verify_load_test_token
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+def build_request(authorization=None) -> Request:
+    headers = []
+    if authorization is not None:
+        headers.append((b"authorization", authorization.encode()))
+    return Request({"type": "http", "headers": headers})
+
+
+# ======================
+#  TC-LOADTEST-001
+# ======================
+# 負荷試験モードでは loadtest- で始まるUIDをそのまま受け付ける
+def test_load_test_token_is_used_as_uid():
+    assert verify_load_test_token(build_request("Bearer loadtest-00042")) == (
+        "loadtest-00042"
+    )
+
+
+# ======================
+#  TC-LOADTEST-002
+# ======================
+# それ以外のトークン・ヘッダーなしは401（実ユーザーのUIDでは入れない）
+@pytest.mark.parametrize("authorization", [None, "loadtest-00042", "Bearer real-uid"])
+def test_load_test_token_rejects_other_tokens(authorization):
+    with pytest.raises(HTTPException) as error:
+        verify_load_test_token(build_request(authorization))
+    assert error.value.status_code == 401
+
+
+# ======================
+#  TC-LOADTEST-003
+# ======================
+# ENV が本番の値のときに有効にすると起動を止める（サービスアカウントの有無は関係ない）
+@pytest.mark.parametrize(
+    "environ",
+    [
+        {"ENV": "production"},
+        {"ENV": "Prod"},
+        {"ENV": "production", "FIREBASE_SERVICE_ACCOUNT": "{}"},
+    ],
+)
+def test_load_test_mode_refuses_production(environ):
+    with pytest.raises(RuntimeError, match="LOAD_TEST_MODE"):
+        check_load_test_mode(True, environ)
+
+    # 負荷試験モードが無効なら止めない
+    check_load_test_mode(False, environ)
+
+
+# ======================
+#  TC-LOADTEST-005
+# ======================
+# 本番以外（.env や CI のようにサービスアカウントが設定されていても）では有効にできる
+@pytest.mark.parametrize(
+    "environ",
+    [
+        {},
+        {"FIREBASE_SERVICE_ACCOUNT": "{}"},
+        {"ENV": "development", "FIREBASE_SERVICE_ACCOUNT": "{}"},
+        {"ENV": "staging"},
+    ],
+)
+def test_load_test_mode_allowed_outside_production(environ):
+    check_load_test_mode(True, environ)
+
+
+# ======================
+#  TC-LOADTEST-004
+# ======================
+# import の時点（サーバーの起動時）でエラーになる
+def test_load_test_mode_refuses_to_import_in_production():
+    env = {
+        **os.environ,
+        "LOAD_TEST_MODE": "true",
+        "FIREBASE_SERVICE_ACCOUNT": "",
+        "ENV": "production",
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", "import app.dependencies"],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+
+    assert result.returncode != 0
+    assert "LOAD_TEST_MODE は本番環境" in result.stderr
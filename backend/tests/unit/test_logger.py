@@ -0,0 +1,111 @@
+# pylint: disable=redefined-outer-name
+
+import io
+import logging
+
+import orjson
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.logger import (
+    RequestContextMiddleware,
+    configure_logging,
+    get_logger,
+    parse_sample_rates,
+    request_id_var,
+    sampled_var,
+    shutdown_logging,
+)
+
+
+@pytest.fixture
+def log_stream():
+    """ログの出力先を StringIO に差し替え、テスト後に標準出力へ戻す"""
+    stream = io.StringIO()
+    configure_logging("DEBUG", stream=stream, force=True)
+    yield stream
+    configure_logging(force=True)
+
+
+def read_records(stream: io.StringIO) -> list:
+    """リスナーを止めてキューを書き出し、JSON Lines を読む"""
+    shutdown_logging()
+    return [orjson.loads(line) for line in stream.getvalue().splitlines()]
+
+
+# ======================
+#  TC-LOG-001
+# ======================
+# 1行1件のJSONで、request_id・extra・例外が出力される
+def test_json_record_with_request_id(log_stream):
+    logger = get_logger("app.tests")
+    token = request_id_var.set("req-1")
+    try:
+        logger.info("更新成功: %s", "log-1", extra={"count": 3})
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("更新失敗")
+    finally:
+        request_id_var.reset(token)
+
+    info, error = read_records(log_stream)
+    assert info["level"] == "INFO"
+    assert info["logger"] == "app.tests"
+    assert info["msg"] == "更新成功: log-1"
+    assert info["request_id"] == "req-1"
+    assert info["count"] == 3
+    assert error["level"] == "ERROR"
+    assert "ValueError: boom" in error["exc"]
+
+
+# ======================
+#  TC-LOG-002
+# ======================
+# サンプリング対象外のリクエストでは INFO 以下を捨て、WARNING 以上は残す
+def test_unsampled_request_keeps_warnings(log_stream):
+    logger = get_logger("app.tests")
+    token = sampled_var.set(False)
+    try:
+        logger.debug("debug")
+        logger.info("info")
+        logger.warning("warning")
+    finally:
+        sampled_var.reset(token)
+    logger.info("sampled")
+
+    records = read_records(log_stream)
+    assert [record["msg"] for record in records] == ["warning", "sampled"]
+    assert logging.getLogger("app").propagate is False
+
+
+# ======================
+#  TC-LOG-003
+# ======================
+# X-Request-ID を引き継ぎ（なければ採番して）レスポンスに付ける
+def test_middleware_sets_request_id(log_stream):
+    app = FastAPI()
+    app.add_middleware(
+        RequestContextMiddleware, sample_rates=parse_sample_rates("/quiet=0")
+    )
+
+    @app.get("/{name}")
+    async def handler(name: str):
+        get_logger("app.tests").info("handled %s", name)
+        return {"request_id": request_id_var.get()}
+
+    client = TestClient(app)
+    response = client.get("/loud", headers={"X-Request-ID": "abc"})
+    assert response.headers["x-request-id"] == "abc"
+    assert response.json() == {"request_id": "abc"}
+
+    response = client.get("/quiet")
+    generated = response.headers["x-request-id"]
+    assert len(generated) == 32
+    assert response.json() == {"request_id": generated}
+
+    records = read_records(log_stream)
+    assert [(r["msg"], r["request_id"], r["route"]) for r in records] == [
+        ("handled loud", "abc", "/loud")
+    ]
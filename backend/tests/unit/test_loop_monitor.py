@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.loop_monitor import LoopMonitor
+
+
+def lag_count() -> float:
+    return REGISTRY.get_sample_value("event_loop_lag_seconds_count") or 0.0
+
+
+def blocking_handler() -> None:
+    """async のハンドラーから呼ばれてしまった同期呼び出しの代わり"""
+    time.sleep(0.3)
+
+
+# ======================
+#  TC-LOOP-001
+# ======================
+# 一定間隔でイベントループの遅れを記録し、ブロッキングがあれば遅れとして現れる
+@pytest.mark.asyncio
+async def test_loop_lag_is_recorded():
+    monitor = LoopMonitor(interval_seconds=0.01)
+    before = lag_count()
+    before_slow = (
+        REGISTRY.get_sample_value("event_loop_lag_seconds_bucket", {"le": "0.1"}) or 0.0
+    )
+
+    await monitor.start()
+    await asyncio.sleep(0.05)
+    blocking_handler()
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+
+    assert not monitor.running
+    assert lag_count() - before >= 3
+    # 0.3秒止めた回は 0.1秒以下のバケットに入らない
+    within = REGISTRY.get_sample_value("event_loop_lag_seconds_bucket", {"le": "0.1"})
+    assert within - before_slow < lag_count() - before
+
+
+# ======================
+#  TC-LOOP-002
+# ======================
+# ウォッチドッグはしきい値を超えて止まったときのスタックを記録する
+@pytest.mark.asyncio
+async def test_watchdog_captures_blocking_stack():
+    monitor = LoopMonitor(interval_seconds=0.01, watchdog=True, threshold_seconds=0.05)
+    before = REGISTRY.get_sample_value("event_loop_blocked_total") or 0.0
+
+    await monitor.start()
+    await asyncio.sleep(0.1)
+    assert monitor.blocked_stacks == []
+
+    blocking_handler()
+    await asyncio.sleep(0.1)
+    await monitor.stop()
+
+    assert len(monitor.blocked_stacks) == 1
+    assert "in blocking_handler" in monitor.blocked_stacks[0]
+    assert "time.sleep(0.3)" in monitor.blocked_stacks[0]
+    assert REGISTRY.get_sample_value("event_loop_blocked_total") == before + 1
@@ -0,0 +1,152 @@
+import os
+import runpy
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+import redis.asyncio as redis
+from prometheus_client import REGISTRY, CollectorRegistry, Histogram
+
+from app import db
+from app.metrics import collect_metrics, timed
+from app.tracing import TracedRedis
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+def sample_count(metric: str, **labels) -> float:
+    """デフォルトレジストリに記録された観測数（未記録なら0）"""
+    return REGISTRY.get_sample_value(f"{metric}_count", labels) or 0.0
+
+
+# ======================
+#  TC-METRIC-001
+# ======================
+# 成功・失敗を outcome ラベルで分けて所要時間を記録する
+def test_timed_records_outcome():
+    registry = CollectorRegistry()
+    histogram = Histogram(
+        "test_dependency_seconds", "テスト用", ["operation", "outcome"], registry=registry
+    )
+
+    with timed(histogram, operation="call"):
+        pass
+    with pytest.raises(RuntimeError):
+        with timed(histogram, operation="call"):
+            raise RuntimeError("boom")
+
+    for outcome in ("ok", "error"):
+        count = registry.get_sample_value(
+            "test_dependency_seconds_count", {"operation": "call", "outcome": outcome}
+        )
+        assert count == 1
+
+
+# ======================
+#  TC-METRIC-002
+# ======================
+# Redisはコマンドごとに記録し、想定外のコマンドは other にまとめる
+@pytest.mark.asyncio
+async def test_redis_command_labels_are_bounded(monkeypatch):
+    monkeypatch.setattr(
+        redis.Redis, "execute_command", AsyncMock(return_value="premium:user-1")
+    )
+    client = TracedRedis()
+    before_get = sample_count(
+        "redis_command_duration_seconds", command="GET", outcome="ok"
+    )
+    before_other = sample_count(
+        "redis_command_duration_seconds", command="other", outcome="ok"
+    )
+
+    assert await client.execute_command("GET", "key") == "premium:user-1"
+    await client.execute_command("OBJECT", "ENCODING", "key")
+
+    assert (
+        sample_count("redis_command_duration_seconds", command="GET", outcome="ok")
+        == before_get + 1
+    )
+    assert (
+        sample_count("redis_command_duration_seconds", command="other", outcome="ok")
+        == before_other + 1
+    )
+    assert (
+        REGISTRY.get_sample_value(
+            "redis_command_duration_seconds_count",
+            {"command": "OBJECT", "outcome": "ok"},
+        )
+        is None
+    )
+
+
+# ======================
+#  TC-METRIC-003
+# ======================
+# Prismaはモデル・操作ごとに記録する
+@pytest.mark.asyncio
+async def test_prisma_query_histogram(monkeypatch):
+    monkeypatch.setattr(
+        db.Prisma, "_execute", AsyncMock(return_value=None), raising=False
+    )
+    client = db.TracedPrisma()
+    labels = {"model": "care_logs", "operation": "find_first", "outcome": "ok"}
+    before = sample_count("prisma_query_duration_seconds", **labels)
+
+    await client._execute(
+        method="find_first",
+        arguments={},
+        model=SimpleNamespace(__prisma_model__="care_logs"),
+    )
+
+    assert sample_count("prisma_query_duration_seconds", **labels) == before + 1
+
+
+# ======================
+#  TC-METRIC-004
+# ======================
+# マルチプロセスモードでは、複数ワーカーが書き出した値を /metrics でまとめて返す
+def test_multiprocess_metrics_are_aggregated(tmp_path, monkeypatch):
+    observe = (
+        "from app.metrics import REDIS_COMMAND_SECONDS; "
+        "REDIS_COMMAND_SECONDS.labels(command='GET', outcome='ok').observe(0.002)"
+    )
+    env = {
+        **os.environ,
+        "PROMETHEUS_MULTIPROC_DIR": str(tmp_path),
+        "PYTHONPATH": str(BACKEND_DIR),
+    }
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", observe], env=env, check=True)
+
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    body = collect_metrics().decode()
+    assert (
+        'redis_command_duration_seconds_count{command="GET",outcome="ok"} 2.0' in body
+    )
+
+
+# ======================
+#  TC-METRIC-005
+# ======================
+# gunicorn が起動時に古いファイルを消し、停止したワーカーのゲージを集計から外す
+def test_gunicorn_hooks_clean_up_worker_files(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    config = runpy.run_path(str(BACKEND_DIR / "gunicorn.conf.py"))
+    server = SimpleNamespace(log=SimpleNamespace(info=lambda *args: None))
+
+    stale = tmp_path / "counter_1.db"
+    stale.write_bytes(b"")
+    config["on_starting"](server)
+    assert not stale.exists()
+
+    live_gauge = tmp_path / "gauge_livemax_4242.db"
+    histogram = tmp_path / "histogram_4242.db"
+    live_gauge.write_bytes(b"")
+    histogram.write_bytes(b"")
+    config["child_exit"](server, SimpleNamespace(pid=4242))
+    assert not live_gauge.exists()
+    assert histogram.exists()
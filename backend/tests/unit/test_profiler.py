@@ -0,0 +1,144 @@
+# pylint: disable=redefined-outer-name
+
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.profiler import ProfileMiddleware, SamplingProfiler, recent_profiles
+
+
+def busy_loop(stop: threading.Event) -> None:
+    """プロファイラーに見つけてもらうためにCPUを使い続ける"""
+    while not stop.is_set():
+        sum(range(1000))
+
+
+@pytest.fixture
+def clear_profiles():
+    recent_profiles.clear()
+    yield
+    recent_profiles.clear()
+
+
+# ======================
+#  TC-PROFILE-001
+# ======================
+# 別スレッドで動いている関数のスタックを collapsed stacks で返す
+def test_sampling_profiler_finds_busy_thread():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,))
+    worker.start()
+    try:
+        profiler = SamplingProfiler("test", interval=0.001).start()
+        time.sleep(0.2)
+        profile = profiler.stop()
+    finally:
+        stop.set()
+        worker.join()
+
+    assert profile.samples > 0
+    assert profile.duration >= 0.2
+    collapsed = profile.to_collapsed()
+    busy = [line for line in collapsed.splitlines() if "busy_loop (" in line]
+    assert busy
+    # 呼び出し元が先（threading の _bootstrap から busy_loop まで）
+    stack, count = busy[0].rsplit(" ", 1)
+    assert stack.split(";")[0].startswith("_bootstrap (")
+    assert int(count) > 0
+    # プロファイラー自身のスレッドは記録しない
+    assert "_run (profiler.py" not in collapsed
+
+
+# ======================
+#  TC-PROFILE-002
+# ======================
+# speedscope の sampled プロファイルとして読める形にする
+def test_profile_to_speedscope():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,))
+    worker.start()
+    try:
+        # 呼び出したスレッド自身は記録しないので、別スレッドのスタックを2回取る
+        profiler = SamplingProfiler("test", interval=0.01)
+        profiler.sample()
+        profiler.sample()
+        document = profiler.stop().to_speedscope()
+    finally:
+        stop.set()
+        worker.join()
+
+    assert document["$schema"] == "https://www.speedscope.app/file-format-schema.json"
+    frames = document["shared"]["frames"]
+    (profile,) = document["profiles"]
+    assert profile["type"] == "sampled"
+    assert profile["unit"] == "seconds"
+    assert len(profile["samples"]) == len(profile["weights"])
+    assert sum(profile["weights"]) >= 2 * 0.01
+    for sample in profile["samples"]:
+        assert all(0 <= index < len(frames) for index in sample)
+    assert any(frame["name"] == "busy_loop" for frame in frames)
+
+
+# ======================
+#  TC-PROFILE-003
+# ======================
+# X-Profile にトークンが付いたリクエストだけを計測し、X-Profile-Id で返す
+def test_profile_middleware(clear_profiles):
+    app = FastAPI()
+
+    @app.get("/busy")
+    async def busy():
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            sum(range(1000))
+        return {"ok": True}
+
+    app.add_middleware(ProfileMiddleware, token="secret")
+    client = TestClient(app)
+
+    assert "x-profile-id" not in client.get("/busy").headers
+    assert "x-profile-id" not in client.get("/busy", headers={"X-Profile": "x"}).headers
+    assert not recent_profiles
+
+    response = client.get("/busy", headers={"X-Profile": "secret"})
+    assert response.status_code == 200
+    profile = recent_profiles[response.headers["x-profile-id"]]
+    assert profile.name == "GET /busy"
+    assert profile.samples > 0
+    assert "busy (test_profiler.py" in profile.to_collapsed()
+
+
+# ======================
+#  TC-PROFILE-004
+# ======================
+# stop_async() はサンプリングスレッドの終了を別スレッドで待つので、その間もイベントループが動く
+@pytest.mark.asyncio
+async def test_stop_async_does_not_block_event_loop():
+    profiler = SamplingProfiler("worker", interval=0.001).start()
+    thread = profiler._thread  # pylint: disable=protected-access
+    join = thread.join
+
+    def slow_join():
+        time.sleep(0.1)
+        join()
+
+    thread.join = slow_join
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticker = asyncio.create_task(tick())
+    profile = await profiler.stop_async()
+    ticker.cancel()
+
+    assert ticks > 1
+    assert not thread.is_alive()
+    assert profile.duration >= 0.1
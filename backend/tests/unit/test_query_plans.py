@@ -0,0 +1,146 @@
+import contextlib
+import importlib.util
+import json
+from pathlib import Path
+from unittest.mock import AsyncMock
+
+from app import db
+from app.routers import care_logs
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+_spec = importlib.util.spec_from_file_location(
+    "query_plans", BACKEND_DIR / "tests" / "benchmark" / "query_plans.py"
+)
+query_plans = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(query_plans)
+
+SELECT_LOG = "SELECT id FROM care_logs WHERE care_setting_id = $1 AND date = $2"
+
+
+def engine_line(sql: str, params: str) -> str:
+    return json.dumps(
+        {
+            "level": "INFO",
+            "fields": {"message": sql, "params": params, "duration_ms": 1},
+            "target": "quaint::connector::metrics",
+        }
+    )
+
+
+def plan(total_cost: float, seq_scan_rows: int = 0) -> dict:
+    node = {"Node Type": "Index Scan", "Relation Name": "care_logs", "Plans": []}
+    if seq_scan_rows:
+        node["Plans"].append(
+            {
+                "Node Type": "Seq Scan",
+                "Relation Name": "care_settings",
+                "Actual Rows": 1,
+                "Rows Removed by Filter": seq_scan_rows - 1,
+                "Actual Loops": 1,
+            }
+        )
+    return {"Plan": {**node, "Total Cost": total_cost}, "Execution Time": 0.1}
+
+
+def snapshot(total_cost: float, seq_scan_rows: int = 0, sql: str = SELECT_LOG):
+    return {
+        "statements": [
+            {"sql": sql, **query_plans.summarize_plan(plan(total_cost, seq_scan_rows))}
+        ]
+    }
+
+
+# ======================
+#  TC-PLAN-001
+# ======================
+# クエリエンジンのログからSQLだけを取り出し、パラメーターをリテラルにして EXPLAIN できる形にする
+def test_parse_engine_log_and_inline_params():
+    lines = [
+        "not json",
+        engine_line("BEGIN", "[]"),
+        engine_line(SELECT_LOG, '[10, "2025-07-01"]'),
+    ]
+
+    statements = query_plans.parse_engine_log(lines)
+
+    assert statements == [{"sql": SELECT_LOG, "params": [10, "2025-07-01"]}]
+    assert query_plans.inline_params(SELECT_LOG, statements[0]["params"]) == (
+        "SELECT id FROM care_logs WHERE care_setting_id = 10 AND date = '2025-07-01'"
+    )
+    # $1 と $10 を取り違えず、文字列の ' はエスケープする
+    assert (
+        query_plans.inline_params(
+            "SELECT $10, $1", [None, 2, 3, 4, 5, 6, 7, 8, 9, "o'neil"]
+        )
+        == "SELECT 'o''neil', NULL"
+    )
+
+
+# ======================
+#  TC-PLAN-002
+# ======================
+# 大きな Seq Scan・コストの悪化・SQLの変化を報告し、小さなテーブルの Seq Scan は許す
+def test_check_plans_flags_seq_scans_and_regressions():
+    baseline = {"care_logs_today": snapshot(10.0)}
+
+    assert query_plans.check_plans(baseline, {"care_logs_today": snapshot(11.0)}) == []
+    assert (
+        query_plans.check_plans(baseline, {"care_logs_today": snapshot(10.0, 50)}) == []
+    )
+
+    problems = query_plans.check_plans(
+        baseline, {"care_logs_today": snapshot(13.0, 5000)}
+    )
+    assert problems == [
+        "care_logs_today[0]: Seq Scan on care_settings (5000 行)",
+        "care_logs_today[0]: コストが 10.00 → 13.00 に増えました",
+    ]
+
+    changed = query_plans.check_plans(
+        baseline, {"care_logs_today": snapshot(10.0, sql="SELECT 1")}
+    )
+    assert changed == ["care_logs_today: 生成されたSQLがスナップショットと違います"]
+
+
+# ======================
+#  TC-PLAN-003
+# ======================
+# 呼び出し箇所は1つのトランザクションで実行してロールバックし、内側の tx() もまとめる
+async def test_capture_site_runs_inside_one_transaction(tmp_path):
+    log = query_plans.EngineLog(tmp_path / "engine.log")
+    log.path.write_text("")
+    transaction = AsyncMock()
+    transaction.query_raw.return_value = [{"QUERY PLAN": json.dumps([plan(4.2)])}]
+    rolled_back = []
+
+    @contextlib.asynccontextmanager
+    async def tx(**_):
+        try:
+            yield transaction
+        except query_plans._Rollback:
+            rolled_back.append(True)
+            raise
+
+    client = AsyncMock()
+    client.tx = tx
+
+    async def run(ctx):
+        async with care_logs.prisma_client.tx() as inner:
+            assert inner is transaction
+        with open(log.path, "a", encoding="utf-8") as engine:
+            engine.write(engine_line(SELECT_LOG, '[10, "2025-07-01"]') + "\n")
+
+    site = query_plans.CallSite("care_logs_today", "care_logs.py", run)
+    result = await query_plans._capture_site(client, log, site, ctx=None)
+
+    assert rolled_back == [True]
+    assert care_logs.prisma_client is db.prisma_client
+    assert result["error"] is None
+    [statement] = result["statements"]
+    assert statement["total_cost"] == 4.2
+    assert statement["seq_scans"] == []
+    explained = transaction.query_raw.await_args.args[0]
+    assert explained.startswith("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) SELECT")
+    assert "ROLLBACK TO SAVEPOINT plan_capture_explain" in [
+        call.args[0] for call in transaction.execute_raw.await_args_list
+    ]
@@ -0,0 +1,76 @@
+from datetime import date, datetime, time, timezone
+
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from fastapi.testclient import TestClient
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.decorator import cache
+
+from app.main import app as main_app
+from app.responses import TrustedJSONCoder, TrustedJSONResponse
+from app.schemas.care_settings import CareSettingCreateResponse
+
+
+# ======================
+#  TC-RESP-001
+# ======================
+# モデルは response_model と同じJSONに、dict は orjson で、bytes はそのまま本文にする
+def test_trusted_json_response_renders_models_and_values():
+    model = CareSettingCreateResponse(
+        id=1,
+        user_id="user-1",
+        parent_name="まゆみ",
+        child_name="さき",
+        dog_name="ころん",
+        care_start_date=date(2025, 7, 1),
+        care_end_date=date(2025, 8, 1),
+        morning_meal_time=time(7, 30),
+        night_meal_time=time(19, 0),
+        walk_time=time(17, 0),
+        care_password="1234",
+        created_at=datetime(2025, 7, 1, 12, 0, tzinfo=timezone.utc),
+    )
+    route = next(
+        route for route in main_app.routes if route.path == "/api/care_settings"
+    )
+    field = route.response_field
+    # response_model で検証し直した場合のJSON
+    expected = ORJSONResponse(
+        field.serialize(field.validate(model.model_dump(), {})[0], mode="json")
+    ).body
+
+    response = TrustedJSONResponse(model, status_code=201)
+
+    assert main_app.router.default_response_class is ORJSONResponse
+    assert response.status_code == 201
+    assert response.media_type == "application/json"
+    assert response.body == expected
+    assert TrustedJSONResponse(
+        {"care_logs": [{"id": 1, "walk_result": None}]}
+    ).body == (b'{"care_logs":[{"id":1,"walk_result":null}]}')
+    assert TrustedJSONResponse(b'{"ok":true}').body == b'{"ok":true}'
+
+
+# ======================
+#  TC-RESP-002
+# ======================
+# @cache のキャッシュヒットでは、保存した本文をそのまま返す（ハンドラーは呼ばれない）
+def test_trusted_json_coder_serves_cached_body(monkeypatch):
+    monkeypatch.setattr(FastAPICache, "_backend", InMemoryBackend())
+    calls = []
+    app = FastAPI()
+
+    @app.get("/items")
+    @cache(expire=60, coder=TrustedJSONCoder)
+    async def items():
+        calls.append(True)
+        return TrustedJSONResponse({"items": [1, 2, 3]})
+
+    client = TestClient(app)
+    first = client.get("/items")
+    second = client.get("/items")
+
+    assert len(calls) == 1
+    assert first.content == second.content == b'{"items":[1,2,3]}'
+    assert second.headers["content-type"] == "application/json"
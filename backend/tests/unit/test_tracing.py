@@ -0,0 +1,119 @@
+# pylint: disable=redefined-outer-name
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from opentelemetry.trace import SpanKind
+
+from app import db
+from app.tracing import (
+    TracingMiddleware,
+    configure_tracing,
+    load_spans,
+    main,
+    render_trace,
+    shutdown_tracing,
+    span,
+)
+
+TRACE_ID = "0af7651916cd43dd8448eb211c80319c"
+
+
+@pytest.fixture
+def exporter():
+    """スパンをメモリに溜めるエクスポーターでトレーサーを設定する"""
+    memory = InMemorySpanExporter()
+    configure_tracing(span_exporter=memory)
+    yield memory
+    shutdown_tracing()
+
+
+# ======================
+#  TC-TRACE-001
+# ======================
+# traceparent を引き継いだサーバースパンの下に、外部呼び出しの子スパンが付く
+def test_middleware_creates_server_span(exporter):
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def handler(item_id: int):
+        with span("redis.GET", **{"db.system": "redis"}):
+            pass
+        return {"id": item_id}
+
+    response = TestClient(app).get(
+        "/items/1", headers={"traceparent": f"00-{TRACE_ID}-b7ad6b7169203331-01"}
+    )
+    assert response.status_code == 200
+
+    child, server = exporter.get_finished_spans()
+    assert server.name == "GET /items/{item_id}"
+    assert server.attributes["http.response.status_code"] == 200
+    assert format(server.context.trace_id, "032x") == TRACE_ID
+    assert format(server.parent.span_id, "016x") == "b7ad6b7169203331"
+    assert child.name == "redis.GET"
+    assert child.parent.span_id == server.context.span_id
+
+
+# ======================
+#  TC-TRACE-002
+# ======================
+# Prismaのクエリはモデル名と操作名のスパンになり、失敗はエラーとして記録される
+@pytest.mark.asyncio
+async def test_prisma_queries_are_traced(exporter, monkeypatch):
+    execute = AsyncMock(return_value={"id": "user-1"})
+    monkeypatch.setattr(db.Prisma, "_execute", execute, raising=False)
+    client = db.TracedPrisma()
+    users = SimpleNamespace(__prisma_model__="users")
+
+    result = await client._execute(
+        method="find_unique", arguments={"where": {"id": "user-1"}}, model=users
+    )
+    assert result == {"id": "user-1"}
+
+    execute.side_effect = RuntimeError("engine down")
+    with pytest.raises(RuntimeError):
+        await client._execute(method="query_raw", arguments={"query": "SELECT 1"})
+
+    query, raw = exporter.get_finished_spans()
+    assert query.name == "prisma.users.find_unique"
+    assert query.attributes["db.collection.name"] == "users"
+    assert "db.statement" not in query.attributes
+    assert raw.name == "prisma.raw.query_raw"
+    assert raw.attributes["db.statement"] == "SELECT 1"
+    assert raw.status.status_code.name == "ERROR"
+
+
+# ======================
+#  TC-TRACE-003
+# ======================
+# ファイルに書き出したスパンから、遅いリクエストのフレームチャートを組み立てられる
+def test_file_exporter_and_flame_chart(tmp_path, capsys):
+    path = tmp_path / "spans.jsonl"
+    configure_tracing("file", path=str(path))
+    try:
+        with span("GET /api/care_logs/today", kind=SpanKind.SERVER):
+            with span("firebase.verify_id_token"):
+                pass
+            with span("prisma.care_logs.find_first"):
+                pass
+    finally:
+        shutdown_tracing()
+
+    spans = load_spans(str(path))
+    assert len({item["trace_id"] for item in spans}) == 1
+    lines = render_trace(spans).splitlines()
+    assert lines[0].startswith("GET /api/care_logs/today")
+    assert lines[1].startswith("  firebase.verify_id_token")
+    assert lines[2].startswith("  prisma.care_logs.find_first")
+
+    main([str(path)])
+    output = capsys.readouterr().out
+    assert f"trace_id={spans[0]['trace_id']}" in output